@@ -0,0 +1,172 @@
+import json
+import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import openai
+
+from result_cache import LRUCache, SQLiteCache, TieredCache, stable_hash
+
+
+def chat_agent(prompt_template: str, max_tokens: int, model: str = "gpt-4o-mini-2024-07-18",
+               temperature: float = 0.5, parse: Optional[Callable[[str], Any]] = None) -> Callable[[Any], Any]:
+    """
+    Builds a stage function that formats `prompt_template` with its input
+    ({input}; lists are comma-joined), asks the chat model and returns the
+    stripped reply, or parse(reply).
+    """
+    def run(value: Any) -> Any:
+        text = ", ".join(value) if isinstance(value, list) else value
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt_template.format(input=text)}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        content = response.choices[0].message.content.strip()
+        return parse(content) if parse is not None else content
+    return run
+
+
+def split_components(text: str) -> List[str]:
+    return [component.strip() for component in text.split(',')]
+
+
+class AgentPipeline:
+    """
+    Runs a chain of agent stages (each stage's output is the next one's input)
+    and reports every stage's result as soon as it is ready.
+
+    - Each stage has its own cache keyed by a hash of (stage name, input), so a
+      repeated requirement skips every model call, and a new requirement that
+      maps to already-seen components reuses the later stages.
+    - Identical work already in flight is shared: concurrent requests for the
+      same stage input wait on one model call.
+    - Stages run on a bounded thread pool and are chained with completion
+      callbacks, so no pool thread ever waits on another stage.
+
+    Pass cache_path to persist the caches in SQLite (one file per stage).
+    """
+    def __init__(self, stages: List[Tuple[str, Callable[[Any], Any]]], max_workers: int = 8,
+                 cache_entries: int = 1024, cache_path: Optional[str] = None):
+        self.stages = list(stages)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+        self.caches = {
+            name: TieredCache(LRUCache(cache_entries),
+                              SQLiteCache(f"{cache_path}.{name}.sqlite", max_age=None) if cache_path else None)
+            for name, _ in self.stages
+        }
+        self.stats = {name: {"calls": 0, "cache_hits": 0, "shared": 0, "errors": 0, "seconds": 0.0}
+                      for name, _ in self.stages}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(user_input: str) -> str:
+        return " ".join(user_input.split())
+
+    def _run_stage(self, name: str, fn: Callable[[Any], Any], key: str, value: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            result = fn(value)
+        except Exception:
+            with self._lock:
+                self.stats[name]["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self.stats[name]["seconds"] += time.perf_counter() - start
+        self.caches[name].put(key, result)
+        return result
+
+    def submit_stage(self, index: int, value: Any) -> Tuple[Future, bool]:
+        """Returns (future, cached) for one stage; cache hits come back already resolved."""
+        name, fn = self.stages[index]
+        key = stable_hash([name, value])
+        cached = self.caches[name].get(key)
+        if cached is not None:
+            with self._lock:
+                self.stats[name]["cache_hits"] += 1
+            future: Future = Future()
+            future.set_result(cached)
+            return future, True
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats[name]["shared"] += 1
+                return future, False
+            self.stats[name]["calls"] += 1
+            future = self.executor.submit(self._run_stage, name, fn, key, value)
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return future, False
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def start(self, user_input: str, on_event: Callable[[str, Dict[str, Any]], None]) -> None:
+        """
+        Starts the chain without blocking. on_event(stage_name, payload) is called
+        once per stage as it finishes, from whichever thread completed it, then
+        on_event("done", ...) or on_event("error", ...).
+        """
+        started = time.perf_counter()
+
+        def advance(index: int, value: Any) -> None:
+            if index == len(self.stages):
+                on_event("done", {"elapsed_ms": (time.perf_counter() - started) * 1000.0})
+                return
+            name = self.stages[index][0]
+            try:
+                future, cached = self.submit_stage(index, value)
+            except Exception as e:
+                on_event("error", {"stage": name, "error": str(e)})
+                return
+
+            def finished(done: Future) -> None:
+                error = done.exception()
+                if error is not None:
+                    on_event("error", {"stage": name, "error": str(error)})
+                    return
+                result = done.result()
+                on_event(name, {"result": result, "cached": cached,
+                                "elapsed_ms": (time.perf_counter() - started) * 1000.0})
+                advance(index + 1, result)
+            future.add_done_callback(finished)
+
+        advance(0, self.normalize(user_input))
+
+    def events(self, user_input: str, timeout: Optional[float] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields (event, payload) pairs as stages finish, ending with "done" or "error"."""
+        results: queue.Queue = queue.Queue()
+        self.start(user_input, lambda event, payload: results.put((event, payload)))
+        while True:
+            try:
+                event, payload = results.get(timeout=timeout)
+            except queue.Empty:
+                yield "error", {"error": f"Timed out after {timeout}s"}
+                return
+            yield event, payload
+            if event in ("done", "error"):
+                return
+
+    def sse(self, user_input: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """The same events formatted as server-sent events."""
+        for event, payload in self.events(user_input, timeout):
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    def run(self, user_input: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Blocking form: returns {stage_name: result}; raises RuntimeError if a stage failed."""
+        results = {}
+        for event, payload in self.events(user_input, timeout):
+            if event == "error":
+                raise RuntimeError(f"{payload.get('stage', 'pipeline')} failed: {payload['error']}")
+            if event != "done":
+                results[event] = payload["result"]
+        return results
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,120 @@
+import json
+import time
+import logging
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import openai
+import requests
+from flask import Flask, Response, jsonify, request, stream_with_context
+from werkzeug.serving import make_server
+
+from agent_pipeline import AgentPipeline, chat_agent, split_components
+from openai_stub import OpenAIStubConfig, start_openai_stub
+
+PROMPTS = [
+    ("components", "Based on the following user requirements, identify necessary components for a drone "
+                   "automation system: {input}", 200),
+    ("schematic", "Generate a schematic design for the following components in a drone automation system: {input}",
+     300),
+    ("code", "Generate code for the following schematic of a drone automation system: {input}", 500),
+]
+
+
+def make_stages() -> list:
+    """The drone script's three agents, built against whatever openai.api_base points at."""
+    return [(name, chat_agent(template, max_tokens, parse=split_components if name == "components" else None))
+            for name, template, max_tokens in PROMPTS]
+
+
+def make_app(pipeline: AgentPipeline) -> Flask:
+    """The drone script's /user-requirements route, plus the original sequential version for comparison."""
+    app = Flask(__name__)
+    stages = make_stages()
+
+    @app.route('/user-requirements', methods=['POST'])
+    def streamed():
+        user_input = request.json.get('requirements', '')
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            return Response(stream_with_context(pipeline.sse(user_input, timeout=120)), mimetype='text/event-stream')
+        return jsonify(pipeline.run(user_input, timeout=120))
+
+    @app.route('/user-requirements-sequential', methods=['POST'])
+    def sequential():
+        value = request.json.get('requirements', '')
+        response = {}
+        for name, fn in stages:
+            value = response[name] = fn(value)
+        return jsonify(response)
+
+    return app
+
+
+def timed_request(url: str, requirement: str, stream: bool) -> Dict[str, float]:
+    """Returns time to the first stage result and to the complete answer, in ms."""
+    start = time.perf_counter()
+    headers = {"Accept": "text/event-stream"} if stream else {}
+    first = None
+    with requests.post(url, json={"requirements": requirement}, headers=headers, stream=stream) as response:
+        if stream:
+            for line in response.iter_lines():
+                if line.startswith(b"event: ") and first is None:
+                    first = time.perf_counter()
+                if line.startswith(b"event: error"):
+                    raise RuntimeError("pipeline reported an error")
+        else:
+            json.loads(response.content)
+    end = time.perf_counter()
+    return {"first_ms": ((first or end) - start) * 1000.0, "total_ms": (end - start) * 1000.0}
+
+
+def run_load(name: str, url: str, requirements: List[str], clients: int, stream: bool) -> None:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda r: timed_request(url, r, stream), requirements))
+    elapsed = time.perf_counter() - start
+    first = [r["first_ms"] for r in results]
+    total = [r["total_ms"] for r in results]
+    print(f"{name:<28} {len(requirements) / elapsed:7.1f} req/s  first p50={statistics.median(first):7.1f}ms  "
+          f"total p50={statistics.median(total):7.1f}ms  max={max(total):7.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the /user-requirements agent pipeline against a fake LLM.")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--clients", type=int, default=12)
+    parser.add_argument("--distinct", type=int, default=10, help="Distinct requirements among the requests")
+    parser.add_argument("--latency", type=float, default=0.1, help="Fake LLM latency before the first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.001, help="Fake LLM seconds per token")
+    parser.add_argument("--workers", type=int, default=8, help="AgentPipeline thread pool size")
+    args = parser.parse_args()
+
+    stub, stub_url = start_openai_stub(config=OpenAIStubConfig(latency=args.latency, token_latency=args.token_latency))
+    openai.api_base = f"{stub_url}/v1"
+    openai.api_key = "benchmark-placeholder"
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    pipeline = AgentPipeline(make_stages(), max_workers=args.workers)
+    server = make_server("127.0.0.1", 0, make_app(pipeline), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    requirements = [f"Drone #{i % args.distinct} that can monitor my property, recognize intruders and "
+                    f"return to base automatically." for i in range(args.requests)]
+    print(f"{args.requests} requests, {args.distinct} distinct, {args.clients} clients, "
+          f"fake LLM latency {args.latency * 1000:.0f}ms + {args.token_latency * 1000:.1f}ms/token")
+    try:
+        run_load("sequential, uncached", f"{base_url}/user-requirements-sequential", requirements, args.clients,
+                 stream=False)
+        run_load("pipeline SSE, cold cache", f"{base_url}/user-requirements", requirements, args.clients, stream=True)
+        run_load("pipeline SSE, warm cache", f"{base_url}/user-requirements", requirements, args.clients, stream=True)
+        for name, stats in pipeline.stats.items():
+            print(f"  {name:<12} calls={stats['calls']}  cache_hits={stats['cache_hits']}  "
+                  f"shared={stats['shared']}  errors={stats['errors']}")
+    finally:
+        server.shutdown()
+        stub.shutdown()
+        pipeline.close()
@@ -0,0 +1,107 @@
+import time
+import smtplib
+import argparse
+import statistics
+from typing import Callable, List
+
+import requests
+
+from alert_dispatcher import AlertDispatcher, EmailChannel, SMTPConnectionPool, WebhookSMSChannel
+from alert_stub import AlertStubConfig, start_sms_stub, start_smtp_sink
+
+SENDER = "drone@example.com"
+RECIPIENT = "owner@example.com"
+PHONE = "+15550100"
+
+
+def time_calls(fn: Callable[[int], object], count: int) -> List[float]:
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def report(name: str, samples: List[float]) -> None:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{name:<32} p50={statistics.median(samples):.3f}ms  p99={p99:.3f}ms  max={max(samples):.3f}ms")
+
+
+def bench_caller_stall(smtp_port: int, sms_url: str, alerts: int) -> None:
+    """How long the detection loop is blocked per alert: the old inline path vs the dispatcher."""
+    print(f"Caller stall per alert ({alerts} distinct alerts)")
+
+    def inline(i: int) -> None:
+        requests.post(sms_url, json={"from": SENDER, "to": PHONE, "body": f"Intruder {i}"})
+        with smtplib.SMTP("127.0.0.1", smtp_port) as server:
+            server.login("user", "password")
+            server.sendmail(SENDER, RECIPIENT, f"Subject: Drone alert\n\nIntruder {i}")
+
+    report("inline SMS + fresh SMTP", time_calls(inline, alerts))
+
+    dispatcher = make_dispatcher(smtp_port, sms_url, rate_per_minute=60000, burst=alerts)
+    start = time.perf_counter()
+    report("dispatcher.send", time_calls(lambda i: dispatcher.send(f"Intruder {i}"), alerts))
+    dispatcher.flush()
+    elapsed = time.perf_counter() - start
+    pool = dispatcher.channels["email"].pool
+    print(f"{'':<32} delivered in {elapsed * 1000:.1f}ms over {pool.connects} SMTP connection(s)")
+    dispatcher.close()
+
+
+def bench_storm(smtp_port: int, sms_url: str, repeats: int, window: float) -> None:
+    """A detector firing on every frame: the same alert repeated `repeats` times."""
+    dispatcher = make_dispatcher(smtp_port, sms_url, dedup_window=window)
+    for _ in range(repeats):
+        dispatcher.send("Intruder detected! Initiating return to base.")
+    dispatcher.flush()
+    stats = dispatcher.stats
+    sent = {name: channel["sent"] for name, channel in stats["channels"].items()}
+    print(f"Alert storm ({repeats} repeats, {window:.0f}s window): accepted={stats['accepted']}  "
+          f"coalesced={stats['coalesced']}  suppressed={stats['suppressed']}  sent={sent}")
+    dispatcher.close()
+
+
+def bench_flaky(smtp_port: int, sms_url: str, alerts: int) -> None:
+    dispatcher = make_dispatcher(smtp_port, sms_url, rate_per_minute=60000, burst=alerts, backoff=0.01)
+    for i in range(alerts):
+        dispatcher.send(f"Intruder {i}")
+    dispatcher.flush()
+    for name, channel in dispatcher.stats["channels"].items():
+        print(f"Flaky {name:<26} sent={channel['sent']}  failed={channel['failed']}  retries={channel['retries']}")
+    dispatcher.close()
+
+
+def make_dispatcher(smtp_port: int, sms_url: str, **options) -> AlertDispatcher:
+    pool = SMTPConnectionPool("127.0.0.1", smtp_port, username="user", password="password", starttls=False)
+    return AlertDispatcher({"sms": WebhookSMSChannel(sms_url, SENDER, PHONE),
+                            "email": EmailChannel(pool, SENDER, [RECIPIENT])}, **options)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark alert delivery against a local SMTP sink and SMS stand-in.")
+    parser.add_argument("--alerts", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-message server latency (s)")
+    parser.add_argument("--connect-latency", type=float, default=0.2,
+                        help="Per-SMTP-session latency standing in for TLS + login (s)")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="Failure rate for the flaky suite")
+    parser.add_argument("--suite", default="stall,storm,flaky", help="Comma-separated: stall, storm, flaky")
+    args = parser.parse_args()
+    suites = set(args.suite.split(","))
+
+    config = AlertStubConfig(latency=args.latency, connect_latency=args.connect_latency)
+    smtp_server, smtp_port = start_smtp_sink(config=config)
+    sms_server, sms_url = start_sms_stub(config=config)
+    try:
+        if "stall" in suites:
+            bench_caller_stall(smtp_port, sms_url, args.alerts)
+        if "storm" in suites:
+            bench_storm(smtp_port, sms_url, args.alerts * 20, 60.0)
+        if "flaky" in suites:
+            config.error_rate = args.error_rate
+            bench_flaky(smtp_port, sms_url, args.alerts)
+    finally:
+        smtp_server.shutdown()
+        sms_server.shutdown()
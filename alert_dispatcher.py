@@ -0,0 +1,378 @@
+import ssl
+import time
+import queue
+import random
+import smtplib
+import threading
+from collections import deque
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import requests
+
+
+class PermanentAlertError(Exception):
+    """Raised by a channel for failures that retrying cannot fix (bad recipient, rejected request)."""
+
+
+# ---------------------------- Rate Limiting ---------------------------- #
+class TokenBucket:
+    """
+    Allows `burst` sends at once, refilled at `rate` sends per second.
+    reserve() takes a token and returns how long the caller must wait before using it.
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+# ---------------------------- Channels ---------------------------- #
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` logged-in SMTP connections open between alerts, so a send
+    costs one MAIL/RCPT/DATA exchange instead of connect + STARTTLS + login.
+    Connections idle for longer than max_idle are checked with NOOP before reuse.
+    """
+    def __init__(self, host: str, port: int = 587, username: Optional[str] = None,
+                 password: Optional[str] = None, starttls: bool = True, size: int = 2,
+                 timeout: float = 10.0, max_idle: float = 60.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.connects = 0
+        self._idle: deque = deque()  # (connection, returned_at)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                connection.starttls(context=ssl.create_default_context())
+            if self.username:
+                connection.login(self.username, self.password)
+        except Exception:
+            self._discard(connection)
+            raise
+        self.connects += 1
+        return connection
+
+    @staticmethod
+    def _discard(connection: smtplib.SMTP) -> None:
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, returned_at = self._idle.pop()
+            if time.monotonic() - returned_at < self.max_idle:
+                return connection
+            try:
+                if connection.noop()[0] == 250:
+                    return connection
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._discard(connection)
+        return self._connect()
+
+    def _checkin(self, connection: smtplib.SMTP) -> None:
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self._discard(connection)
+
+    def sendmail(self, sender: str, recipients: List[str], message: str) -> None:
+        connection = self._checkout()
+        try:
+            connection.sendmail(sender, recipients, message)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            connection.close()
+            raise
+        except smtplib.SMTPException:
+            self._checkin(connection)  # the server rejected this message; the connection is still fine
+            raise
+        self._checkin(connection)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+
+class EmailChannel:
+    name = "email"
+
+    def __init__(self, pool: SMTPConnectionPool, sender: str, recipients: Iterable[str],
+                 subject: str = "Drone alert"):
+        self.pool = pool
+        self.sender = sender
+        self.recipients = [r for r in recipients if r]
+        self.subject = subject
+
+    def send(self, text: str) -> None:
+        if not self.recipients:
+            raise PermanentAlertError("No email recipients configured")
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message["Subject"] = self.subject
+        message.set_content(text)
+        try:
+            self.pool.sendmail(self.sender, self.recipients, message.as_string())
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentAlertError(f"Recipients refused: {e.recipients}") from e
+        except smtplib.SMTPResponseException as e:
+            if e.smtp_code >= 500:
+                raise PermanentAlertError(f"SMTP {e.smtp_code}: {e.smtp_error!r}") from e
+            raise
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class TwilioSMSChannel:
+    name = "sms"
+
+    def __init__(self, client: Any, sender: str, recipient: str):
+        self.client = client
+        self.sender = sender
+        self.recipient = recipient
+
+    def send(self, text: str) -> None:
+        if not self.recipient:
+            raise PermanentAlertError("No SMS recipient configured")
+        self.client.messages.create(body=text, from_=self.sender, to=self.recipient)
+
+
+class WebhookSMSChannel:
+    """
+    Posts {"from", "to", "body"} as JSON to an SMS gateway URL (for example the
+    stand-in from alert_stub.py) over a kept-alive session.
+    """
+    name = "sms"
+
+    def __init__(self, url: str, sender: str, recipient: str, timeout: float = 10.0):
+        self.url = url
+        self.sender = sender
+        self.recipient = recipient
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, text: str) -> None:
+        response = self.session.post(self.url, json={"from": self.sender, "to": self.recipient, "body": text},
+                                     timeout=self.timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RuntimeError(f"SMS gateway returned {response.status_code}")
+        if response.status_code >= 400:
+            raise PermanentAlertError(f"SMS gateway rejected the message: {response.status_code} {response.text}")
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# ---------------------------- Dispatcher ---------------------------- #
+class Alert:
+    __slots__ = ("key", "message", "created", "last_seen", "count", "reported", "suppressed", "pending")
+
+    def __init__(self, key: str, message: str, created: float, suppressed: int = 0):
+        self.key = key
+        self.message = message
+        self.created = created
+        self.last_seen = created
+        self.count = 1
+        self.reported = 0
+        self.suppressed = suppressed  # repeats of the previous alert that arrived after it was sent
+        self.pending = 0
+
+    def render(self) -> str:
+        text = self.message
+        if self.count > 1:
+            text += f" (repeated {self.count}x since {datetime.fromtimestamp(self.created):%H:%M:%S})"
+        if self.suppressed:
+            text += f" ({self.suppressed} earlier repeats not sent)"
+        return text
+
+
+class AlertDispatcher:
+    """
+    Sends alerts on background threads so callers never wait on SMS or SMTP.
+
+    - send() only enqueues; each channel has its own queue and worker thread,
+      so a slow email server doesn't hold up SMS.
+    - Repeats of an alert (same key, default the channels and message) within dedup_window
+      seconds are coalesced into the pending one ("repeated 3x"); repeats that
+      arrive after it went out are counted and reported on the next alert.
+    - Each channel is rate limited to `rate_per_minute` sends (with `burst`).
+    - Failed sends are retried max_retries times with exponential backoff and
+      jitter; PermanentAlertError is not retried.
+    - When a channel's queue is full, new alerts for it are dropped and counted.
+
+    Channels are any objects with send(text) (and optionally close()), so local
+    stand-ins can replace Twilio and SMTP.
+    """
+    def __init__(self, channels: Dict[str, Any], dedup_window: float = 60.0,
+                 rate_per_minute: float = 6.0, burst: int = 3, max_retries: int = 3,
+                 backoff: float = 1.0, max_backoff: float = 30.0, queue_size: int = 100,
+                 on_result: Optional[Callable[[str, Alert, Optional[BaseException]], None]] = None):
+        self.channels = dict(channels)
+        self.dedup_window = dedup_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_result = on_result
+        self.buckets = {name: TokenBucket(rate_per_minute / 60.0, burst) for name in self.channels}
+        self.queues = {name: queue.Queue(maxsize=queue_size) for name in self.channels}
+        self.stats = {"accepted": 0, "coalesced": 0, "suppressed": 0,
+                      "channels": {name: {"sent": 0, "failed": 0, "retries": 0, "dropped": 0, "last_error": None}
+                                   for name in self.channels}}
+        self._recent: Dict[str, Alert] = {}
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._worker, args=(name,), name=f"alerts-{name}", daemon=True)
+                         for name in self.channels]
+        for thread in self._threads:
+            thread.start()
+
+    def send(self, message: str, key: Optional[str] = None, channels: Optional[Iterable[str]] = None) -> bool:
+        """Queues an alert without blocking. Returns False if it was merged into an earlier one."""
+        now = time.time()
+        targets = [name for name in (channels or self.channels) if name in self.channels]
+        key = key if key is not None else f"{','.join(targets)}:{message}"
+        with self._lock:
+            previous = self._recent.get(key)
+            if previous is not None and now - previous.created < self.dedup_window:
+                previous.count += 1
+                previous.last_seen = now
+                self.stats["coalesced" if previous.pending else "suppressed"] += 1
+                return False
+            suppressed = previous.count - previous.reported if previous is not None else 0
+            alert = Alert(key, message, now, suppressed)
+            self._recent[key] = alert
+            self._prune(now)
+            self.stats["accepted"] += 1
+            for name in targets:
+                try:
+                    self.queues[name].put_nowait(alert)
+                    alert.pending += 1
+                except queue.Full:
+                    self.stats["channels"][name]["dropped"] += 1
+        return True
+
+    def _prune(self, now: float) -> None:
+        """Forgets settled alerts well outside the window. Called under the lock."""
+        if len(self._recent) > 1000:
+            self._recent = {key: alert for key, alert in self._recent.items()
+                            if alert.pending or now - alert.created < self.dedup_window * 2}
+
+    def _worker(self, name: str) -> None:
+        alerts = self.queues[name]
+        while True:
+            alert = alerts.get()
+            try:
+                if alert is None:
+                    return
+                self._deliver(name, alert)
+            finally:
+                alerts.task_done()
+
+    def _deliver(self, name: str, alert: Alert) -> None:
+        channel = self.channels[name]
+        stats = self.stats["channels"][name]
+        error = None
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.buckets[name].reserve())
+            with self._lock:
+                text = alert.render()
+                count = alert.count
+            try:
+                channel.send(text)
+            except Exception as e:
+                error = e
+                stats["last_error"] = repr(e)
+                if isinstance(e, PermanentAlertError) or attempt == self.max_retries:
+                    break
+                stats["retries"] += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                continue
+            error = None
+            with self._lock:
+                alert.reported = max(alert.reported, count)
+            break
+        with self._lock:
+            alert.pending -= 1
+            stats["sent" if error is None else "failed"] += 1
+        if error is not None:
+            print(f"Failed to send {name} alert {alert.message!r}: {error}")
+        if self.on_result is not None:
+            try:
+                self.on_result(name, alert, error)
+            except Exception as e:
+                print(f"Alert result callback failed for {name}: {e}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every queued alert has been delivered or given up on."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for alerts in self.queues.values():
+            with alerts.all_tasks_done:
+                while alerts.unfinished_tasks:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    alerts.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Delivers what is already queued, then stops the workers and closes the channels.
+        If the queues haven't drained within timeout, the workers are told to stop
+        after their current alert and whatever is still queued is dropped.
+        """
+        if not self.flush(timeout):
+            for name, alerts in self.queues.items():
+                while True:
+                    try:
+                        alert = alerts.get_nowait()
+                    except queue.Empty:
+                        break
+                    alerts.task_done()
+                    if alert is not None:
+                        with self._lock:
+                            alert.pending -= 1
+                            self.stats["channels"][name]["dropped"] += 1
+        for alerts in self.queues.values():
+            try:
+                alerts.put_nowait(None)
+            except queue.Full:
+                try:
+                    alerts.put(None, timeout=timeout)  # refilled by a racing send(); the worker is still draining
+                except queue.Full:
+                    pass  # the daemon worker is abandoned
+        for thread in self._threads:
+            thread.join(timeout)
+        for channel in self.channels.values():
+            close = getattr(channel, "close", None)
+            if close is not None:
+                close()
@@ -0,0 +1,223 @@
+import json
+import time
+import random
+import argparse
+import threading
+import itertools
+import socketserver
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class AlertStubConfig:
+    """
+    Behaviour knobs for the SMTP sink and the SMS stand-in.
+    Random decisions are drawn from a generator seeded with (seed, request number),
+    so the n-th message always gets the same latency and the same injected error.
+    """
+    def __init__(self, latency: float = 0.0, connect_latency: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency                  # seconds added to every message
+        self.connect_latency = connect_latency  # seconds added to each new SMTP session (TLS + login stand-in)
+        self.error_rate = error_rate            # fraction of messages answered with a temporary failure
+        self.seed = seed
+        self._counter = itertools.count()
+
+    def next_rng(self) -> random.Random:
+        return random.Random(f"{self.seed}:{next(self._counter)}")
+
+
+# ---------------------------- SMTP Sink ---------------------------- #
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough SMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any credentials),
+    MAIL, RCPT, DATA, RSET, NOOP and QUIT. Accepted messages are appended to
+    server.messages; STARTTLS is not offered, so clients must connect without it.
+    """
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def _read_data(self) -> bytes:
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                return b"".join(lines)
+            lines.append(line[1:] if line.startswith(b"..") else line)
+
+    def handle(self) -> None:
+        server = self.server
+        config = server.config
+        with server.lock:
+            server.sessions += 1
+        time.sleep(config.connect_latency)
+        self._reply("220 localhost alert sink ready")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-localhost")
+                self._reply("250-AUTH PLAIN LOGIN")
+                self._reply("250 8BITMIME")
+            elif verb == "HELO":
+                self._reply("250 localhost")
+            elif verb == "AUTH":
+                parts = command.split()
+                if parts[1].upper() == "LOGIN":
+                    for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6"):
+                        self._reply(f"334 {prompt}")
+                        self.rfile.readline()
+                elif len(parts) < 3:
+                    self._reply("334 ")
+                    self.rfile.readline()
+                self._reply("235 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = command.split(":", 1)[1].strip(), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip())
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self._read_data()
+                rng = config.next_rng()
+                time.sleep(config.latency)
+                if rng.random() < config.error_rate:
+                    self._reply("451 Temporary failure, try again")
+                else:
+                    with server.lock:
+                        server.messages.append({"from": sender, "to": recipients, "received": time.time(),
+                                                "message": message_from_bytes(data)})
+                    self._reply("250 OK queued")
+                sender, recipients = None, []
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], config: AlertStubConfig):
+        super().__init__(address, SMTPSinkHandler)
+        self.config = config
+        self.messages: List[Dict[str, Any]] = []
+        self.sessions = 0
+        self.lock = threading.Lock()
+
+
+def start_smtp_sink(host: str = "127.0.0.1", port: int = 0,
+                    config: Optional[AlertStubConfig] = None) -> Tuple[SMTPSink, int]:
+    """
+    Starts the SMTP sink on a background thread.
+    Returns the server and its port (pass port=0 to pick a free port).
+    """
+    server = SMTPSink((host, port), config or AlertStubConfig())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, server.server_address[1]
+
+
+# ---------------------------- SMS Stand-in ---------------------------- #
+class SMSStubHandler(BaseHTTPRequestHandler):
+    """
+    Fake SMS gateway: POST /sms with {"from", "to", "body"} answers 201 with a
+    message id; GET /sms lists what was received. Speaks HTTP/1.1 so clients
+    can keep connections alive between requests.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    config = AlertStubConfig()
+    messages: List[Dict[str, Any]] = []
+    messages_lock = threading.Lock()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Any) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path != "/sms":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        with self.messages_lock:
+            self._send_json(200, {"messages": list(self.messages)})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/sms":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        if not body.get("to") or not body.get("body"):
+            self._send_json(400, {"error": "'to' and 'body' are required"})
+            return
+        rng = self.config.next_rng()
+        time.sleep(self.config.latency)
+        if rng.random() < self.config.error_rate:
+            self._send_json(503, {"error": "Injected gateway failure"})
+            return
+        with self.messages_lock:
+            message = {"sid": f"SM{len(self.messages):08d}", "received": time.time(), **body}
+            self.messages.append(message)
+        self._send_json(201, {"sid": message["sid"]})
+
+
+def start_sms_stub(host: str = "127.0.0.1", port: int = 0,
+                   config: Optional[AlertStubConfig] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starts the SMS stand-in on a background thread.
+    Returns the server and its /sms URL; received messages are in server.RequestHandlerClass.messages.
+    """
+    handler = type("ConfiguredSMSStubHandler", (SMSStubHandler,), {
+        "config": config or AlertStubConfig(),
+        "messages": [],
+        "messages_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/sms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink and SMS gateway stand-in for alerts.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--smtp-port", type=int, default=1025)
+    parser.add_argument("--sms-port", type=int, default=10250)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every message")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="Seconds added to each SMTP session")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of messages failed temporarily")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = AlertStubConfig(latency=args.latency, connect_latency=args.connect_latency,
+                             error_rate=args.error_rate, seed=args.seed)
+    smtp_server, smtp_port = start_smtp_sink(args.host, args.smtp_port, config)
+    sms_server, sms_url = start_sms_stub(args.host, args.sms_port, config)
+    print(f"SMTP sink listening on {args.host}:{smtp_port}, SMS stand-in on {sms_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        smtp_server.shutdown()
+        sms_server.shutdown()
@@ -0,0 +1,189 @@
+import os
+import time
+import asyncio
+import statistics
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import requests
+
+# The Compiler Explorer helpers don't need OpenAI; avoid the import-time key check.
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-placeholder")
+
+import multi_model_ageny as agency
+from compiler_explorer_stub import StubConfig, start_stub_server
+
+# Benchmarks measure the HTTP path, not client-side compile cache hits.
+agency.set_compile_cache(None)
+
+SOURCE = "int square(int num) {\n    return num * num;\n}\n"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def time_calls(fn: Callable[[], object], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def summarize(name: str, samples: List[float]) -> Dict[str, float]:
+    result = {
+        "p50_ms": statistics.median(samples),
+        "p99_ms": percentile(samples, 99),
+        "mean_ms": statistics.fmean(samples),
+    }
+    print(f"{name:<24} p50={result['p50_ms']:.3f}ms  p99={result['p99_ms']:.3f}ms  mean={result['mean_ms']:.3f}ms")
+    return result
+
+
+def bench_session_pool(base_url: str, iterations: int) -> None:
+    """Compares a fresh connection per call against the pooled client."""
+    url = f"{base_url}/api/compiler/g132/compile"
+    headers = agency.get_authenticated_headers()
+
+    def bare_call():
+        response = requests.post(url, json={"source": SOURCE, "options": {}}, headers=headers)
+        return agency.handle_api_response(response)
+
+    def pooled_call():
+        return agency.compile_code(base_url, "g132", SOURCE)
+
+    # Warm up both paths so the first pooled connection isn't counted.
+    bare_call()
+    pooled_call()
+
+    print(f"Session pool benchmark ({iterations} sequential compile calls)")
+    bare = summarize("bare requests.post", time_calls(bare_call, iterations))
+    pooled = summarize("pooled client", time_calls(pooled_call, iterations))
+    print(f"p50 speedup: {bare['p50_ms'] / pooled['p50_ms']:.2f}x, "
+          f"p99 speedup: {bare['p99_ms'] / pooled['p99_ms']:.2f}x")
+
+
+def bench_compile_matrix(base_url: str, compilers: int, concurrency: int, latency: float) -> None:
+    """Compares sequential compiles with the bounded-concurrency async matrix."""
+    compiler_ids = [f"stub{i}" for i in range(compilers)]
+
+    start = time.perf_counter()
+    for compiler_id in compiler_ids:
+        agency.compile_code(base_url, compiler_id, SOURCE)
+    sequential = time.perf_counter() - start
+
+    async def run_matrix():
+        return [item async for item in agency.compile_matrix(SOURCE, compiler_ids, api_base_url=base_url,
+                                                             concurrency=concurrency)]
+
+    start = time.perf_counter()
+    results = asyncio.run(run_matrix())
+    matrix = time.perf_counter() - start
+    errors = sum(1 for item in results if item["error"] is not None)
+
+    print(f"Compile matrix benchmark ({compilers} compilers, {latency * 1000:.0f}ms server latency, "
+          f"concurrency={concurrency})")
+    print(f"{'sequential':<24} {sequential * 1000:.1f}ms")
+    print(f"{'compile_matrix':<24} {matrix * 1000:.1f}ms  ({errors} errors)")
+
+
+def bench_load(base_url: str, endpoint: str, threads: int, total: int) -> Dict[str, float]:
+    """Drives one endpoint from `threads` workers and reports throughput and tail latency."""
+    link_id = agency.create_shortlink(base_url, {"sessions": [{"id": 1, "source": SOURCE}]})["url"].rsplit("/", 1)[-1]
+    calls = {
+        "compile": lambda i: agency.compile_code(base_url, "g132", f"{SOURCE}// {i}\n"),
+        "format": lambda i: agency.format_code(base_url, "clangformat", SOURCE, "Google"),
+        "shortlinkinfo": lambda i: agency.fetch_shortlink_info(base_url, link_id),  # not the local ShortlinkIndex
+    }
+    call = calls[endpoint]
+
+    def timed(i: int):
+        start = time.perf_counter()
+        try:
+            call(i)
+            ok = True
+        except Exception:
+            ok = False
+        return (time.perf_counter() - start) * 1000.0, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - start
+    samples = [ms for ms, _ in outcomes]
+    errors = sum(1 for _, ok in outcomes if not ok)
+    result = {
+        "throughput_rps": total / elapsed,
+        "p50_ms": statistics.median(samples),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples),
+        "errors": errors,
+    }
+    print(f"{endpoint:<14} threads={threads:<3} {result['throughput_rps']:8.1f} req/s  "
+          f"p50={result['p50_ms']:.2f}ms  p95={result['p95_ms']:.2f}ms  p99={result['p99_ms']:.2f}ms  "
+          f"max={result['max_ms']:.2f}ms  errors={errors}")
+    return result
+
+
+def bench_load_suite(config: StubConfig, endpoints: List[str], thread_counts: List[int], total: int) -> None:
+    print(f"Load benchmark ({total} requests per run, latency={config.latency * 1000:.0f}ms, "
+          f"jitter={config.jitter * 1000:.0f}ms, error_rate={config.error_rate}, "
+          f"throttle_rate={config.throttle_rate}, asm_lines={config.asm_lines})")
+    server, base_url = start_stub_server(config=config)
+    agency.set_client(agency.CompilerExplorerClient(base_url, pool_maxsize=max(thread_counts)))
+    try:
+        for endpoint in endpoints:
+            for threads in thread_counts:
+                bench_load(base_url, endpoint, threads, total)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Compiler Explorer client against a local stub.")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--compilers", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Server latency for the matrix benchmark (s)")
+    parser.add_argument("--suite", default="pool,matrix,load", help="Comma-separated: pool, matrix, load")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per load run")
+    parser.add_argument("--threads", default="1,4,16", help="Comma-separated worker counts for the load suite")
+    parser.add_argument("--endpoints", default="compile,format,shortlinkinfo")
+    parser.add_argument("--load-latency", type=float, default=0.005, help="Server latency for the load suite (s)")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--asm-lines", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    suites = set(args.suite.split(","))
+
+    if "pool" in suites:
+        server, base_url = start_stub_server()
+        try:
+            bench_session_pool(base_url, args.iterations)
+        finally:
+            server.shutdown()
+
+    if "matrix" in suites:
+        server, base_url = start_stub_server(latency=args.latency)
+        try:
+            bench_compile_matrix(base_url, args.compilers, args.concurrency, args.latency)
+        finally:
+            server.shutdown()
+
+    if "load" in suites:
+        bench_load_suite(
+            StubConfig(latency=args.load_latency, jitter=args.jitter, asm_lines=args.asm_lines,
+                       error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed),
+            args.endpoints.split(","),
+            [int(t) for t in args.threads.split(",")],
+            args.requests,
+        )
@@ -0,0 +1,223 @@
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import itertools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+# ---------------------------- Canned Responses ---------------------------- #
+LANGUAGES = [
+    {"id": "c++", "name": "C++", "extensions": [".cpp", ".cc", ".h"], "monaco": "cppp"},
+    {"id": "c", "name": "C", "extensions": [".c", ".h"], "monaco": "nc"},
+]
+
+COMPILERS = {
+    "c++": [
+        {"id": "g132", "name": "x86-64 gcc 13.2", "lang": "c++", "instructionSet": "amd64"},
+        {"id": "clang1700", "name": "x86-64 clang 17.0.1", "lang": "c++", "instructionSet": "amd64"},
+        {"id": "rv64-gcc1320", "name": "RISC-V (64-bits) gcc 13.2.0", "lang": "c++", "instructionSet": "riscv64"},
+        {"id": "rv32-clang1700", "name": "RISC-V rv32gc clang 17.0.1", "lang": "c++", "instructionSet": "riscv32"},
+    ],
+    "c": [
+        {"id": "cg132", "name": "x86-64 gcc 13.2", "lang": "c", "instructionSet": "amd64"},
+        {"id": "rv64-cgcc1320", "name": "RISC-V (64-bits) gcc 13.2.0", "lang": "c", "instructionSet": "riscv64"},
+    ],
+}
+
+FORMATTERS = [
+    {"exe": "/opt/compiler-explorer/clang-trunk/bin/clang-format", "version": "clang-format version 17.0.1",
+     "name": "clangformat", "styles": ["Google", "LLVM", "Mozilla", "Chromium", "WebKit"], "type": "clangformat"},
+    {"exe": "/opt/compiler-explorer/rustfmt/rustfmt", "version": "rustfmt 1.6.0",
+     "name": "rustfmt", "styles": [], "type": "rustfmt"},
+]
+
+GZIP_MIN_BYTES = 1024
+
+
+class StubConfig:
+    """
+    Behaviour knobs for the stand-in server.
+    Random decisions are drawn from a generator seeded with (seed, request number),
+    so the n-th request always gets the same latency and the same injected error.
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 compile_latency: float = 0.0,
+                 asm_lines: Optional[int] = None,
+                 error_rate: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency = latency                  # seconds added to every request
+        self.jitter = jitter                    # extra uniform [0, jitter) seconds
+        self.compile_latency = compile_latency  # extra seconds for compile requests
+        self.asm_lines = asm_lines              # fixed asm size; None echoes the source lines
+        self.error_rate = error_rate            # fraction of requests answered with 500
+        self.throttle_rate = throttle_rate      # fraction of requests answered with 429
+        self.seed = seed
+        self._counter = itertools.count()
+
+    def next_rng(self) -> random.Random:
+        return random.Random(f"{self.seed}:{next(self._counter)}")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Deterministic Compiler Explorer stand-in for load and latency benchmarks.
+    Speaks HTTP/1.1 so clients can keep connections alive between requests.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    config = StubConfig()
+    shortlinks: Dict[str, Any] = {}
+    shortlinks_lock = threading.Lock()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Any, etag: bool = False,
+                   headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        tag = '"%s"' % hashlib.sha1(data).hexdigest() if etag else None
+        if tag and self.headers.get("If-None-Match") == tag:
+            self.send_response(304)
+            self.send_header("ETag", tag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if len(data) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        if tag:
+            self.send_header("ETag", tag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _simulate(self, extra_latency: float = 0.0) -> bool:
+        """Applies latency and error injection. Returns False if an error was sent."""
+        config = self.config
+        rng = config.next_rng()
+        delay = config.latency + extra_latency + (rng.random() * config.jitter if config.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        roll = rng.random()
+        if roll < config.throttle_rate:
+            self._send_json(429, {"error": "Too many requests"}, headers={"Retry-After": "0"})
+            return False
+        if roll < config.throttle_rate + config.error_rate:
+            self._send_json(500, {"error": "Injected server error"})
+            return False
+        return True
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if not self._simulate():
+            return
+        if path == "/api/languages":
+            self._send_json(200, LANGUAGES, etag=True)
+        elif path == "/api/compilers":
+            self._send_json(200, [c for compilers in COMPILERS.values() for c in compilers], etag=True)
+        elif path.startswith("/api/compilers/"):
+            self._send_json(200, COMPILERS.get(path.rsplit("/", 1)[-1], []), etag=True)
+        elif path == "/api/formats":
+            self._send_json(200, FORMATTERS, etag=True)
+        elif path.startswith("/api/shortlinkinfo/"):
+            link_id = path.rsplit("/", 1)[-1]
+            with self.shortlinks_lock:
+                state = self.shortlinks.get(link_id)
+            if state is None:
+                self._send_json(404, {"error": f"ID {link_id} not found"})
+            else:
+                self._send_json(200, state)
+        else:
+            self._send_json(404, {"error": f"Unknown path {path}"})
+
+    def do_POST(self) -> None:
+        path = self.path.split("?", 1)[0]
+        payload = self._read_json()
+        is_compile = path.startswith("/api/compiler/") and path.endswith("/compile")
+        if not self._simulate(self.config.compile_latency if is_compile else 0.0):
+            return
+        if is_compile:
+            compiler_id = path.split("/")[3]
+            source = payload.get("source", "")
+            if self.config.asm_lines is None:
+                asm = [{"text": line} for line in source.splitlines()]
+            else:
+                asm = [{"text": f"        addi    a{i % 8}, a{i % 8}, {i}", "source": {"line": i + 1}}
+                       for i in range(self.config.asm_lines)]
+            self._send_json(200, {
+                "code": 0,
+                "okToCache": True,
+                "timedOut": False,
+                "stdout": [],
+                "stderr": [],
+                "compiler": compiler_id,
+                "asm": asm,
+            })
+        elif path.startswith("/api/format/"):
+            self._send_json(200, {"answer": payload.get("source", "").strip() + "\n", "exit": 0})
+        elif path == "/api/shortener":
+            link_id = hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+            with self.shortlinks_lock:
+                self.shortlinks[link_id] = payload
+            host, port = self.server.server_address[:2]
+            self._send_json(200, {"url": f"http://{host}:{port}/z/{link_id}"})
+        else:
+            self._send_json(404, {"error": f"Unknown path {path}"})
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0,
+                      latency: float = 0.0,
+                      config: Optional[StubConfig] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starts the stub server on a background thread.
+    Returns the server and its base URL (pass port=0 to pick a free port).
+    """
+    config = config or StubConfig(latency=latency)
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "config": config,
+        "shortlinks": {},
+        "shortlinks_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local Compiler Explorer stand-in server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10240)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random latency (s)")
+    parser.add_argument("--compile-latency", type=float, default=0.0, help="Extra seconds for compiles")
+    parser.add_argument("--asm-lines", type=int, help="Fixed number of asm lines per compile")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.host, args.port, config=StubConfig(
+        latency=args.latency, jitter=args.jitter, compile_latency=args.compile_latency,
+        asm_lines=args.asm_lines, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    ))
+    print(f"Compiler Explorer stub listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,643 @@
+import time
+import threading
+import importlib.util
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+# ---------------------------- Stage Counters ---------------------------- #
+class StageStats:
+    """
+    Thread-safe frame counter and latency window for one pipeline stage.
+    FPS is measured over the stage's whole run; latencies keep the most recent
+    `window` samples so percentiles reflect current behaviour.
+    """
+    def __init__(self, name: str, window: int = 1000):
+        self.name = name
+        self.frames = 0
+        self.dropped = 0
+        self.started: Optional[float] = None
+        self.last: Optional[float] = None
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            if self.started is None:
+                self.started = now
+            self.last = now
+            self.frames += 1
+            self._latencies.append(latency)
+
+    def drop(self, count: int = 1) -> None:
+        with self._lock:
+            self.dropped += count
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = np.array(self._latencies, dtype=np.float64) * 1000.0
+            elapsed = (self.last - self.started) if self.started is not None and self.last != self.started else 0.0
+            frames, dropped = self.frames, self.dropped
+        result = {"frames": frames, "dropped": dropped,
+                  "fps": (frames - 1) / elapsed if elapsed else 0.0}
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+            result.update(latency_ms_p50=float(p50), latency_ms_p95=float(p95), latency_ms_p99=float(p99),
+                          latency_ms_max=float(latencies.max()))
+        return result
+
+
+class Frame:
+    __slots__ = ("index", "image", "captured_at")
+
+    def __init__(self, index: int, image: np.ndarray, captured_at: float):
+        self.index = index
+        self.image = image
+        self.captured_at = captured_at
+
+
+class LatestFrameQueue:
+    """
+    Bounded frame queue. When full, put() either discards the oldest frame
+    (latest-frame-wins, for live cameras) or blocks (for offline replays where
+    every frame must be processed).
+    """
+    def __init__(self, capacity: int = 1, drop_oldest: bool = True,
+                 stats: Optional[StageStats] = None):
+        self.capacity = capacity
+        self.drop_oldest = drop_oldest
+        self.stats = stats
+        self._items: deque = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item: Any) -> bool:
+        with self._cond:
+            while len(self._items) >= self.capacity and not self.drop_oldest and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return False
+            if len(self._items) >= self.capacity:
+                self._items.popleft()
+                if self.stats is not None:
+                    self.stats.drop()
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """Returns the next item, or None once closed and drained (or on timeout)."""
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._items and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+# ---------------------------- Motion Detection ---------------------------- #
+class MotionDetector:
+    """
+    MOG2 background-subtraction intruder check: True if any foreground blob is
+    larger than min_area pixels (measured at full resolution). Safe to call
+    from several threads; only the background model and gate state are
+    serialised. The first warmup_frames frames only train the background model
+    (MOG2 reports nearly everything as foreground until it has seen a few frames).
+
+    Fast-path options, all off by default:
+    - scale: run on a frame resized by this factor; min_area and the blur
+      kernel are rescaled to match.
+    - rois: (x, y, w, h) rectangles in full-resolution pixels; only the
+      bounding box of the regions is processed and motion outside them is ignored.
+    - gate_pixels: cheap frame-difference gate. When fewer than this many
+      (downscaled) pixels changed by more than gate_delta since the last
+      processed frame, MOG2 is skipped and the frame counts as empty. After a
+      run of static frames up to max_skip frames are skipped outright, one more
+      for every skip_ramp static frames; any motion resets the run.
+    """
+    MODES = {
+        "full": {},
+        "fast": {"scale": 0.5, "gate_pixels": 20, "max_skip": 2},
+        "fastest": {"scale": 0.25, "gate_pixels": 5, "max_skip": 4},
+    }
+
+    def __init__(self, min_area: float = 500, blur: int = 5, warmup_frames: int = 0,
+                 scale: float = 1.0, rois: Optional[List[Tuple[int, int, int, int]]] = None,
+                 gate_pixels: Optional[int] = None, gate_delta: int = 10,
+                 max_skip: int = 0, skip_ramp: int = 10):
+        self.min_area = min_area
+        self.blur = blur
+        self.warmup_frames = warmup_frames
+        self.scale = scale
+        self.rois = list(rois) if rois else None
+        self.gate_pixels = gate_pixels
+        self.gate_delta = gate_delta
+        self.max_skip = max_skip
+        self.skip_ramp = skip_ramp
+        self.frames_seen = 0
+        self.frames_gated = 0
+        self.frames_skipped = 0
+        self.bg_subtractor = cv2.createBackgroundSubtractorMOG2()
+        self._lock = threading.Lock()
+        self._shape: Optional[Tuple[int, int]] = None
+        self._crop = (slice(None), slice(None))
+        self._size: Optional[Tuple[int, int]] = None
+        self._roi_mask: Optional[np.ndarray] = None
+        self._kernel = (blur, blur)
+        self._area = min_area
+        self._previous: Optional[np.ndarray] = None
+        self._static_run = 0
+        self._skip = 0
+        self._last_result = False
+
+    @classmethod
+    def from_mode(cls, mode: str = "full", **overrides: Any) -> "MotionDetector":
+        """Builds a detector from one of MODES; keyword arguments override the preset."""
+        if mode not in cls.MODES:
+            raise ValueError(f"Unknown detection mode {mode!r}; expected one of {sorted(cls.MODES)}")
+        return cls(**{**cls.MODES[mode], **overrides})
+
+    def _configure(self, height: int, width: int) -> None:
+        """Works out the crop, scaled kernel, area threshold and ROI mask for one frame size."""
+        x0, y0, x1, y1 = 0, 0, width, height
+        if self.rois:
+            x0 = max(0, min(x for x, _, _, _ in self.rois))
+            y0 = max(0, min(y for _, y, _, _ in self.rois))
+            x1 = min(width, max(x + w for x, _, w, _ in self.rois))
+            y1 = min(height, max(y + h for _, y, _, h in self.rois))
+        self._crop = (slice(y0, y1), slice(x0, x1))
+        small_w = max(1, int(round((x1 - x0) * self.scale)))
+        small_h = max(1, int(round((y1 - y0) * self.scale)))
+        self._size = (small_w, small_h)
+        self._area = self.min_area * self.scale * self.scale
+        k = max(1, int(round(self.blur * self.scale))) | 1
+        self._kernel = (k, k)
+        self._roi_mask = None
+        if self.rois:
+            mask = np.zeros((small_h, small_w), dtype=np.uint8)
+            for x, y, w, h in self.rois:
+                cv2.rectangle(mask, (int((x - x0) * self.scale), int((y - y0) * self.scale)),
+                              (int((x + w - x0) * self.scale), int((y + h - y0) * self.scale)), 255, -1)
+            self._roi_mask = mask
+        self._previous = None
+        self._shape = (height, width)
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        crop = frame[self._crop]
+        if self.scale != 1.0:
+            crop = cv2.resize(crop, self._size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, self._kernel, 0)
+
+    def _gate_open(self, image: np.ndarray) -> bool:
+        """
+        Frame-difference check against the last processed frame. Called under the lock.
+        The reference only moves when the gate opens, so slow changes add up
+        across gated frames until they reach gate_pixels.
+        """
+        previous = self._previous
+        if previous is None or self._last_result or self.frames_seen <= self.warmup_frames:
+            self._previous = image
+            return True
+        diff = cv2.absdiff(image, previous)
+        if self._roi_mask is not None:
+            diff = cv2.bitwise_and(diff, self._roi_mask)
+        _, changed = cv2.threshold(diff, self.gate_delta, 255, cv2.THRESH_BINARY)
+        if cv2.countNonZero(changed) >= self.gate_pixels:
+            self._previous = image
+            self._static_run = 0
+            return True
+        self._static_run += 1
+        self._skip = min(self.max_skip, self._static_run // self.skip_ramp)
+        return False
+
+    def __call__(self, frame: np.ndarray) -> bool:
+        height, width = frame.shape[:2]
+        if self._shape != (height, width):
+            with self._lock:
+                if self._shape != (height, width):
+                    self._configure(height, width)
+        if self._skip:
+            with self._lock:
+                if self._skip:
+                    self._skip -= 1
+                    self.frames_skipped += 1
+                    return False
+        image = self._prepare(frame)
+        with self._lock:
+            self.frames_seen += 1
+            if self.gate_pixels is not None and not self._gate_open(image):
+                self.frames_gated += 1
+                return False
+            mask = self.bg_subtractor.apply(image)
+            warming_up = self.frames_seen <= self.warmup_frames
+        if warming_up:
+            return False
+        if self._roi_mask is not None:
+            mask = cv2.bitwise_and(mask, self._roi_mask)
+        if cv2.countNonZero(mask) <= self._area:
+            found = False  # not enough foreground for any blob to pass, skip labelling
+        else:
+            _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+            found = bool((stats[1:, cv2.CC_STAT_AREA] > self._area).any())
+        self._last_result = found
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        return {"frames": self.frames_seen + self.frames_skipped, "gated": self.frames_gated,
+                "skipped": self.frames_skipped,
+                "processed": self.frames_seen - self.frames_gated}
+
+
+# ---------------------------- Pipeline ---------------------------- #
+class VisionPipeline:
+    """
+    Capture -> detect -> (optional) display, each stage on its own thread(s).
+
+    - Capture reads `source` (anything with read()/release(), e.g. a
+      cv2.VideoCapture on a camera index or a video file) into a bounded
+      latest-frame-wins queue, so a slow detector never delays capture.
+    - A pool of `workers` threads runs `detect(image)` on the newest frames.
+      A truthy result calls on_detection(frame, result) once and, with
+      stop_on_detection, stops the pipeline.
+    - With display=True, run() shows frames on the calling (main) thread and
+      stops on 'q'; headless runs just wait for the stream to end.
+
+    drop_frames=False makes the queue block instead, so offline replays
+    process every frame.
+    """
+    def __init__(self, source: Any, detect: Callable[[np.ndarray], Any],
+                 on_detection: Optional[Callable[[Frame, Any], None]] = None,
+                 workers: int = 2, queue_size: int = 1, display: bool = False,
+                 window_name: str = "Drone Camera Feed", stop_on_detection: bool = True,
+                 drop_frames: bool = True, max_frames: Optional[int] = None):
+        self.source = source
+        self.detect = detect
+        self.on_detection = on_detection
+        self.workers = workers
+        self.display = display
+        self.window_name = window_name
+        self.stop_on_detection = stop_on_detection
+        self.max_frames = max_frames
+        self.stats = {name: StageStats(name) for name in ("capture", "detect", "display", "end_to_end")}
+        self.frames = LatestFrameQueue(queue_size, drop_frames, self.stats["capture"])
+        self.display_frames = LatestFrameQueue(1, True, self.stats["display"])
+        self.detections: List[Tuple[int, Any]] = []
+        self.first_detection_latency: Optional[float] = None
+        self._stop = threading.Event()
+        self._detected = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.errors = 0
+
+    def _capture(self) -> None:
+        index = 0
+        try:
+            while not self._stop.is_set() and (self.max_frames is None or index < self.max_frames):
+                start = time.perf_counter()
+                ret, image = self.source.read()
+                if not ret:
+                    break
+                now = time.perf_counter()
+                self.stats["capture"].record(now - start)
+                frame = Frame(index, image, now)
+                self.frames.put(frame)
+                if self.display:
+                    self.display_frames.put(frame)
+                index += 1
+        finally:
+            self.frames.close()
+
+    def _detect(self) -> None:
+        while not self._stop.is_set():
+            frame = self.frames.get(timeout=0.1)
+            if frame is None:
+                if self.frames.closed:
+                    return
+                continue
+            start = time.perf_counter()
+            try:
+                result = self.detect(frame.image)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"Detection failed on frame {frame.index}: {e}")
+                continue
+            end = time.perf_counter()
+            self.stats["detect"].record(end - start)
+            self.stats["end_to_end"].record(end - frame.captured_at)
+            if result:
+                self._handle_detection(frame, result, end)
+
+    def _handle_detection(self, frame: Frame, result: Any, now: float) -> None:
+        with self._lock:
+            self.detections.append((frame.index, result))
+            first = not self._detected.is_set()
+            self._detected.set()
+            if first:
+                self.first_detection_latency = now - frame.captured_at
+        if first and self.on_detection is not None:
+            self.on_detection(frame, result)
+        if self.stop_on_detection:
+            self._stop.set()
+
+    def start(self) -> "VisionPipeline":
+        self._threads = [threading.Thread(target=self._capture, name="capture", daemon=True)]
+        self._threads += [threading.Thread(target=self._detect, name=f"detect-{i}", daemon=True)
+                          for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.frames.close()
+        self.display_frames.close()
+
+    def _workers_alive(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads[1:])
+
+    def run(self) -> Dict[str, Any]:
+        """Runs until the stream ends, a detection stops it, or 'q' is pressed. Returns stats."""
+        started = time.perf_counter()
+        self.start()
+        try:
+            if self.display:
+                while self._workers_alive() and not self._stop.is_set():
+                    frame = self.display_frames.get(timeout=0.05)
+                    if frame is None:
+                        continue
+                    start = time.perf_counter()
+                    cv2.imshow(self.window_name, frame.image)
+                    key = cv2.waitKey(1) & 0xFF
+                    self.stats["display"].record(time.perf_counter() - start)
+                    if key == ord('q'):
+                        break
+            else:
+                for thread in self._threads[1:]:
+                    while thread.is_alive():
+                        thread.join(0.1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            for thread in self._threads:
+                thread.join()
+            if self.display:
+                cv2.destroyWindow(self.window_name)
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            "elapsed_s": elapsed,
+            "detections": len(self.detections),
+            "first_detection_latency_ms": (self.first_detection_latency * 1000.0
+                                           if self.first_detection_latency is not None else None),
+            "errors": self.errors,
+            "stages": {name: stats.snapshot() for name, stats in self.stats.items()},
+        }
+
+
+# ---------------------------- Object Detection ---------------------------- #
+class Detection:
+    __slots__ = ("label", "class_id", "score", "box")
+
+    def __init__(self, label: str, class_id: int, score: float, box: Tuple[int, int, int, int]):
+        self.label = label
+        self.class_id = class_id
+        self.score = score
+        self.box = box  # (x, y, w, h) in frame pixels
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"label": self.label, "class_id": self.class_id, "score": self.score, "box": list(self.box)}
+
+    def __repr__(self) -> str:
+        return f"Detection({self.label!r}, score={self.score:.2f}, box={self.box})"
+
+
+class OpenCVDNNBackend:
+    """CPU inference through cv2.dnn (ONNX, TFLite or TensorFlow models)."""
+    name = "opencv"
+
+    def __init__(self, model_path: str, threads: Optional[int] = None):
+        self.net = cv2.dnn.readNet(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        if threads:
+            cv2.setNumThreads(threads)
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        self.net.setInput(batch)
+        return self.net.forward()
+
+
+class OnnxRuntimeBackend:
+    """CPU inference through ONNX Runtime (optional dependency)."""
+    name = "onnxruntime"
+
+    def __init__(self, model_path: str, threads: Optional[int] = None):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("OnnxRuntimeBackend needs the onnxruntime package: pip install onnxruntime") from e
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+def load_backend(model_path: str, backend: str = "auto", threads: Optional[int] = None) -> Any:
+    """'auto' prefers ONNX Runtime for .onnx models when it is installed, else cv2.dnn."""
+    if backend == "auto":
+        use_ort = model_path.endswith(".onnx") and importlib.util.find_spec("onnxruntime") is not None
+        backend = "onnxruntime" if use_ort else "opencv"
+    if backend == "onnxruntime":
+        return OnnxRuntimeBackend(model_path, threads)
+    if backend == "opencv":
+        return OpenCVDNNBackend(model_path, threads)
+    raise ValueError(f"Unknown detector backend {backend!r}; expected auto, onnxruntime or opencv")
+
+
+class _PendingFrame:
+    __slots__ = ("image", "done", "result", "error")
+
+    def __init__(self, image: np.ndarray):
+        self.image = image
+        self.done = threading.Event()
+        self.result: List[Detection] = []
+        self.error: Optional[BaseException] = None
+
+
+class ObjectDetector:
+    """
+    Batched object detector for YOLO-style models: one NCHW float32 input and
+    an output of shape (batch, rows, 5 + classes) holding cx, cy, w, h (input
+    pixels), objectness and per-class scores.
+
+    detector(frame) may be called from several threads (e.g. the pipeline's
+    detection workers); each caller blocks while a batching thread gathers up
+    to max_batch frames, waiting at most max_wait seconds after the first, and
+    runs the model once on them. Frames are resized into a preallocated input
+    tensor, so steady-state inference allocates nothing on the input side.
+    """
+    def __init__(self, backend: Any, input_size: Tuple[int, int] = (320, 320),
+                 labels: Optional[List[str]] = None, score_threshold: float = 0.4,
+                 nms_threshold: float = 0.45, max_batch: int = 4, max_wait: float = 0.005,
+                 swap_rb: bool = True, scale: float = 1 / 255.0):
+        self.backend = backend
+        self.input_size = input_size
+        self.labels = labels or []
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.swap_rb = swap_rb
+        self.scale = scale
+        width, height = input_size
+        self.tensor = np.zeros((max_batch, 3, height, width), dtype=np.float32)
+        self._resized = np.empty((max_batch, height, width, 3), dtype=np.uint8)
+        self.inference = StageStats("inference")
+        self.frames = 0
+        self.batches = 0
+        self.inference_seconds = 0.0
+        self._pending: deque = deque()
+        self._cond = threading.Condition()
+        self._infer_lock = threading.Lock()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def label(self, class_id: int) -> str:
+        return self.labels[class_id] if class_id < len(self.labels) else str(class_id)
+
+    def _fill(self, slot: int, image: np.ndarray) -> None:
+        resized = self._resized[slot]
+        cv2.resize(image, self.input_size, dst=resized, interpolation=cv2.INTER_LINEAR)
+        channels = resized[..., ::-1] if self.swap_rb else resized
+        np.multiply(channels.transpose(2, 0, 1), self.scale, out=self.tensor[slot], dtype=np.float32)
+
+    def _decode(self, rows: np.ndarray, frame_shape: Tuple[int, ...]) -> List[Detection]:
+        scores = rows[:, 5:] * rows[:, 4:5]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        keep = confidences >= self.score_threshold
+        if not keep.any():
+            return []
+        rows, class_ids, confidences = rows[keep], class_ids[keep], confidences[keep]
+        height, width = frame_shape[:2]
+        sx, sy = width / self.input_size[0], height / self.input_size[1]
+        boxes = np.empty((len(rows), 4), dtype=np.float32)
+        boxes[:, 0] = (rows[:, 0] - rows[:, 2] / 2) * sx
+        boxes[:, 1] = (rows[:, 1] - rows[:, 3] / 2) * sy
+        boxes[:, 2] = rows[:, 2] * sx
+        boxes[:, 3] = rows[:, 3] * sy
+        indices = cv2.dnn.NMSBoxesBatched(boxes.tolist(), confidences.tolist(), class_ids.tolist(),
+                                          self.score_threshold, self.nms_threshold)
+        return [Detection(self.label(int(class_ids[i])), int(class_ids[i]), float(confidences[i]),
+                          tuple(int(round(v)) for v in boxes[i]))
+                for i in np.asarray(indices, dtype=np.int64).reshape(-1)]
+
+    def detect_batch(self, images: List[np.ndarray]) -> List[List[Detection]]:
+        """Runs the model on up to max_batch frames at once, on the calling thread."""
+        if len(images) > self.max_batch:
+            raise ValueError(f"Batch of {len(images)} frames exceeds max_batch={self.max_batch}")
+        with self._infer_lock:
+            for slot, image in enumerate(images):
+                self._fill(slot, image)
+            start = time.perf_counter()
+            output = self.backend.infer(self.tensor[:len(images)])
+            elapsed = time.perf_counter() - start
+            self.inference.record(elapsed)
+            self.inference_seconds += elapsed
+            self.frames += len(images)
+            self.batches += 1
+        output = np.asarray(output).reshape(len(images), -1, output.shape[-1])
+        return [self._decode(output[i], image.shape) for i, image in enumerate(images)]
+
+    def _batch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            try:
+                results = self.detect_batch([item.image for item in batch])
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+                    item.done.set()
+                continue
+            for item, result in zip(batch, results):
+                item.result = result
+                item.done.set()
+
+    def __call__(self, frame: np.ndarray) -> List[Detection]:
+        item = _PendingFrame(frame)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ObjectDetector is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._batch_loop, name="object-detector", daemon=True)
+                self._thread.start()
+            self._pending.append(item)
+            self._cond.notify_all()
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"frames": self.frames, "batches": self.batches,
+                "mean_batch": self.frames / self.batches if self.batches else 0.0,
+                "inference": self.inference.snapshot(),
+                "per_frame_ms": self.inference_seconds / self.frames * 1000.0 if self.frames else 0.0}
+
+
+def format_stats(summary: Dict[str, Any]) -> str:
+    lines = []
+    for name, stage in summary["stages"].items():
+        if not stage["frames"]:
+            continue
+        line = f"{name:<11} frames={stage['frames']:<6} fps={stage['fps']:8.1f}"
+        if "latency_ms_p50" in stage:
+            line += f"  p50={stage['latency_ms_p50']:.2f}ms  p95={stage['latency_ms_p95']:.2f}ms"
+        if stage["dropped"]:
+            line += f"  dropped={stage['dropped']}"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,379 @@
+import os
+import time
+import argparse
+import tempfile
+from typing import Any, Callable, Dict, Optional
+
+import cv2
+import numpy as np
+
+from drone_vision import MotionDetector, ObjectDetector, VisionPipeline, format_stats, load_backend
+
+
+def make_synthetic_clip(path: str, frames: int = 600, width: int = 640, height: int = 480,
+                        fps: float = 30.0, intruder_at: Optional[int] = 450, seed: int = 0) -> str:
+    """
+    Writes a test clip: a static noisy scene with a person-sized box walking in
+    from the left at frame `intruder_at` (None for an empty scene).
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+    cv2.rectangle(background, (width // 2, height // 3), (width // 2 + 120, height - 40), (90, 140, 90), -1)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    try:
+        for index in range(frames):
+            frame = background.copy()
+            noise = rng.integers(-6, 7, size=frame.shape, dtype=np.int16)
+            frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+            if intruder_at is not None and index >= intruder_at:
+                x = 10 + (index - intruder_at) * 6
+                cv2.rectangle(frame, (x, height // 2 - 80), (x + 50, height // 2 + 80), (20, 20, 200), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+# A minimal ONNX (protobuf) writer, so the object-detector benchmark can run
+# offline with a small CPU-sized network without the onnx package.
+def _varint(value: int) -> bytes:
+    value &= (1 << 64) - 1
+    out = bytearray()
+    while True:
+        bits, value = value & 0x7F, value >> 7
+        out.append(bits | 0x80 if value else bits)
+        if not value:
+            return bytes(out)
+
+
+def _field(number: int, value: Any) -> bytes:
+    if isinstance(value, int):
+        return _varint(number << 3) + _varint(value)
+    if isinstance(value, str):
+        value = value.encode()
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _onnx_attribute(name: str, value: Any) -> bytes:
+    if isinstance(value, int):
+        return _field(1, name) + _field(20, 2) + _field(3, value)
+    return _field(1, name) + _field(20, 7) + b"".join(_field(8, v) for v in value)
+
+
+def _onnx_node(op: str, inputs: list, outputs: list, **attributes: Any) -> bytes:
+    return (b"".join(_field(1, name) for name in inputs) + b"".join(_field(2, name) for name in outputs)
+            + _field(4, op) + b"".join(_field(5, _onnx_attribute(k, v)) for k, v in attributes.items()))
+
+
+def _onnx_tensor(name: str, array: np.ndarray) -> bytes:
+    data_type = 1 if array.dtype == np.float32 else 7  # FLOAT or INT64
+    return (b"".join(_field(1, dim) for dim in array.shape) + _field(2, data_type) + _field(8, name)
+            + _field(9, array.tobytes()))
+
+
+def _onnx_value_info(name: str, dims: list) -> bytes:
+    shape = b"".join(_field(1, _field(2, d) if isinstance(d, str) else _field(1, d)) for d in dims)
+    return _field(1, name) + _field(2, _field(1, _field(1, 1) + _field(2, shape)))
+
+
+def make_tiny_detector_model(path: str, input_size: int = 320, classes: int = 2, seed: int = 0) -> str:
+    """
+    Writes a small randomly initialised YOLO-style ONNX detector: four stride-2
+    3x3 convolutions and a 1x1 head, output (batch, rows, 5 + classes). Its
+    detections are meaningless; it stands in for a real model's CPU cost.
+    """
+    rng = np.random.default_rng(seed)
+    nodes, initializers = [], []
+    x, channels = "images", 3
+    for i, out_channels in enumerate((16, 32, 64, 64)):
+        weights = rng.normal(0, (2.0 / (channels * 9)) ** 0.5, (out_channels, channels, 3, 3)).astype(np.float32)
+        initializers += [_onnx_tensor(f"w{i}", weights), _onnx_tensor(f"b{i}", np.zeros(out_channels, np.float32))]
+        nodes += [_onnx_node("Conv", [x, f"w{i}", f"b{i}"], [f"conv{i}"], kernel_shape=[3, 3], strides=[2, 2],
+                             pads=[1, 1, 1, 1]),
+                  _onnx_node("Relu", [f"conv{i}"], [f"relu{i}"])]
+        x, channels = f"relu{i}", out_channels
+    width = 5 + classes
+    gain = np.array([input_size] * 4 + [1] * (width - 4), np.float32).reshape(1, 1, width)
+    initializers += [_onnx_tensor("head_w", rng.normal(0, 0.1, (width, channels, 1, 1)).astype(np.float32)),
+                     _onnx_tensor("head_b", np.zeros(width, np.float32)),
+                     _onnx_tensor("shape", np.array([0, width, -1], np.int64)),
+                     _onnx_tensor("gain", gain)]
+    nodes += [_onnx_node("Conv", [x, "head_w", "head_b"], ["head"], kernel_shape=[1, 1]),
+              _onnx_node("Reshape", ["head", "shape"], ["flat"]),
+              _onnx_node("Transpose", ["flat"], ["rows"], perm=[0, 2, 1]),
+              _onnx_node("Sigmoid", ["rows"], ["scores"]),
+              _onnx_node("Mul", ["scores", "gain"], ["output"])]
+    graph = (b"".join(_field(1, node) for node in nodes) + _field(2, "tiny_detector")
+             + b"".join(_field(5, tensor) for tensor in initializers)
+             + _field(11, _onnx_value_info("images", ["batch", 3, input_size, input_size]))
+             + _field(12, _onnx_value_info("output", ["batch", "rows", width])))
+    model = (_field(1, 8) + _field(2, "drone_vision_benchmark") + _field(7, graph)
+             + _field(8, _field(1, "") + _field(2, 13)))
+    with open(path, "wb") as f:
+        f.write(model)
+    return path
+
+
+class LiveReplay:
+    """
+    Replays a video file the way a live camera delivers frames: frame i becomes
+    available at start + i / fps, and a reader that falls behind gets the newest
+    frame (older ones are skipped), like cv2.VideoCapture(0) with a small buffer.
+    """
+    def __init__(self, path: str, fps: Optional[float] = None):
+        self.cap = cv2.VideoCapture(path)
+        self.fps = fps or self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.start: Optional[float] = None
+        self.next_index = 0
+        self.skipped = 0
+
+    def frame_time(self, index: int) -> float:
+        return self.start + index / self.fps
+
+    def read(self):
+        if self.start is None:
+            self.start = time.perf_counter()
+        due = int((time.perf_counter() - self.start) * self.fps)
+        if due < self.next_index:
+            time.sleep(self.frame_time(self.next_index) - time.perf_counter())
+            due = self.next_index
+        while self.next_index < due:
+            if not self.cap.grab():
+                return False, None
+            self.next_index += 1
+            self.skipped += 1
+        ret, frame = self.cap.read()
+        self.next_index += 1
+        return ret, frame
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+def legacy_detect_intruder(bg_subtractor: Any, frame: np.ndarray) -> bool:
+    """detect_intruder as it was before the fast path, for comparison."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    mask = bg_subtractor.apply(blurred)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in contours:
+        if cv2.contourArea(contour) > 500:
+            return True
+    return False
+
+
+def _slowed(detect: Callable[[np.ndarray], Any], delay: float) -> Callable[[np.ndarray], Any]:
+    if not delay:
+        return detect
+
+    def slow_detect(frame: np.ndarray) -> Any:
+        result = detect(frame)
+        time.sleep(delay)
+        return result
+    return slow_detect
+
+
+def run_serial(source: Any, detect: Callable[[np.ndarray], Any], stop_on_detection: bool) -> Dict[str, Any]:
+    """The original monitor_property loop: read, detect, repeat, on one thread."""
+    frames = 0
+    detected_at = None
+    start = time.perf_counter()
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        result = detect(frame)
+        frames += 1
+        if result and detected_at is None:
+            detected_at = time.perf_counter()
+            if stop_on_detection:
+                break
+    return {"frames": frames, "elapsed_s": time.perf_counter() - start, "detected_at": detected_at}
+
+
+def run_pipeline(source: Any, detect: Callable[[np.ndarray], Any], workers: int, drop_frames: bool,
+                 stop_on_detection: bool) -> Dict[str, Any]:
+    detected = []
+    pipeline = VisionPipeline(source, detect, on_detection=lambda frame, result: detected.append(time.perf_counter()),
+                              workers=workers, display=False, stop_on_detection=stop_on_detection,
+                              drop_frames=drop_frames)
+    summary = pipeline.run()
+    summary["detected_at"] = detected[0] if detected else None
+    return summary
+
+
+def bench_pipeline_suite(video: str, worker_counts: list, detect_delay: float, intruder_at: Optional[int],
+                         warmup: int = 30) -> None:
+    print(f"Pipeline benchmark on {video} (extra detect delay {detect_delay * 1000:.0f}ms)")
+
+    print("Throughput, every frame processed:")
+    cap = cv2.VideoCapture(video)
+    serial = run_serial(cap, _slowed(MotionDetector(), detect_delay), stop_on_detection=False)
+    cap.release()
+    print(f"{'serial loop':<24} {serial['frames']} frames  {serial['frames'] / serial['elapsed_s']:.1f} fps")
+    for workers in worker_counts:
+        cap = cv2.VideoCapture(video)
+        summary = run_pipeline(cap, _slowed(MotionDetector(), detect_delay), workers, drop_frames=False,
+                               stop_on_detection=False)
+        cap.release()
+        frames = summary["stages"]["detect"]["frames"]
+        print(f"{'pipeline workers=%d' % workers:<24} {frames} frames  {frames / summary['elapsed_s']:.1f} fps")
+
+    if intruder_at is None:
+        return
+    print("Live camera replay: time from the intruder appearing to detection:")
+
+    def report(name: str, source: LiveReplay, detected_at: Optional[float]) -> None:
+        if detected_at is None:
+            print(f"{name:<24} not detected")
+        else:
+            latency = (detected_at - source.frame_time(intruder_at)) * 1000.0
+            print(f"{name:<24} {latency:.1f}ms  ({source.skipped} frames skipped)")
+
+    source = LiveReplay(video)
+    report("serial loop", source, run_serial(source, _slowed(MotionDetector(warmup_frames=warmup), detect_delay),
+                                             stop_on_detection=True)["detected_at"])
+    source.release()
+    for workers in worker_counts:
+        source = LiveReplay(video)
+        summary = run_pipeline(source, _slowed(MotionDetector(warmup_frames=warmup), detect_delay), workers,
+                               drop_frames=True, stop_on_detection=True)
+        source.release()
+        report(f"pipeline workers={workers}", source, summary["detected_at"])
+        print(format_stats(summary))
+
+
+def _read_frames(video: str) -> list:
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def bench_motion_suite(video: str, modes: list, intruder_at: Optional[int], rois: Optional[list],
+                       warmup: int = 30) -> None:
+    """Per-frame detector cost on every frame of the clip, and the first frame each variant flags."""
+    frames = _read_frames(video)
+    print(f"Motion detector benchmark on {video} ({len(frames)} frames, intruder at {intruder_at})")
+
+    def run(name: str, detect: Callable[[np.ndarray], bool], detector: Optional[MotionDetector] = None) -> float:
+        flagged = []
+        start = time.perf_counter()
+        for index, frame in enumerate(frames):
+            if detect(frame) and index >= warmup:
+                flagged.append(index)
+        elapsed = time.perf_counter() - start
+        first = flagged[0] if flagged else None
+        false_positives = sum(1 for index in flagged if intruder_at is None or index < intruder_at)
+        line = (f"{name:<28} {len(frames) / elapsed:8.1f} fps  {elapsed / len(frames) * 1000:.3f}ms/frame  "
+                f"first={first}  false_positives={false_positives}")
+        if detector is not None:
+            stats = detector.stats()
+            line += f"  gated={stats['gated']}  skipped={stats['skipped']}"
+        print(line)
+        return len(frames) / elapsed
+
+    subtractor = cv2.createBackgroundSubtractorMOG2()
+    baseline = run("legacy contours", lambda frame: legacy_detect_intruder(subtractor, frame))
+    for mode in modes:
+        variants = [(mode, {})]
+        if rois:
+            variants.append((f"{mode} +rois", {"rois": rois}))
+        for name, overrides in variants:
+            detector = MotionDetector.from_mode(mode, warmup_frames=warmup, **overrides)
+            fps = run(name, detector, detector)
+            print(f"{'':<28} {fps / baseline:.2f}x legacy")
+
+
+def bench_objects_suite(video: str, model: str, backend: str, batch_sizes: list, input_size: int,
+                        warmup: int = 30) -> None:
+    """Object detector throughput and per-inference latency, on every frame and behind the motion gate."""
+    frames = _read_frames(video)
+    print(f"Object detector benchmark on {video} ({len(frames)} frames, model {model}, {input_size}px input)")
+
+    def make_detector(batch: int) -> ObjectDetector:
+        """A detector on a backend that has already run once (the first run builds the network)."""
+        model_backend = load_backend(model, backend)
+        options = {"input_size": (input_size, input_size), "labels": ["person", "vehicle"], "max_batch": batch}
+        ObjectDetector(model_backend, **options).detect_batch(frames[:batch])
+        return ObjectDetector(model_backend, **options)
+
+    def report(name: str, detector: ObjectDetector, frame_count: int, elapsed: float) -> None:
+        stats = detector.stats()
+        inference = stats["inference"]
+        print(f"{name:<28} {frame_count / elapsed:8.1f} fps  inferred={stats['frames']:<4} "
+              f"batch={stats['mean_batch']:.1f}  inference p50={inference.get('latency_ms_p50', 0):.2f}ms "
+              f"p95={inference.get('latency_ms_p95', 0):.2f}ms  per_frame={stats['per_frame_ms']:.2f}ms")
+
+    print(f"Every frame ({backend} backend):")
+    for batch in batch_sizes:
+        detector = make_detector(batch)
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch):
+            detector.detect_batch(frames[i:i + batch])
+        report(f"batch={batch}", detector, len(frames), time.perf_counter() - start)
+
+    print("Motion-gated through the pipeline (workers = batch size):")
+    for batch in batch_sizes:
+        motion = MotionDetector.from_mode("fast", warmup_frames=warmup)
+        detector = make_detector(batch)
+
+        def gated(frame: np.ndarray) -> list:
+            return detector(frame) if motion(frame) else []
+
+        cap = cv2.VideoCapture(video)
+        summary = run_pipeline(cap, gated, batch, drop_frames=False, stop_on_detection=False)
+        cap.release()
+        detector.close()
+        report(f"gated batch={batch}", detector, summary["stages"]["detect"]["frames"], summary["elapsed_s"])
+
+
+def _parse_rois(text: Optional[str]) -> Optional[list]:
+    if not text:
+        return None
+    return [tuple(int(v) for v in roi.split(",")) for roi in text.split(";")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the drone vision pipeline on a recorded clip.")
+    parser.add_argument("--video", help="Video file to replay instead of the camera (default: synthetic clip)")
+    parser.add_argument("--intruder-at", type=int, help="First frame showing the intruder in --video")
+    parser.add_argument("--suite", default="pipeline,motion,objects",
+                        help="Comma-separated: pipeline, motion, objects")
+    parser.add_argument("--modes", default="full,fast,fastest", help="Comma-separated MotionDetector modes")
+    parser.add_argument("--rois", default="0,120,640,240",
+                        help="Semicolon-separated x,y,w,h regions of interest for the motion suite ('' for none)")
+    parser.add_argument("--frames", type=int, default=300, help="Synthetic clip length")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated detection worker counts")
+    parser.add_argument("--detect-delay", type=float, default=0.0,
+                        help="Extra seconds per detection, to model a heavier detector")
+    parser.add_argument("--model", help="YOLO-style detector model (default: a generated tiny ONNX network)")
+    parser.add_argument("--backend", default="auto", help="Object detector backend: auto, onnxruntime, opencv")
+    parser.add_argument("--batch-sizes", default="1,2,4", help="Comma-separated object detector batch sizes")
+    parser.add_argument("--input-size", type=int, default=320, help="Object detector input size (pixels)")
+    args = parser.parse_args()
+    suites = set(args.suite.split(","))
+
+    video, intruder_at = args.video, args.intruder_at
+    if video is None:
+        intruder_at = int(args.frames * 0.75)
+        video = make_synthetic_clip(os.path.join(tempfile.gettempdir(), "drone_benchmark_clip.avi"),
+                                    frames=args.frames, intruder_at=intruder_at)
+    workers = [int(w) for w in args.workers.split(",")]
+
+    if "pipeline" in suites:
+        bench_pipeline_suite(video, workers, args.detect_delay, intruder_at)
+
+    if "motion" in suites:
+        bench_motion_suite(video, args.modes.split(","), intruder_at, _parse_rois(args.rois))
+
+    if "objects" in suites:
+        model = args.model or make_tiny_detector_model(os.path.join(tempfile.gettempdir(), "drone_tiny_detector.onnx"),
+                                                       input_size=args.input_size)
+        bench_objects_suite(video, model, args.backend, [int(b) for b in args.batch_sizes.split(",")],
+                            args.input_size)
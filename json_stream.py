@@ -0,0 +1,201 @@
+import re
+import json
+import codecs
+from typing import Any, Iterable, Iterator, Optional, Tuple, Union
+
+_decoder = json.JSONDecoder()
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+_STRING_END = re.compile(r'["\\]')
+_WHITESPACE = " \t\n\r"
+
+
+def _decode_chunks(chunks: Iterable[Union[bytes, str]]) -> Iterator[str]:
+    """Decodes a stream of UTF-8 byte chunks, keeping multi-byte characters intact."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        text = chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_array_items(chunks: Iterable[Union[bytes, str]], key: str) -> Iterator[Any]:
+    """
+    Lazily yields the elements of the array stored under `key` in the top-level
+    JSON object, reading the stream only as far as needed.
+    Only one element is held in memory at a time; the rest of the document is
+    skipped without being parsed. Yields nothing if the key is absent.
+    """
+    text = _decode_chunks(chunks)
+    buffer = ""
+    pos = 0
+    depth = 0
+    last_string = None  # most recent string token seen at depth 1 (candidate key)
+
+    def refill() -> bool:
+        nonlocal buffer, pos
+        try:
+            more = next(text)
+        except StopIteration:
+            return False
+        buffer = buffer[pos:] + more
+        pos = 0
+        return True
+
+    # Phase 1: scan structurally until `"key": [` is found at depth 1.
+    gap = ""  # non-structural text seen since last_string closed
+    while True:
+        match = _STRUCTURAL.search(buffer, pos)
+        if match is None:
+            if last_string is not None:
+                gap += buffer[pos:].strip(_WHITESPACE)
+            pos = len(buffer)
+            if not refill():
+                return
+            continue
+        if last_string is not None:
+            gap += buffer[pos:match.start()].strip(_WHITESPACE)
+        char = match.group()
+        pos = match.end()
+        if char == '"':
+            start = scan = pos
+            while True:
+                end = _STRING_END.search(buffer, scan)
+                if end is None or (end.group() == "\\" and end.end() >= len(buffer)):
+                    # Keep the partial string (from its opening quote) and wait for more data.
+                    resume = (end.start() if end is not None else len(buffer)) - (start - 1)
+                    pos = start - 1
+                    if not refill():
+                        raise ValueError("Unterminated string in JSON stream")
+                    start, scan = 1, resume
+                    continue
+                if end.group() == "\\":
+                    scan = end.end() + 1
+                    continue
+                pos = end.end()
+                break
+            last_string = buffer[start:pos - 1] if depth == 1 else None
+            gap = ""
+            continue
+        if char == "[" and depth == 1 and last_string == key and gap == ":":
+            break
+        depth += 1 if char in "{[" else -1
+        last_string = None
+
+    # Phase 2: decode one array element at a time.
+    while True:
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE + ",":
+                pos += 1
+            if pos < len(buffer):
+                break
+            if not refill():
+                raise ValueError("Unterminated array in JSON stream")
+        if buffer[pos] == "]":
+            return
+        try:
+            item, end = _decoder.raw_decode(buffer, pos)
+            # A number is only complete once a delimiter follows it ("4." may become "4.5").
+            complete = (isinstance(item, bool) or not isinstance(item, (int, float))
+                        or (end < len(buffer) and buffer[end] in _WHITESPACE + ",]"))
+        except json.JSONDecodeError:
+            complete = False
+        if not complete:
+            if not refill():
+                item, end = _decoder.raw_decode(buffer, pos)
+                yield item
+                return
+            continue
+        pos = end
+        yield item
+
+
+class JSONValueExtractor:
+    """
+    Incrementally finds the first complete JSON object (or array) in streamed text.
+    Leading prose, markdown fences and trailing chatter are ignored; a candidate
+    that balances but fails to parse is skipped and scanning resumes after it.
+    """
+    def __init__(self, openers: str = "{"):
+        self.openers = openers
+        self._buffer = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def _reset_after(self, index: int) -> None:
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._pos = index + 1
+
+    def feed(self, text: str) -> Tuple[bool, Any]:
+        """Adds text; returns (True, value) once a complete value has been seen."""
+        self._buffer += text
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            i = self._pos
+            char = buffer[i]
+            self._pos += 1
+            if self._start is None:
+                if char in self.openers:
+                    self._start, self._depth = i, 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = buffer[self._start:i + 1]
+                    try:
+                        return True, json.loads(candidate)
+                    except json.JSONDecodeError:
+                        self._reset_after(self._start)
+        return False, None
+
+    def finish(self) -> Tuple[bool, Any]:
+        """
+        Called at end of stream. Retries from every opener so a stray unbalanced
+        bracket in leading prose doesn't hide a valid value after it.
+        """
+        for i, char in enumerate(self._buffer):
+            if char in self.openers:
+                try:
+                    return True, _decoder.raw_decode(self._buffer, i)[0]
+                except json.JSONDecodeError:
+                    continue
+        return False, None
+
+
+def extract_first_json(chunks: Iterable[str], openers: str = "{") -> Any:
+    """
+    Consumes text chunks only until the first complete JSON value closes and
+    returns it, leaving the rest of the iterable unread.
+    Raises ValueError if the stream ends without one.
+    """
+    extractor = JSONValueExtractor(openers)
+    for chunk in chunks:
+        if not chunk:
+            continue
+        found, value = extractor.feed(chunk)
+        if found:
+            return value
+    found, value = extractor.finish()
+    if found:
+        return value
+    raise ValueError("No complete JSON value found in stream")
@@ -1,16 +1,39 @@
 import os
 import sys
+import copy
 import json
 import base64
 import zlib
 import re
+import time
+import queue
+import asyncio
+import sqlite3
+import argparse
+import statistics
+import threading
+import functools
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlencode
 import requests
 import openai
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from result_cache import LRUCache, SQLiteCache, TieredCache, stable_hash
+from json_stream import extract_first_json, iter_array_items
+from typing import List, Dict, Any, Optional, Tuple, Union, Iterable, Iterator, AsyncIterator
 
 # Load environment variables
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 COMPILER_EXPLORER_API_URL = os.getenv("COMPILER_EXPLORER_API_URL", "https://godbolt.org")
+COMPILE_CACHE_PATH = os.getenv("COMPILE_CACHE_PATH")  # optional SQLite file for the on-disk compile cache
+CATALOG_CACHE_PATH = os.getenv("CATALOG_CACHE_PATH")  # optional SQLite file for language/compiler/formatter catalogs
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "3600"))
+SHORTLINK_INDEX_PATH = os.getenv("SHORTLINK_INDEX_PATH", ":memory:")  # SQLite file for the shortlink index
+MAX_RESPONSE_BYTES = int(os.getenv("MAX_RESPONSE_BYTES", str(64 * 1024 ** 2)))
+RESPONSE_CHUNK_SIZE = 64 * 1024
+ERROR_PREVIEW_BYTES = 2048
 
 if not OPENAI_API_KEY:
     print("Error: OPENAI_API_KEY environment variable not set.")
@@ -33,46 +56,532 @@ def get_authenticated_headers(additional_headers: Optional[Dict[str, str]] = Non
         headers.update(additional_headers)
     return headers
 
-def handle_api_response(response: requests.Response) -> Any:
+class APIError(Exception):
+    """
+    Raised for non-200 responses. Carries only a bounded preview of the body.
+    """
+    def __init__(self, status_code: int, body_preview: str):
+        self.status_code = status_code
+        self.body_preview = body_preview
+        super().__init__(f"API request failed: {status_code}, {body_preview}")
+
+class ResponseTooLargeError(Exception):
+    """
+    Raised when a response body exceeds the configured size cap.
+    """
+
+def iter_response_chunks(response: requests.Response, max_bytes: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Streams the (decompressed) response body, raising ResponseTooLargeError
+    as soon as more than max_bytes have been received.
+    """
+    limit = MAX_RESPONSE_BYTES if max_bytes is None else max_bytes
+    declared = response.headers.get('Content-Length')
+    if declared and declared.isdigit() and 'Content-Encoding' not in response.headers and int(declared) > limit:
+        raise ResponseTooLargeError(f"Response of {declared} bytes exceeds the {limit} byte limit")
+    received = 0
+    for chunk in response.iter_content(RESPONSE_CHUNK_SIZE):
+        received += len(chunk)
+        if received > limit:
+            raise ResponseTooLargeError(f"Response exceeds the {limit} byte limit")
+        yield chunk
+
+def _error_preview(response: requests.Response) -> str:
+    preview = bytearray()
+    try:
+        for chunk in response.iter_content(ERROR_PREVIEW_BYTES):
+            preview += chunk
+            if len(preview) >= ERROR_PREVIEW_BYTES:
+                break
+    except requests.RequestException:
+        pass
+    text = bytes(preview[:ERROR_PREVIEW_BYTES]).decode(response.encoding or 'utf-8', errors='replace')
+    return text + '...' if len(preview) >= ERROR_PREVIEW_BYTES else text
+
+def handle_api_response(response: requests.Response, max_bytes: Optional[int] = None) -> Any:
     """
     Handles API responses, checking for success and parsing JSON.
     Raises an exception if the request was unsuccessful.
+    The body is read into a single buffer capped at max_bytes
+    (MAX_RESPONSE_BYTES by default), and error messages include only a short preview.
+    The cap is the memory bound here, not streaming: the whole body is held
+    while json.loads builds the result, so peak use is a small multiple of it.
+    Use iter_compile_asm() to consume large listings incrementally.
+    """
+    try:
+        if response.status_code == 200:
+            body = bytearray()
+            for chunk in iter_response_chunks(response, max_bytes):
+                body += chunk
+            try:
+                return json.loads(body)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                return body.decode(response.encoding or 'utf-8', errors='replace')
+        else:
+            raise APIError(response.status_code, _error_preview(response))
+    finally:
+        response.close()
+
+# ---------------------------- HTTP Session Layer ---------------------------- #
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# POST endpoints without side effects, which are safe to replay. Other POSTs
+# (such as /api/shortener) are sent once.
+REPLAYABLE_POST_PATHS = ('/api/compiler/', '/api/format/')
+
+class CompilerExplorerClient:
+    """
+    Owns a pooled, keep-alive requests.Session for the Compiler Explorer API.
+    Connections are reused across calls, responses are gzip-negotiated and
+    429/5xx responses are retried with exponential backoff (honouring Retry-After).
+    Only idempotent methods and the REPLAYABLE_POST_PATHS POSTs are retried.
+    """
+    def __init__(self, api_base_url: str = COMPILER_EXPLORER_API_URL,
+                 pool_connections: int = 10,
+                 pool_maxsize: int = 20,
+                 timeout: Union[float, Tuple[float, float]] = (3.05, 60.0),
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 keep_alive: bool = True):
+        self.api_base_url = api_base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+        def adapter(allowed_methods: frozenset) -> HTTPAdapter:
+            retry = Retry(
+                total=max_retries,
+                connect=max_retries,
+                read=max_retries,
+                status=max_retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=allowed_methods,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            return HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+        idempotent = adapter(Retry.DEFAULT_ALLOWED_METHODS)
+        self.session.mount('http://', idempotent)
+        self.session.mount('https://', idempotent)
+        # requests picks the adapter with the longest matching prefix.
+        replayable = adapter(Retry.DEFAULT_ALLOWED_METHODS | {'POST'})
+        for path in REPLAYABLE_POST_PATHS:
+            self.session.mount(f"{self.api_base_url}{path}", replayable)
+        self.session.headers.update(get_authenticated_headers({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive' if keep_alive else 'close',
+        }))
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        # Bodies are read incrementally by handle_api_response/iter_response_chunks.
+        kwargs.setdefault('stream', True)
+        return self.session.request(method, f"{self.api_base_url}{path}", **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> 'CompilerExplorerClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+_clients: Dict[str, CompilerExplorerClient] = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_base_url: str = COMPILER_EXPLORER_API_URL) -> CompilerExplorerClient:
+    """
+    Returns the shared client for the given base URL, creating it on first use.
+    """
+    key = api_base_url.rstrip('/')
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = CompilerExplorerClient(key)
+        return client
+
+def set_client(client: CompilerExplorerClient) -> None:
+    """
+    Registers a custom-configured client so the module-level helpers use it.
+    """
+    with _clients_lock:
+        previous = _clients.get(client.api_base_url)
+        _clients[client.api_base_url] = client
+    if previous is not None and previous is not client:
+        previous.close()
+
+# ---------------------------- Compile Cache ---------------------------- #
+_compile_cache: Optional[TieredCache] = TieredCache(
+    LRUCache(max_entries=512),
+    SQLiteCache(COMPILE_CACHE_PATH) if COMPILE_CACHE_PATH else None,
+)
+
+def set_compile_cache(cache: Optional[TieredCache]) -> None:
+    """
+    Replaces the client-side compile cache. Pass None to disable caching.
+    """
+    global _compile_cache
+    _compile_cache = cache
+
+def compile_cache_key(api_base_url: str, compiler_id: str, payload: Dict[str, Any]) -> str:
+    """
+    Stable hash of a compile request. Fields that don't affect the result
+    (allowStoreCodeDebug, bypassCache) are excluded.
     """
-    if response.status_code == 200:
+    canonical = {k: v for k, v in payload.items() if k != "allowStoreCodeDebug"}
+    canonical["options"] = {k: v for k, v in payload.get("options", {}).items() if k != "bypassCache"}
+    return stable_hash({
+        "api": api_base_url.rstrip('/'),
+        "compiler": compiler_id,
+        "payload": canonical,
+    })
+
+# ---------------------------- Catalog Cache ---------------------------- #
+class CompilerIndex:
+    """
+    Dictionary indexes over a compiler catalog for O(1) lookups.
+    """
+    def __init__(self, compilers: List[Dict[str, Any]]):
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_language: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.by_instruction_set: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.by_language_and_instruction_set: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        for compiler in compilers:
+            language = compiler.get('lang')
+            instruction_set = compiler.get('instructionSet')
+            if 'id' in compiler:
+                self.by_id[compiler['id']] = compiler
+            if language:
+                self.by_language[language].append(compiler)
+            if instruction_set:
+                self.by_instruction_set[instruction_set].append(compiler)
+            if language and instruction_set:
+                self.by_language_and_instruction_set[(language, instruction_set)].append(compiler)
+
+    def find(self, language: Optional[str] = None,
+             instruction_set: Optional[str] = None) -> List[Dict[str, Any]]:
+        if language and instruction_set:
+            return self.by_language_and_instruction_set.get((language, instruction_set), [])
+        if language:
+            return self.by_language.get(language, [])
+        if instruction_set:
+            return self.by_instruction_set.get(instruction_set, [])
+        return list(self.by_id.values())
+
+class CatalogCache:
+    """
+    TTL cache for the language, compiler and formatter catalogs.
+    Stale entries are revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged catalog costs a 304 instead of a full download. With a disk tier,
+    a fresh entry survives process restarts and skips the fetch entirely.
+    Downloads happen outside the cache lock, and concurrent misses for the same
+    catalog share one request.
+    """
+    def __init__(self, ttl: float = CATALOG_TTL, disk: Optional[SQLiteCache] = None):
+        self.ttl = ttl
+        self.disk = disk
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._indexes: Dict[str, CompilerIndex] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(client: CompilerExplorerClient, path: str, params: Optional[Dict[str, str]]) -> str:
+        return f"{client.api_base_url}{path}?{urlencode(sorted((params or {}).items()))}"
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self._entries[key] = entry
+        return entry
+
+    def _store(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = entry
+        self._indexes.pop(key, None)
+        if self.disk is not None:
+            self.disk.put(key, entry)
+
+    def fetch(self, client: CompilerExplorerClient, path: str,
+              params: Optional[Dict[str, str]] = None) -> Any:
+        key = self._key(client, path, params)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None and time.time() - entry['fetched'] < self.ttl:
+                return entry['data']
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
         try:
-            return response.json()
-        except json.JSONDecodeError:
-            return response.text
-    else:
-        raise Exception(f"API request failed: {response.status_code}, {response.text}")
+            data = self._refresh(client, path, params, key, entry)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        future.set_result(data)
+        return data
 
+    def _refresh(self, client: CompilerExplorerClient, path: str, params: Optional[Dict[str, str]],
+                 key: str, entry: Optional[Dict[str, Any]]) -> Any:
+        """Revalidates or downloads one catalog. Only the cache updates take the lock."""
+        now = time.time()
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        response = client.get(path, params=params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            entry = dict(entry, fetched=now)
+            with self._lock:
+                self._entries[key] = entry
+                if self.disk is not None:
+                    self.disk.put(key, entry)
+            return entry['data']
+        data = handle_api_response(response)
+        with self._lock:
+            self._store(key, {
+                'data': data,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched': now,
+            })
+        return data
+
+    def compiler_index(self, client: CompilerExplorerClient, path: str,
+                       params: Optional[Dict[str, str]] = None) -> CompilerIndex:
+        data = self.fetch(client, path, params)
+        key = self._key(client, path, params)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = CompilerIndex(data)
+            return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._indexes.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+_catalog_cache = CatalogCache(
+    disk=SQLiteCache(CATALOG_CACHE_PATH, max_age=None) if CATALOG_CACHE_PATH else None,
+)
+
+def set_catalog_cache(cache: CatalogCache) -> None:
+    """
+    Replaces the catalog cache used by get_languages/get_compilers/get_formatters.
+    """
+    global _catalog_cache
+    _catalog_cache = cache
+
+# ---------------------------- Shortlink Index ---------------------------- #
+class ShortlinkIndex:
+    """
+    Local SQLite index of shortlinks.
+    Maps a canonical hash of each client state to the link created for it, so
+    sharing the same configuration again reuses the link, and keeps the
+    shortlinkinfo payload of every link seen (links are immutable, so entries
+    never expire). Hot entries are also held in memory for sub-millisecond lookups.
+    """
+    def __init__(self, path: str = SHORTLINK_INDEX_PATH, memory_entries: int = 4096):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._memory = LRUCache(max_entries=memory_entries)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " state_hash TEXT PRIMARY KEY, api TEXT NOT NULL, link_id TEXT NOT NULL,"
+            " url TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS link_info ("
+            " api TEXT NOT NULL, link_id TEXT NOT NULL, payload TEXT NOT NULL, fetched REAL NOT NULL,"
+            " PRIMARY KEY (api, link_id))"
+        )
+
+    @staticmethod
+    def state_hash(api_base_url: str, client_state: Dict[str, Any]) -> str:
+        return stable_hash({"api": api_base_url.rstrip('/'), "state": client_state})
+
+    def lookup_link(self, state_hash: str) -> Optional[str]:
+        memory_key = f"link:{state_hash}"
+        url = self._memory.get(memory_key)
+        if url is not None:
+            return url
+        with self._lock:
+            row = self._conn.execute("SELECT url FROM links WHERE state_hash = ?", (state_hash,)).fetchone()
+        if row is None:
+            return None
+        self._memory.put(memory_key, row[0])
+        return row[0]
+
+    def store_link(self, state_hash: str, api_base_url: str, url: str) -> None:
+        link_id = url.rstrip('/').rsplit('/', 1)[-1]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO links (state_hash, api, link_id, url, created) VALUES (?, ?, ?, ?, ?)",
+                (state_hash, api_base_url.rstrip('/'), link_id, url, time.time()),
+            )
+        self._memory.put(f"link:{state_hash}", url)
+
+    def lookup_info(self, api_base_url: str, link_id: str) -> Optional[Dict[str, Any]]:
+        memory_key = f"info:{api_base_url.rstrip('/')}:{link_id}"
+        payload = self._memory.get(memory_key)
+        if payload is not None:
+            return payload
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM link_info WHERE api = ? AND link_id = ?",
+                (api_base_url.rstrip('/'), link_id),
+            ).fetchone()
+        if row is None:
+            return None
+        payload = json.loads(row[0])
+        self._memory.put(memory_key, payload)
+        return payload
+
+    def store_info(self, api_base_url: str, link_id: str, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO link_info (api, link_id, payload, fetched) VALUES (?, ?, ?, ?)",
+                (api_base_url.rstrip('/'), link_id, json.dumps(payload, separators=(',', ':')), time.time()),
+            )
+        self._memory.put(f"info:{api_base_url.rstrip('/')}:{link_id}", payload)
+
+    def export_jsonl(self, path: str) -> int:
+        """
+        Writes every link and cached payload as JSONL so teams can share the index.
+        """
+        count = 0
+        with self._lock:
+            links = self._conn.execute("SELECT state_hash, api, link_id, url, created FROM links").fetchall()
+            infos = self._conn.execute("SELECT api, link_id, payload, fetched FROM link_info").fetchall()
+        with open(path, 'w', encoding='utf-8') as f:
+            for state_hash, api, link_id, url, created in links:
+                f.write(json.dumps({"type": "link", "state_hash": state_hash, "api": api,
+                                    "link_id": link_id, "url": url, "created": created}) + "\n")
+                count += 1
+            for api, link_id, payload, fetched in infos:
+                f.write(json.dumps({"type": "info", "api": api, "link_id": link_id,
+                                    "payload": json.loads(payload), "fetched": fetched}) + "\n")
+                count += 1
+        return count
+
+    def import_jsonl(self, path: str) -> int:
+        """
+        Merges records written by export_jsonl into this index in one transaction.
+        """
+        links, infos = [], []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("type") == "link":
+                    links.append((record["state_hash"], record["api"], record["link_id"],
+                                  record["url"], record.get("created", time.time())))
+                elif record.get("type") == "info":
+                    infos.append((record["api"], record["link_id"],
+                                  json.dumps(record["payload"], separators=(',', ':')),
+                                  record.get("fetched", time.time())))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO links (state_hash, api, link_id, url, created) VALUES (?, ?, ?, ?, ?)",
+                    links)
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO link_info (api, link_id, payload, fetched) VALUES (?, ?, ?, ?)",
+                    infos)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(links) + len(infos)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_shortlink_index: Optional[ShortlinkIndex] = None
+_shortlink_index_lock = threading.Lock()
+
+def get_shortlink_index() -> ShortlinkIndex:
+    """
+    Returns the shared shortlink index, opening it on first use.
+    """
+    global _shortlink_index
+    with _shortlink_index_lock:
+        if _shortlink_index is None:
+            _shortlink_index = ShortlinkIndex()
+        return _shortlink_index
+
+def set_shortlink_index(index: ShortlinkIndex) -> None:
+    global _shortlink_index
+    with _shortlink_index_lock:
+        _shortlink_index = index
+
+# ---------------------------- API Functions ---------------------------- #
 def get_languages(api_base_url: str) -> Any:
-    url = f"{api_base_url}/api/languages"
-    headers = get_authenticated_headers()
-    response = requests.get(url, headers=headers)
-    return handle_api_response(response)
+    return _catalog_cache.fetch(get_client(api_base_url), "/api/languages")
 
 def get_compilers(api_base_url: str, language_id: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
-    url = f"{api_base_url}/api/compilers/{language_id}"
-    headers = get_authenticated_headers()
     params = {}
     if fields:
         params['fields'] = ','.join(fields)
-    response = requests.get(url, headers=headers, params=params)
-    return handle_api_response(response)
+    return _catalog_cache.fetch(get_client(api_base_url), f"/api/compilers/{language_id}", params)
 
-def compile_code(api_base_url: str, compiler_id: str, source_code: str,
-                 options: Optional[Dict[str, Any]] = None,
-                 filters: Optional[Dict[str, bool]] = None,
-                 tools: Optional[List[Dict[str, Any]]] = None,
-                 libraries: Optional[List[Dict[str, str]]] = None,
-                 lang: Optional[str] = None,
-                 allow_store: bool = True,
-                 bypass_cache: Optional[int] = None) -> Dict[str, Any]:
+def find_compilers(api_base_url: str, language_id: Optional[str] = None,
+                   instruction_set: Optional[str] = None,
+                   name_contains: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Submits code for compilation.
+    Looks up compilers through the catalog indexes,
+    e.g. find_compilers(url, instruction_set='riscv64', name_contains='gcc').
+    """
+    path = f"/api/compilers/{language_id}" if language_id else "/api/compilers"
+    index = _catalog_cache.compiler_index(get_client(api_base_url), path)
+    compilers = index.find(language_id, instruction_set)
+    if name_contains:
+        needle = name_contains.lower()
+        compilers = [c for c in compilers if needle in c.get('name', '').lower()]
+    return compilers
+
+def get_compiler_by_id(api_base_url: str, compiler_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the catalog entry for a compiler id, or None if it is unknown.
+    """
+    return _catalog_cache.compiler_index(get_client(api_base_url), "/api/compilers").by_id.get(compiler_id)
+
+def build_compile_payload(source_code: str,
+                          options: Optional[Dict[str, Any]] = None,
+                          filters: Optional[Dict[str, bool]] = None,
+                          tools: Optional[List[Dict[str, Any]]] = None,
+                          libraries: Optional[List[Dict[str, str]]] = None,
+                          lang: Optional[str] = None,
+                          allow_store: bool = True,
+                          bypass_cache: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Builds the JSON body for a compile request.
     """
-    url = f"{api_base_url}/api/compiler/{compiler_id}/compile"
     payload = {
         "source": source_code,
         "options": {}
@@ -90,81 +599,641 @@ def compile_code(api_base_url: str, compiler_id: str, source_code: str,
     payload["allowStoreCodeDebug"] = allow_store
     if bypass_cache is not None:
         payload["options"]["bypassCache"] = bypass_cache
-    
-    headers = get_authenticated_headers()
-    response = requests.post(url, json=payload, headers=headers)
-    return handle_api_response(response)
+    return payload
+
+def compile_code(api_base_url: str, compiler_id: str, source_code: str,
+                 options: Optional[Dict[str, Any]] = None,
+                 filters: Optional[Dict[str, bool]] = None,
+                 tools: Optional[List[Dict[str, Any]]] = None,
+                 libraries: Optional[List[Dict[str, str]]] = None,
+                 lang: Optional[str] = None,
+                 allow_store: bool = True,
+                 bypass_cache: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Submits code for compilation.
+    Identical requests are answered from the client-side compile cache;
+    a truthy bypass_cache skips the cache lookup but still refreshes the entry.
+    The response is parsed in full (see handle_api_response); use
+    iter_compile_asm() to stream a large `asm` listing instead.
+    """
+    payload = build_compile_payload(source_code, options, filters, tools, libraries,
+                                    lang, allow_store, bypass_cache)
+    cache = _compile_cache
+    key = compile_cache_key(api_base_url, compiler_id, payload) if cache is not None else None
+    if cache is not None and not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)  # callers may modify the result; the cached entry must not change
+
+    response = get_client(api_base_url).post(f"/api/compiler/{compiler_id}/compile", json=payload)
+    result = handle_api_response(response)
+    if cache is not None:
+        cache.put(key, copy.deepcopy(result))
+    return result
+
+def iter_compile_asm(api_base_url: str, compiler_id: str, source_code: str,
+                     max_bytes: Optional[int] = None,
+                     **compile_kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Compiles code and lazily yields the `asm` lines as the response streams in,
+    so multi-megabyte listings never need to be held in memory at once.
+    Bypasses the compile cache.
+    """
+    payload = build_compile_payload(source_code, **compile_kwargs)
+    response = get_client(api_base_url).post(f"/api/compiler/{compiler_id}/compile", json=payload)
+    try:
+        if response.status_code != 200:
+            handle_api_response(response)
+        yield from iter_array_items(iter_response_chunks(response, max_bytes), "asm")
+    finally:
+        response.close()
 
 def get_formatters(api_base_url: str) -> List[Dict[str, Any]]:
     """
     Fetches the list of available code formatters.
     """
-    url = f"{api_base_url}/api/formats"
-    headers = get_authenticated_headers()
-    response = requests.get(url, headers=headers)
-    return handle_api_response(response)
+    return _catalog_cache.fetch(get_client(api_base_url), "/api/formats")
 
 def format_code(api_base_url: str, formatter: str, source_code: str,
                 base_style: str, use_spaces: bool = True, tab_width: int = 4) -> Dict[str, Any]:
     """
     Formats code using a specified formatter.
     """
-    url = f"{api_base_url}/api/format/{formatter}"
     payload = {
         "source": source_code,
         "base": base_style,
         "useSpaces": use_spaces,
         "tabWidth": tab_width
     }
-    headers = get_authenticated_headers()
-    response = requests.post(url, json=payload, headers=headers)
+    response = get_client(api_base_url).post(f"/api/format/{formatter}", json=payload)
     return handle_api_response(response)
 
 def create_shortlink(api_base_url: str, client_state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Creates a shortlink for the given client state.
+    A state that was already shared returns its existing link from the local index.
     """
-    url = f"{api_base_url}/api/shortener"
-    headers = get_authenticated_headers()
-    response = requests.post(url, json=client_state, headers=headers)
+    index = get_shortlink_index()
+    state_hash = index.state_hash(api_base_url, client_state)
+    url = index.lookup_link(state_hash)
+    if url is not None:
+        return {"url": url}
+    response = get_client(api_base_url).post("/api/shortener", json=client_state)
+    result = handle_api_response(response)
+    if isinstance(result, dict) and result.get("url"):
+        index.store_link(state_hash, api_base_url, result["url"])
+    return result
+
+def fetch_shortlink_info(api_base_url: str, link_id: str) -> Dict[str, Any]:
+    """
+    Requests a shortlink's information from the API, bypassing the local index.
+    """
+    response = get_client(api_base_url).get(f"/api/shortlinkinfo/{link_id}")
     return handle_api_response(response)
 
 def get_shortlink_info(api_base_url: str, link_id: str) -> Dict[str, Any]:
     """
     Retrieves information about a given shortlink.
+    Links are immutable, so known links are resolved from the local index.
     """
-    url = f"{api_base_url}/api/shortlinkinfo/{link_id}"
-    headers = get_authenticated_headers()
-    response = requests.get(url, headers=headers)
-    return handle_api_response(response)
+    index = get_shortlink_index()
+    payload = index.lookup_info(api_base_url, link_id)
+    if payload is not None:
+        return payload
+    payload = fetch_shortlink_info(api_base_url, link_id)
+    if isinstance(payload, dict):
+        index.store_info(api_base_url, link_id, payload)
+    return payload
 
-def analyze_user_input(user_input: str) -> Dict[str, Any]:
+# ---------------------------- Async API ---------------------------- #
+async def async_compile_code(api_base_url: str, compiler_id: str, source_code: str,
+                             timeout: Optional[float] = None,
+                             executor: Optional[ThreadPoolExecutor] = None,
+                             **compile_kwargs) -> Dict[str, Any]:
     """
-    Uses OpenAI's language model to analyze and interpret user input.
+    Awaitable variant of compile_code.
+    The blocking call runs on an executor thread and shares the pooled session,
+    so concurrent compiles reuse the same keep-alive connections.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(compile_code, api_base_url, compiler_id, source_code, **compile_kwargs)
+    future = loop.run_in_executor(executor, call)
+    if timeout is None:
+        return await future
+    return await asyncio.wait_for(future, timeout)
+
+async def compile_matrix(source_code: str, compiler_ids: Iterable[str],
+                         api_base_url: str = COMPILER_EXPLORER_API_URL,
+                         concurrency: int = 8,
+                         timeout: Optional[float] = 60.0,
+                         **compile_kwargs) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Compiles the same source against many compilers concurrently.
+    At most `concurrency` requests are in flight at once; results are yielded as
+    they complete, each as {"compiler_id", "result", "error", "elapsed"}.
+    A failing or timed-out compiler is reported in "error" instead of aborting the matrix.
+    Keep `concurrency` at or below the client's pool_maxsize so every request reuses a connection.
     """
-    prompt = (
+    semaphore = asyncio.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="compile-matrix")
+
+    async def run_one(compiler_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            start = time.perf_counter()
+            result, error = None, None
+            try:
+                result = await async_compile_code(api_base_url, compiler_id, source_code,
+                                                  timeout=timeout, executor=executor,
+                                                  **compile_kwargs)
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"Compilation with {compiler_id} timed out after {timeout}s")
+            except Exception as e:
+                error = e
+            return {
+                "compiler_id": compiler_id,
+                "result": result,
+                "error": error,
+                "elapsed": time.perf_counter() - start,
+            }
+
+    tasks = [asyncio.ensure_future(run_one(compiler_id)) for compiler_id in compiler_ids]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False)
+
+# ---------------------------- User Input Analysis ---------------------------- #
+ANALYSIS_MODEL = "gpt-4"
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH")  # optional SQLite file for cached analyses
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", "8"))
+ANALYSIS_BATCH_WAIT = float(os.getenv("ANALYSIS_BATCH_WAIT", "0.02"))  # seconds to wait for batch-mates
+
+LANGUAGE_ALIASES = {
+    'c': 'c', 'h': 'c',
+    'cpp': 'c++', 'c++': 'c++', 'cc': 'c++', 'cxx': 'c++', 'hpp': 'c++',
+    'rust': 'rust', 'rs': 'rust',
+    'go': 'go', 'golang': 'go',
+    'python': 'python', 'py': 'python', 'python3': 'python',
+    'java': 'java',
+    'zig': 'zig',
+    'swift': 'swift',
+    'kotlin': 'kotlin', 'kt': 'kotlin',
+    'haskell': 'haskell', 'hs': 'haskell',
+    'asm': 'assembly', 'assembly': 'assembly', 's': 'assembly', 'nasm': 'assembly',
+    'bash': 'bash', 'sh': 'bash', 'shell': 'bash',
+    'js': 'javascript', 'javascript': 'javascript',
+    'ts': 'typescript', 'typescript': 'typescript',
+}
+
+_FENCE_RE = re.compile(r"```[ \t]*([\w+#.-]*)[ \t]*\n(.*?)```", re.DOTALL)
+_SHEBANG_RE = re.compile(r"^#!\s*(?:\S*/)?(?:env\s+)?(?:\S*/)?([A-Za-z]+)", re.MULTILINE)
+_FILENAME_RE = re.compile(r"\b[\w-]+\.(c|h|cpp|cc|cxx|hpp|rs|go|py|java|zig|swift|kt|hs|s|sh|js|ts)\b", re.IGNORECASE)
+_KEYWORD_HEURISTICS = [
+    ('rust', re.compile(r"\bfn\s+\w+\s*\(.*?\)\s*(->|\{)|\blet\s+mut\b|\bimpl\b.*\{")),
+    ('go', re.compile(r"^\s*package\s+\w+\s*$.*\bfunc\s", re.MULTILINE | re.DOTALL)),
+    ('java', re.compile(r"\bpublic\s+(static\s+)?(class|void)\b")),
+    ('c++', re.compile(r"#include\s*<(iostream|vector|string|memory|map|algorithm)>|\bstd::|\btemplate\s*<|\bnamespace\b")),
+    ('c', re.compile(r"#include\s*[<\"]\w+\.h[>\"]")),
+    ('python', re.compile(r"^\s*(def|class)\s+\w+.*:\s*$|^\s*import\s+\w+\s*$", re.MULTILINE)),
+]
+_ACTION_KEYWORDS = [
+    ('compile', re.compile(r"\b(compile|compiling|build|assemble|assembly output|disassemble|asm)\b", re.IGNORECASE)),
+    ('format', re.compile(r"\b(format|formatting|reformat|prettify|clang-format|indent)\b", re.IGNORECASE)),
+    ('execute', re.compile(r"\b(run|execute|output of)\b", re.IGNORECASE)),
+]
+
+def _normalize_language(name: Optional[str]) -> Optional[str]:
+    return LANGUAGE_ALIASES.get(name.lower()) if name else None
+
+def _detect_language(user_input: str, code: str) -> Optional[str]:
+    shebang = _SHEBANG_RE.search(code)
+    if shebang and _normalize_language(shebang.group(1)):
+        return _normalize_language(shebang.group(1))
+    filename = _FILENAME_RE.search(user_input)
+    if filename:
+        return _normalize_language(filename.group(1))
+    for language, pattern in _KEYWORD_HEURISTICS:
+        if pattern.search(code):
+            return language
+    return None
+
+def local_analyze(user_input: str) -> Optional[Dict[str, Any]]:
+    """
+    Rule-based fast path for analyze_user_input.
+    Handles inputs with a fenced code block whose language is obvious from the
+    fence tag, a shebang, a file name or keyword heuristics. Returns None when
+    the input needs the language model.
+    """
+    fence = _FENCE_RE.search(user_input)
+    if fence is None:
+        return None
+    code = fence.group(2).rstrip('\n')
+    language = _normalize_language(fence.group(1)) or _detect_language(user_input, code)
+    if not language or not code.strip():
+        return None
+    prose = user_input[:fence.start()] + user_input[fence.end():]
+    actions = [action for action, pattern in _ACTION_KEYWORDS if pattern.search(prose)]
+    return {
+        "language": language,
+        "source_code": code,
+        "actions": actions or None,
+    }
+
+def _normalize_user_input(user_input: str) -> str:
+    lines = user_input.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip()
+
+def _analysis_prompt(user_input: str) -> str:
+    return (
         "You are a helpful assistant that analyzes user requests for code compilation and formatting.\n"
         "Extract the following information from the user's input:\n"
         "- Programming language\n"
         "- Source code\n"
         "- Desired actions (e.g., compile, format)\n"
-        "Respond with a JSON object containing these fields. If any field is not applicable, set it to null.\n"
+        "Respond with a JSON object with the keys \"language\", \"source_code\" and \"actions\" (a list). "
+        "If any field is not applicable, set it to null.\n"
         f"User input: \"{user_input}\"\nResponse:"
     )
+
+def _batch_analysis_prompt(user_inputs: List[str]) -> str:
+    numbered = "\n".join(f"{i + 1}. \"{text}\"" for i, text in enumerate(user_inputs))
+    return (
+        "You are a helpful assistant that analyzes user requests for code compilation and formatting.\n"
+        f"For each of the {len(user_inputs)} numbered user inputs below, extract:\n"
+        "- Programming language\n"
+        "- Source code\n"
+        "- Desired actions (e.g., compile, format)\n"
+        f"Respond with a JSON array of exactly {len(user_inputs)} objects in the same order, each with the keys "
+        "\"language\", \"source_code\" and \"actions\" (a list). "
+        "If any field is not applicable, set it to null.\n"
+        f"User inputs:\n{numbered}\nResponse:"
+    )
+
+def _request_analysis_json(prompt: str, max_tokens: int, openers: str = "{") -> Any:
+    """
+    Streams the model reply and returns the first complete JSON value as soon as
+    it closes, closing the stream so the remaining tokens aren't waited for.
+    Prose or markdown fences around the JSON are ignored.
+    """
+    stream = openai.ChatCompletion.create(
+        model=ANALYSIS_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a code assistant."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens,
+        temperature=0.2,
+        stream=True,
+    )
+    deltas = (chunk['choices'][0]['delta'].get('content') or '' for chunk in stream)
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a code assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=300,
-            temperature=0.2,
-        )
-        assistant_reply = response['choices'][0]['message']['content']
-        extracted_info = json.loads(assistant_reply.strip())
-        return extracted_info
+        return extract_first_json(deltas, openers)
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+
+def _analyze_batch_with_model(user_inputs: List[str]) -> List[Dict[str, Any]]:
+    """
+    Analyzes several inputs with one model call. Falls back to one call per
+    input if the batched reply can't be matched up with the inputs.
+    """
+    if len(user_inputs) == 1:
+        return [_analyze_with_model(user_inputs[0])]
+    try:
+        results = _request_analysis_json(_batch_analysis_prompt(user_inputs), 300 * len(user_inputs), openers="[")
+        if isinstance(results, list) and len(results) == len(user_inputs) \
+                and all(isinstance(r, dict) for r in results):
+            return results
+    except Exception as e:
+        print(f"Error during batched OpenAI API call: {e}")
+    return [_analyze_with_model(text) for text in user_inputs]
+
+def _analyze_with_model(user_input: str) -> Dict[str, Any]:
+    try:
+        extracted_info = _request_analysis_json(_analysis_prompt(user_input), 300)
+        return extracted_info if isinstance(extracted_info, dict) else {}
     except Exception as e:
         print(f"Error during OpenAI API call: {e}")
         return {}
 
+class MicroBatcher:
+    """
+    Coalesces concurrent submissions into batches.
+    Items arriving within max_wait seconds of the first one (up to max_batch)
+    are handed to batch_fn together; batch_fn must return one result per item.
+    Batches are processed on a small thread pool so slow calls don't stall collection.
+    """
+    def __init__(self, batch_fn, max_batch: int = 8, max_wait: float = 0.02, workers: int = 4):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="micro-batch")
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="micro-batcher", daemon=True)
+                self._thread.start()
+        return future
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[Tuple[Any, Future]]) -> None:
+        try:
+            results = self.batch_fn([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+_analysis_cache = TieredCache(
+    LRUCache(max_entries=1024),
+    SQLiteCache(ANALYSIS_CACHE_PATH) if ANALYSIS_CACHE_PATH else None,
+)
+_analysis_batcher = MicroBatcher(_analyze_batch_with_model, ANALYSIS_BATCH_SIZE, ANALYSIS_BATCH_WAIT)
+analysis_stats: Dict[str, int] = defaultdict(int)
+
+def analyze_user_input(user_input: str) -> Dict[str, Any]:
+    """
+    Uses OpenAI's language model to analyze and interpret user input.
+    Easy inputs (a fenced code block with an obvious language) are answered
+    locally, repeated inputs come from the analysis cache, and the rest are
+    micro-batched with other concurrent requests into a single model call.
+    """
+    local = local_analyze(user_input)
+    if local is not None:
+        analysis_stats['local'] += 1
+        return local
+    key = stable_hash({"model": ANALYSIS_MODEL, "input": _normalize_user_input(user_input)})
+    cached = _analysis_cache.get(key)
+    if cached is not None:
+        analysis_stats['cached'] += 1
+        return copy.deepcopy(cached)  # callers may modify the result; the cached entry must not change
+    analysis_stats['model'] += 1
+    extracted_info = _analysis_batcher.submit(user_input).result()
+    if extracted_info:
+        _analysis_cache.put(key, copy.deepcopy(extracted_info))
+    return extracted_info
+
+def analyze_user_inputs(user_inputs: List[str]) -> List[Dict[str, Any]]:
+    """
+    Analyzes many inputs at once; model-bound inputs share batched calls.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(len(user_inputs), ANALYSIS_BATCH_SIZE * 4))) as pool:
+        return list(pool.map(analyze_user_input, user_inputs))
+
+# ---------------------------- Batch Pipeline ---------------------------- #
+SOURCE_EXTENSIONS = ('.c', '.cc', '.cpp', '.cxx', '.h', '.hpp', '.rs', '.go', '.zig', '.s')
+
+def load_sources(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yields {"id", "source", ...} records from a directory of source files
+    or a JSONL manifest. Manifest lines carry either "source" or a "path"
+    relative to the manifest, plus optional "id", "lang" and "compilers".
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(SOURCE_EXTENSIONS):
+                    full_path = os.path.join(root, name)
+                    with open(full_path, encoding='utf-8') as f:
+                        yield {"id": os.path.relpath(full_path, path), "source": f.read()}
+        return
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding='utf-8') as manifest:
+        for line in manifest:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "source" not in record:
+                with open(os.path.join(base_dir, record["path"]), encoding='utf-8') as f:
+                    record["source"] = f.read()
+            record.setdefault("id", record.get("path"))
+            yield record
+
+class PipelineStats:
+    """
+    Thread-safe per-stage latency samples plus overall throughput.
+    """
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies[stage].append(seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counts[name] += amount
+
+    def report(self) -> str:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        lines = [
+            f"Sources: {self.counts['sources']}, compiles: {self.counts['compiles']}, "
+            f"errors: {self.counts['errors']}, skipped (resumed): {self.counts['skipped']}",
+            f"Elapsed: {elapsed:.2f}s, throughput: {self.counts['compiles'] / elapsed if elapsed else 0:.2f} compiles/s",
+        ]
+        for stage, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            lines.append(f"{stage:<8} n={len(ordered)} p50={statistics.median(ordered) * 1000:.1f}ms "
+                         f"p95={p95 * 1000:.1f}ms max={ordered[-1] * 1000:.1f}ms")
+        return "\n".join(lines)
+
+def _compact_results(output_path: str) -> set:
+    """
+    Prepares output_path for a resumed run and returns the (id, compiler) pairs
+    already done. Failed, duplicate and torn records are dropped by rewriting
+    the file, since those pairs are about to be retried and appended again.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    dropped = 0
+    tmp_path = output_path + '.tmp'
+    with open(output_path, encoding='utf-8') as f, open(tmp_path, 'w', encoding='utf-8') as out:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                dropped += 1  # a torn last line from an interrupted run
+                continue
+            key = (record["id"], record["compiler"])
+            if record.get("error") is not None or key in done:
+                dropped += 1
+                continue
+            done.add(key)
+            out.write(line if line.endswith("\n") else line + "\n")
+    if dropped:
+        os.replace(tmp_path, output_path)
+    else:
+        os.remove(tmp_path)
+    return done
+
+def run_pipeline(api_base_url: str, sources: Iterable[Dict[str, Any]], compiler_ids: List[str],
+                 output_path: str,
+                 formatter: Optional[str] = None,
+                 base_style: str = "Google",
+                 options: Optional[Dict[str, Any]] = None,
+                 filters: Optional[Dict[str, bool]] = None,
+                 concurrency: int = 8,
+                 resume: bool = True) -> PipelineStats:
+    """
+    Formats (optionally) and compiles every source against every compiler,
+    appending one JSONL record per (source, compiler) to output_path.
+    Format and compile run on separate thread pools, so the next file is
+    formatted while earlier compiles are still in flight. With resume=True,
+    pairs that already have a successful record in output_path are skipped
+    and earlier failed records are removed before their pairs are retried.
+    """
+    stats = PipelineStats()
+    done = _compact_results(output_path) if resume else set()
+    results: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+    # Bound the number of sources held in memory at once.
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+    format_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pipeline-format")
+    compile_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pipeline-compile")
+
+    def writer() -> None:
+        with open(output_path, 'a' if resume else 'w', encoding='utf-8') as out:
+            while True:
+                record = results.get()
+                if record is None:
+                    return
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+
+    def compile_stage(record: Dict[str, Any], source: str, compiler_id: str,
+                      format_error: Optional[str], remaining: List[int], lock: threading.Lock) -> None:
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = compile_code(api_base_url, compiler_id, source, options=options, filters=filters,
+                                  lang=record.get("lang"))
+        except Exception as e:
+            error = str(e)
+        elapsed = time.perf_counter() - start
+        stats.record("compile", elapsed)
+        stats.count("compiles")
+        if error:
+            stats.count("errors")
+        results.put({
+            "id": record["id"],
+            "compiler": compiler_id,
+            "formatted": formatter is not None and format_error is None,
+            "format_error": format_error,
+            "error": error,
+            "compile_ms": round(elapsed * 1000, 3),
+            "result": result,
+        })
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            in_flight.release()
+
+    def format_stage(record: Dict[str, Any], pending: List[str]) -> None:
+        source, format_error = record["source"], None
+        if formatter:
+            start = time.perf_counter()
+            try:
+                formatted = format_code(api_base_url, formatter, source, base_style)
+                if formatted.get("exit", 0) == 0 and "answer" in formatted:
+                    source = formatted["answer"]
+                else:
+                    format_error = formatted.get("answer") or "formatter failed"
+            except Exception as e:
+                format_error = str(e)
+            stats.record("format", time.perf_counter() - start)
+        remaining, lock = [len(pending)], threading.Lock()
+        for compiler_id in pending:
+            compile_pool.submit(compile_stage, record, source, compiler_id, format_error, remaining, lock)
+
+    writer_thread = threading.Thread(target=writer, name="pipeline-writer", daemon=True)
+    writer_thread.start()
+    try:
+        for record in sources:
+            record_compilers = record.get("compilers") or compiler_ids
+            pending = [c for c in record_compilers if (record["id"], c) not in done]
+            stats.count("skipped", len(record_compilers) - len(pending))
+            if not pending:
+                continue
+            stats.count("sources")
+            in_flight.acquire()
+            format_pool.submit(format_stage, record, pending)
+    finally:
+        format_pool.shutdown(wait=True)
+        compile_pool.shutdown(wait=True)
+        results.put(None)
+        writer_thread.join()
+        stats.finished = time.perf_counter()
+    return stats
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Batch format and compile sources with Compiler Explorer.")
+    parser.add_argument("input", nargs="?", help="Directory of source files or a JSONL manifest")
+    parser.add_argument("--compilers", help="Comma-separated compiler ids")
+    parser.add_argument("--output", default="compile_results.jsonl", help="JSONL results file")
+    parser.add_argument("--formatter", help="Formatter to run before compiling (e.g. clangformat)")
+    parser.add_argument("--base-style", default="Google", help="Formatter base style")
+    parser.add_argument("--user-arguments", default="", help="Compiler flags, e.g. '-O2'")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    parser.add_argument("--api-url", default=COMPILER_EXPLORER_API_URL)
+    parser.add_argument("--import-shortlinks", metavar="JSONL", help="Merge an exported shortlink index and exit")
+    parser.add_argument("--export-shortlinks", metavar="JSONL", help="Export the shortlink index and exit")
+    args = parser.parse_args(argv)
+
+    if args.import_shortlinks or args.export_shortlinks:
+        index = get_shortlink_index()
+        if args.import_shortlinks:
+            print(f"Imported {index.import_jsonl(args.import_shortlinks)} shortlink records")
+        if args.export_shortlinks:
+            print(f"Exported {index.export_jsonl(args.export_shortlinks)} shortlink records")
+        return
+    if not args.input or not args.compilers:
+        parser.error("input and --compilers are required")
+
+    stats = run_pipeline(
+        args.api_url,
+        load_sources(args.input),
+        [c.strip() for c in args.compilers.split(',') if c.strip()],
+        args.output,
+        formatter=args.formatter,
+        base_style=args.base_style,
+        options={"userArguments": args.user_arguments} if args.user_arguments else None,
+        concurrency=args.concurrency,
+        resume=not args.no_resume,
+    )
+    print(stats.report())
+
+if __name__ == "__main__":
+    main()
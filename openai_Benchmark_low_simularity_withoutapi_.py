@@ -1,275 +1,1704 @@
 import openai
+import os
+import sys
 import time
 import json
+import bisect
+import asyncio
+import zlib
+import random
+import gzip
+import hashlib
+import atexit
+import argparse
 import psutil
 import logging
+import threading
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from result_cache import LRUCache, SQLiteCache, TieredCache, stable_hash
 # Initialize OpenAI API client with your API key
 openai.api_key = ""
 
-class FineTuningManager:
-    def create_fine_tuning_job(self, training_file_id):
-        try:
-            response = openai.FineTuning.create(training_file=training_file_id)
-            logging.info(f"Created fine-tuning job: {response['id']}")
-            print(f"Created fine-tuning job: {response['id']}")
-        except Exception as e:
-            logging.error(f"Error creating fine-tuning job: {str(e)}")
-            print(f"Error creating fine-tuning job: {str(e)}")
 
-    def create_fine_tuning_job_json(self, coding_prompts, filename='training_data.json'):
-        try:
-            with open(filename, 'w') as f:
-                json.dump(coding_prompts, f, indent=4)
-            logging.info(f"fine-tuning data saved to {filename}")
-            print(f"fine-tuning data saved to {filename}")
-        except Exception as e:
-            logging.error(f"Error saving fine-tuning data: {str(e)}")
-            print(f"Error saving fine-tuning data: {str(e)}")
+_encoding = None
+_encoding_loaded = False
 
-    def list_fine_tuning_jobs(self):
-        try:
-            response = openai.FineTuning.list()
-            logging.info("Listed fine-tuning jobs.")
-            print("fine-tuning jobs:")
-            for job in response['data']:
-                print(f"ID: {job['id']}, Status: {job['status']}")
-        except Exception as e:
-            logging.error(f"Error listing fine-tuning jobs: {str(e)}")
-            print(f"Error listing fine-tuning jobs: {str(e)}")
 
-    def retrieve_fine_tune_state(self, job_id):
+def count_tokens(text):
+    """
+    Counts tokens with tiktoken's cl100k_base encoding when it is available
+    locally, otherwise estimates about four characters per token.
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
         try:
-            response = openai.fineTuning.retrieve(id=job_id)
-            logging.info(f"Job {job_id} state: {response['status']}")
-            print(f"Job {job_id} state: {response['status']}")
-        except Exception as e:
-            logging.error(f"Error retrieving job state: {str(e)}")
-            print(f"Error retrieving job state: {str(e)}")
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4) if text else 0
 
-    def cancel_fine_tuning_job(self, job_id):
-        try:
-            response = openai.FineTuning.cancel(id=job_id)
-            logging.info(f"Cancelled fine-tuning job: {response['id']}")
-            print(f"Cancelled fine-tuning job: {response['id']}")
-        except Exception as e:
-            logging.error(f"Error cancelling fine-tuning job: {str(e)}")
-            print(f"Error cancelling fine-tuning job: {str(e)}")
 
-    def list_fine_tuning_job_events(self, job_id):
-        try:
-            response = openai.fineTuning.list_events(id=job_id)
-            logging.info(f"Events for job {job_id}:")
-            print(f"Events for job {job_id}:")
-            for event in response['data']:
-                print(f"Event: {event['message']}")
-        except Exception as e:
-            logging.error(f"Error listing job events: {str(e)}")
-            print(f"Error listing job events: {str(e)}")
+def estimate_tokens(messages, max_tokens=0):
+    """Rough token estimate (about four characters per token) used for rate limiting."""
+    return sum(len(m.get('content') or '') // 4 + 4 for m in messages) + max_tokens
 
-    def delete_fine_tuned_model(self, model_id):
+
+class RateLimiter:
+    """Token buckets for requests-per-minute and tokens-per-minute budgets."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute,
+                                 self._requests + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute,
+                               self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def acquire(self, tokens=0):
+        """Blocks until one request and `tokens` tokens fit in the budgets."""
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                delay = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    delay = (1 - self._requests) * 60.0 / self.requests_per_minute
+                if self.tokens_per_minute and self._tokens < tokens:
+                    delay = max(delay, (tokens - self._tokens) * 60.0 / self.tokens_per_minute)
+                if delay == 0.0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return
+            time.sleep(delay)
+
+    def adjust(self, tokens):
+        """Returns (positive) or charges (negative) tokens once actual usage is known."""
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._tokens = min(self.tokens_per_minute, self._tokens + tokens)
+
+
+class ShingleIndex:
+    """
+    Near-duplicate lookup over hashed character-shingle vectors.
+    Texts are embedded as L2-normalised bags of character n-grams hashed into
+    a fixed number of dimensions; a query is one matrix-vector product against
+    all stored rows. The least recently used row is replaced once full.
+    """
+
+    def __init__(self, dimensions=1024, max_entries=10000, ngram=4):
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.ngram = ngram
+        # Rows are preallocated; only the first _count are in use.
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._scope_ids = np.zeros(max_entries, dtype=np.int32)
+        self._count = 0
+        self._keys = [None] * max_entries
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    def embed(self, text):
+        text = " ".join(text.lower().split())
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if len(text) < self.ngram:
+            text = text.ljust(self.ngram)
+        shingles = {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+        buckets = np.fromiter((zlib.crc32(s.encode('utf-8')) % self.dimensions for s in shingles),
+                              dtype=np.int64, count=len(shingles))
+        np.add.at(vector, buckets, 1.0)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _scope_id(self, scope):
+        """Maps a scope string to a small int id, assigning one on first use. Called under the lock."""
+        return self._scopes.setdefault(scope, len(self._scopes))
+
+    def query(self, vector, scope, threshold):
+        """Returns (key, similarity) of the closest entry in scope, or (None, best similarity)."""
+        with self._lock:
+            n = self._count
+            scope_id = self._scopes.get(scope)
+            if not n or scope_id is None:
+                return None, 0.0
+            similarities = np.where(self._scope_ids[:n] == scope_id, self._vectors[:n] @ vector, -1.0)
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                return None, float(max(similarities[best], 0.0))
+            self._last_used[best] = time.time()
+            return self._keys[best], float(similarities[best])
+
+    def add(self, key, scope, vector):
+        with self._lock:
+            if self._count < self.max_entries:
+                slot = self._count
+                self._count += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._last_used[slot] = time.time()
+            self._scope_ids[slot] = self._scope_id(scope)
+            self._keys[slot] = key
+
+    def __len__(self):
+        return self._count
+
+    def save(self, path):
+        with self._lock:
+            n = self._count
+            names = {scope_id: scope for scope, scope_id in self._scopes.items()}
+            tmp_path = path + '.tmp.npz'
+            np.savez(tmp_path, vectors=self._vectors[:n], last_used=self._last_used[:n],
+                     keys=np.array(self._keys[:n], dtype=str),
+                     scopes=np.array([names[i] for i in self._scope_ids[:n]], dtype=str))
+            os.replace(tmp_path, path)
+
+    def load(self, path):
+        # Keys and scopes are stored as fixed-width strings, so the file never needs unpickling.
+        with np.load(path, allow_pickle=False) as data:
+            with self._lock:
+                # Keep the most recently used rows if the file holds more than fit.
+                order = np.argsort(data['last_used'])[-self.max_entries:]
+                n = len(order)
+                self._vectors[:n] = data['vectors'][order]
+                self._last_used[:n] = data['last_used'][order]
+                keys, scopes = data['keys'], data['scopes']
+                for slot, row in enumerate(order):
+                    self._keys[slot] = str(keys[row])
+                    self._scope_ids[slot] = self._scope_id(str(scopes[row]))
+                self._count = n
+
+
+class CompletionCache:
+    """
+    Cache for chat completions.
+    The exact tier is keyed on (model_id, messages, max_tokens, temperature).
+    The optional near-duplicate tier (set near_duplicate_threshold, e.g. 0.95)
+    answers prompts whose shingle vectors are at least that cosine-similar to a
+    cached prompt for the same model and settings. With a path, both tiers are
+    persisted: the exact tier in SQLite (written through) and the vectors in an
+    .npz file, saved from put() at most every save_interval seconds and on
+    close() / interpreter exit.
+    """
+
+    def __init__(self, path=None, max_entries=10000, max_bytes=256 * 1024 ** 2,
+                 near_duplicate_threshold=None, dimensions=1024, save_interval=30.0):
+        self.path = path
+        self.save_interval = save_interval
+        self.exact = TieredCache(
+            LRUCache(max_entries=max_entries),
+            SQLiteCache(path + '.sqlite', max_bytes=max_bytes, max_age=None) if path else None,
+        )
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.index = ShingleIndex(dimensions, max_entries) if near_duplicate_threshold else None
+        if self.index is not None and path and os.path.exists(path + '.npz'):
+            try:
+                self.index.load(path + '.npz')
+            except ValueError as e:
+                # Files from older versions hold pickled object arrays, which are not loaded.
+                logging.warning(f"Ignoring near-duplicate index {path}.npz: {e}")
+        self.stats = {"exact_hits": 0, "near_hits": 0, "misses": 0, "latency_saved": 0.0}
+        self._stats_lock = threading.Lock()
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        if self.index is not None and path:
+            atexit.register(self.close)
+
+    @staticmethod
+    def _prompt_text(messages):
+        return "\n".join(f"{m.get('role')}: {m.get('content') or ''}" for m in messages)
+
+    def _count(self, name, latency=0.0):
+        with self._stats_lock:
+            self.stats[name] += 1
+            self.stats["latency_saved"] += latency
+
+    def get(self, model_id, messages, max_tokens, temperature):
+        key = stable_hash([model_id, messages, max_tokens, temperature])
+        entry = self.exact.get(key)
+        if entry is not None:
+            self._count("exact_hits", entry["latency"])
+            return entry["content"]
+        if self.index is not None:
+            scope = f"{model_id}|{max_tokens}|{temperature}"
+            near_key, _ = self.index.query(self.index.embed(self._prompt_text(messages)), scope,
+                                           self.near_duplicate_threshold)
+            entry = self.exact.get(near_key) if near_key is not None else None
+            if entry is not None:
+                self._count("near_hits", entry["latency"])
+                return entry["content"]
+        self._count("misses")
+        return None
+
+    def put(self, model_id, messages, max_tokens, temperature, content, latency):
+        key = stable_hash([model_id, messages, max_tokens, temperature])
+        self.exact.put(key, {"content": content, "latency": latency})
+        if self.index is not None:
+            scope = f"{model_id}|{max_tokens}|{temperature}"
+            self.index.add(key, scope, self.index.embed(self._prompt_text(messages)))
+            self._dirty = True
+            if self.path and time.monotonic() - self._saved_at >= self.save_interval:
+                self.save()
+
+    def hit_rate(self):
+        with self._stats_lock:
+            hits = self.stats["exact_hits"] + self.stats["near_hits"]
+            total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def save(self):
+        """Persists the near-duplicate vectors (the exact tier is written through to SQLite)."""
+        if self.index is not None and self.path:
+            self._saved_at = time.monotonic()
+            self._dirty = False
+            self.index.save(self.path + '.npz')
+
+    def close(self):
+        """Saves unsaved near-duplicate vectors; safe to call more than once."""
+        if self._dirty:
+            self.save()
+
+
+VALID_ROLES = ("system", "user", "assistant", "function", "tool")
+
+
+def validate_training_record(record):
+    """
+    Returns None if record is a valid prompt/completion or chat example,
+    otherwise a short description of the problem.
+    """
+    if not isinstance(record, dict):
+        return "record is not an object"
+    if "messages" in record:
+        messages = record["messages"]
+        if not isinstance(messages, list) or not messages:
+            return "messages must be a non-empty list"
+        for message in messages:
+            if not isinstance(message, dict) or message.get("role") not in VALID_ROLES:
+                return "message with missing or unknown role"
+            if not isinstance(message.get("content"), str):
+                return "message content must be a string"
+        return None
+    if isinstance(record.get("prompt"), str) and isinstance(record.get("completion"), str):
+        return None
+    return "expected 'messages' or string 'prompt' and 'completion'"
+
+
+def record_tokens(record):
+    if "messages" in record:
+        return sum(count_tokens(m["content"]) + 4 for m in record["messages"])
+    return count_tokens(record["prompt"]) + count_tokens(record["completion"])
+
+
+class TrainingDataWriter:
+    """
+    Streams training records to compact JSONL, rolling over to a new shard
+    once max_shard_bytes (uncompressed) would be exceeded.
+    Records are validated as they arrive (invalid ones are skipped and counted),
+    and each shard's record count, token count, size and SHA-256 of the
+    uncompressed content are computed in the same pass. Only one record is
+    held in memory at a time.
+    """
+
+    def __init__(self, filename, max_shard_bytes=None, compress=False):
+        self.filename = filename
+        self.max_shard_bytes = max_shard_bytes
+        self.compress = compress
+        self.shards = []
+        self.skipped = 0
+        self._file = None
+        self._shard = None
+        self._hash = None
+
+    def _shard_path(self, number):
+        base, ext = os.path.splitext(self.filename)
+        path = f"{base}-{number:05d}{ext}" if self.max_shard_bytes else self.filename
+        return path + '.gz' if self.compress else path
+
+    def _open_shard(self):
+        path = self._shard_path(len(self.shards))
+        self._file = gzip.open(path, 'wb', compresslevel=6) if self.compress else open(path, 'wb')
+        self._hash = hashlib.sha256()
+        self._shard = {"path": path, "records": 0, "bytes": 0, "tokens": 0}
+        self.shards.append(self._shard)
+
+    def _close_shard(self):
+        if self._file is not None:
+            self._file.close()
+            self._shard["sha256"] = self._hash.hexdigest()
+            self._file = None
+
+    def write(self, record):
+        problem = validate_training_record(record)
+        if problem is not None:
+            self.skipped += 1
+            if self.skipped <= 10:
+                logging.warning(f"Skipping invalid training record: {problem}")
+            return False
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        if self._file is None or (self.max_shard_bytes and self._shard["records"]
+                                  and self._shard["bytes"] + len(line) > self.max_shard_bytes):
+            self._close_shard()
+            self._open_shard()
+        self._file.write(line)
+        self._hash.update(line)
+        self._shard["records"] += 1
+        self._shard["bytes"] += len(line)
+        self._shard["tokens"] += record_tokens(record)
+        return True
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+        return self
+
+    def close(self):
+        self._close_shard()
+        return {"shards": self.shards, "skipped": self.skipped,
+                "records": sum(s["records"] for s in self.shards),
+                "tokens": sum(s["tokens"] for s in self.shards)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# ---------------------------- Dataset Validation ---------------------------- #
+DEFAULT_CONTEXT_TOKENS = 16385
+VALIDATION_CHUNK_BYTES = 16 * 1024 ** 2
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def check_role_order(messages):
+    """Returns None if a chat example is well ordered, otherwise a short description."""
+    if any(m["role"] == "system" for m in messages[1:]):
+        return "system message after the first position"
+    turns = [m["role"] for m in messages if m["role"] in ("user", "assistant")]
+    if not turns or turns[0] != "user":
+        return "conversation must start with a user message"
+    if any(a == b for a, b in zip(turns, turns[1:])):
+        return "user and assistant messages must alternate"
+    if turns[-1] != "assistant":
+        return "conversation must end with an assistant message"
+    return None
+
+
+def _record_text(record):
+    if "messages" in record:
+        return "\n".join(m["content"] for m in record["messages"])
+    return record["prompt"] + "\n" + record["completion"]
+
+
+def simhash_batch(texts, ngram=3):
+    """
+    64-bit SimHash of each text over word n-grams; near-identical texts differ in
+    only a few bits. Hashes a whole batch in a few NumPy passes.
+    """
+    words, lengths = [], []
+    for text in texts:
+        hashes = [zlib.crc32(w.encode('utf-8')) for w in text.lower().split()]
+        hashes += [0] * (ngram - len(hashes))  # pad short texts to one full n-gram
+        words.extend(hashes)
+        lengths.append(len(hashes))
+    if not lengths:
+        return np.zeros(0, dtype=np.uint64)
+    words = np.array(words, dtype=np.uint64)
+    lengths = np.array(lengths)
+    ends = np.cumsum(lengths)
+    count = len(words) - ngram + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for i in range(ngram):
+        hashes = hashes * np.uint64(0x100000001B3) + words[i:i + count]
+    # Keep only n-grams that don't cross into the next text.
+    valid = np.arange(count) <= np.repeat(ends - ngram, lengths)[:count]
+    hashes = hashes[valid]
+    # splitmix64 finaliser spreads the combined hash over all 64 bits.
+    hashes ^= hashes >> np.uint64(30)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(27)
+    hashes *= np.uint64(0x94D049BB133111EB)
+    hashes ^= hashes >> np.uint64(31)
+    per_text = lengths - ngram + 1
+    # One row per bit position so each per-text sum runs over contiguous memory.
+    columns = np.ascontiguousarray(hashes.view(np.uint8).reshape(-1, 8).T)
+    bits = np.unpackbits(columns, axis=0, bitorder='little')
+    votes = np.add.reduceat(bits, np.cumsum(per_text) - per_text, axis=1, dtype=np.int32) * 2 - per_text
+    packed = np.packbits(votes > 0, axis=0, bitorder='little')
+    return np.ascontiguousarray(packed.T).view(np.uint64).ravel()
+
+
+def simhash(text, ngram=3):
+    return int(simhash_batch([text], ngram)[0])
+
+
+def _file_chunks(path, chunk_bytes):
+    if path.endswith('.gz'):
+        return [(path, 0, None)]
+    size = os.path.getsize(path)
+    return [(path, start, min(start + chunk_bytes, size)) for start in range(0, max(size, 1), chunk_bytes)]
+
+
+def _validate_chunk(path, start, end, max_tokens, near_duplicates):
+    """
+    Validates the lines that start inside [start, end) of one file.
+    Runs in a worker process; returns compact NumPy arrays rather than per-record objects.
+    """
+    errors = {}
+    examples = []
+    records = invalid = over_length = 0
+    tokens, digests, fingerprints, texts = [], [], [], []
+
+    def fail(kind, offset):
+        nonlocal invalid
+        invalid += 1
+        errors[kind] = errors.get(kind, 0) + 1
+        if len(examples) < 20:
+            examples.append({"file": path, "offset": offset, "error": kind})
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        offset = start
+        if start > 0:
+            f.seek(start - 1)
+            offset = start - 1 + len(f.readline())  # finish the line that straddles `start`
+        while end is None or offset < end:
+            line = f.readline()
+            if not line:
+                break
+            line_offset, offset = offset, offset + len(line)
+            if not line.strip():
+                continue
+            records += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                fail("invalid JSON", line_offset)
+                continue
+            problem = validate_training_record(record)
+            if problem is None and "messages" in record:
+                problem = check_role_order(record["messages"])
+            if problem is not None:
+                fail(problem, line_offset)
+                continue
+            count = record_tokens(record)
+            tokens.append(count)
+            if count > max_tokens:
+                over_length += 1
+                if len(examples) < 20:
+                    examples.append({"file": path, "offset": line_offset, "error": f"{count} tokens"})
+            canonical = json.dumps(record, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            digests.append(int.from_bytes(hashlib.blake2b(canonical, digest_size=8).digest(), 'little'))
+            if near_duplicates:
+                texts.append(_record_text(record))
+                if len(texts) >= 4096:
+                    fingerprints.append(simhash_batch(texts))
+                    texts = []
+    if texts:
+        fingerprints.append(simhash_batch(texts))
+    return {
+        "records": records,
+        "invalid": invalid,
+        "over_length": over_length,
+        "errors": errors,
+        "examples": examples,
+        "tokens": np.array(tokens, dtype=np.int64),
+        "digests": np.array(digests, dtype=np.uint64),
+        "fingerprints": np.concatenate(fingerprints) if fingerprints else np.zeros(0, dtype=np.uint64),
+        "bytes": offset - start,
+    }
+
+
+def _count_near_duplicates(fingerprints, digests, max_distance=3):
+    """
+    Counts records within max_distance bits of another record's SimHash.
+    Any two fingerprints that close agree exactly on at least one of four 16-bit
+    bands, so sorting by each band and comparing neighbours finds most pairs in
+    O(n log n). Exact duplicates are excluded.
+    """
+    if len(fingerprints) < 2:
+        return 0
+    flagged = np.zeros(len(fingerprints), dtype=bool)
+    for band in range(4):
+        keys = (fingerprints >> np.uint64(16 * band)) & np.uint64(0xFFFF)
+        order = np.lexsort((fingerprints, keys))
+        a, b = order[:-1], order[1:]
+        same_band = keys[a] == keys[b]
+        distance = _POPCOUNT[(fingerprints[a] ^ fingerprints[b]).view(np.uint8)].reshape(-1, 8).sum(axis=1)
+        close = same_band & (distance <= max_distance) & (digests[a] != digests[b])
+        flagged[a[close]] = True
+        flagged[b[close]] = True
+    return int(flagged.sum())
+
+
+def validate_training_files(paths, max_tokens=DEFAULT_CONTEXT_TOKENS, workers=None,
+                            chunk_bytes=VALIDATION_CHUNK_BYTES, near_duplicates=True):
+    """
+    Validates JSONL training files before upload.
+    Files are split into newline-aligned byte ranges scanned in parallel by a
+    process pool (gzip shards are scanned whole). Checks schema and chat role
+    order, counts tokens, flags examples over max_tokens, and finds exact and
+    near-duplicate records. Returns a summary report dict.
+    """
+    started = time.perf_counter()
+    chunks = [chunk for path in paths for chunk in _file_chunks(path, chunk_bytes)]
+    report = {"files": list(paths), "records": 0, "invalid": 0, "over_length": 0,
+              "errors": {}, "examples": [], "bytes": 0}
+    tokens, digests, fingerprints = [], [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_validate_chunk, path, start, end, max_tokens, near_duplicates)
+                   for path, start, end in chunks]
+        for future in futures:
+            part = future.result()
+            for key in ("records", "invalid", "over_length", "bytes"):
+                report[key] += part[key]
+            for kind, count in part["errors"].items():
+                report["errors"][kind] = report["errors"].get(kind, 0) + count
+            report["examples"].extend(part["examples"][:max(0, 20 - len(report["examples"]))])
+            tokens.append(part["tokens"])
+            digests.append(part["digests"])
+            fingerprints.append(part["fingerprints"])
+    tokens = np.concatenate(tokens) if tokens else np.zeros(0, dtype=np.int64)
+    digests = np.concatenate(digests) if digests else np.zeros(0, dtype=np.uint64)
+    _, counts = np.unique(digests, return_counts=True)
+    report["valid"] = report["records"] - report["invalid"]
+    report["exact_duplicates"] = int((counts - 1).sum())
+    report["near_duplicates"] = _count_near_duplicates(np.concatenate(fingerprints), digests) \
+        if near_duplicates and fingerprints else None
+    report["tokens"] = {
+        "total": int(tokens.sum()),
+        "max": int(tokens.max()) if len(tokens) else 0,
+        "mean": float(tokens.mean()) if len(tokens) else 0.0,
+        "p50": float(np.percentile(tokens, 50)) if len(tokens) else 0.0,
+        "p95": float(np.percentile(tokens, 95)) if len(tokens) else 0.0,
+    }
+    report["elapsed"] = time.perf_counter() - started
+    report["mb_per_s"] = report["bytes"] / 1024 ** 2 / report["elapsed"] if report["elapsed"] else 0.0
+    report["ok"] = report["invalid"] == 0 and report["over_length"] == 0
+    return report
+
+
+def format_validation_report(report):
+    lines = [
+        f"Records: {report['records']} ({report['valid']} valid, {report['invalid']} invalid)",
+        f"Tokens: total={report['tokens']['total']} mean={report['tokens']['mean']:.1f} "
+        f"p50={report['tokens']['p50']:.0f} p95={report['tokens']['p95']:.0f} max={report['tokens']['max']}",
+        f"Over length: {report['over_length']}, exact duplicates: {report['exact_duplicates']}, "
+        f"near duplicates: {report['near_duplicates']}",
+        f"Scanned {report['bytes'] / 1024 ** 2:.1f} MB in {report['elapsed']:.2f}s ({report['mb_per_s']:.1f} MB/s)",
+    ]
+    for kind, count in sorted(report["errors"].items(), key=lambda item: -item[1]):
+        lines.append(f"  {count:>8}  {kind}")
+    return "\n".join(lines)
+
+
+# ---------------------------- Resource Sampling ---------------------------- #
+class ResourceSampler:
+    """
+    Samples system and process resource usage on a background thread.
+    Readings go into a fixed-size NumPy ring buffer (one row per sample, one
+    column per metric), so sampling allocates nothing and never blocks callers:
+    CPU percentages are measured since the previous sample rather than over a
+    blocking interval. Counter columns (IO, network) hold cumulative values.
+    """
+    GAUGES = ("cpu_percent", "process_cpu_percent", "memory_used", "rss")
+    COUNTERS = ("disk_read_bytes", "disk_write_bytes", "process_read_bytes", "process_write_bytes",
+                "net_bytes_sent", "net_bytes_recv")
+
+    def __init__(self, interval=1.0, capacity=3600, pid=None):
+        self.interval = interval
+        self.capacity = capacity
+        self.cores = psutil.cpu_count() or 1
+        self.columns = ("timestamp",) + self.GAUGES + self.COUNTERS + tuple(
+            f"cpu{i}_percent" for i in range(self.cores))
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._buffer = np.full((capacity, len(self.columns)), np.nan, dtype=np.float64)
+        self._count = 0  # total samples written; the next row is _count % capacity
+        self._process = psutil.Process(pid)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._prime()
+
+    def _prime(self):
+        # psutil measures CPU since the previous call; the very first call returns 0.
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+        self._process.cpu_percent(interval=None)
+
+    def _read_row(self, row):
+        row[0] = time.time()
+        row[1] = psutil.cpu_percent(interval=None)
+        row[2] = self._process.cpu_percent(interval=None)
+        row[3] = psutil.virtual_memory().used
+        row[4] = self._process.memory_info().rss
+        disk = psutil.disk_io_counters()
+        if disk is not None:
+            row[5], row[6] = disk.read_bytes, disk.write_bytes
         try:
-            response = openai.Model.delete(model=model_id)
-            logging.info(f"Deleted model: {response['id']}")
-            print(f"Deleted model: {response['id']}")
-        except Exception as e:
-            logging.error(f"Error deleting model: {str(e)}")
-            print(f"Error deleting model: {str(e)}")
+            io = self._process.io_counters()
+            row[7], row[8] = io.read_bytes, io.write_bytes
+        except (AttributeError, psutil.Error):
+            pass  # not available on every platform
+        net = psutil.net_io_counters()
+        if net is not None:
+            row[9], row[10] = net.bytes_sent, net.bytes_recv
+        per_core = psutil.cpu_percent(interval=None, percpu=True)
+        row[11:11 + len(per_core)] = per_core
 
-    def create_completion(self, model_id, messages, max_tokens=150, temperature=0.7):
+    def sample(self):
+        """Takes one reading immediately (without waiting for the next tick)."""
+        row = np.full(len(self.columns), np.nan)
         try:
-            response = openai.ChatCompletion.create(
-                model=model_id,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
-            logging.info(f"Completion: {response['choices'][0]['message']['content']}")
-            print(f"Completion: {response['choices'][0]['message']['content']}")
-            return response['choices'][0]['message']['content']
-        except Exception as e:
-            logging.error(f"Error creating completion: {str(e)}")
-            print(f"Error creating completion: {str(e)}")
+            self._read_row(row)
+        except psutil.Error as e:
+            logging.warning(f"Resource sample failed: {str(e)}")
+            return
+        with self._lock:
+            self._buffer[self._count % self.capacity] = row
+            self._count += 1
+
+    def _run(self):
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            # Schedule against a fixed cadence so slow samples don't accumulate drift.
+            deadline += self.interval
+            delay = deadline - time.monotonic()
+            if delay < 0:
+                deadline = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def snapshot(self, window=None):
+        """Copy of the buffered samples, oldest first; window limits it to the last N seconds."""
+        with self._lock:
+            count = self._count
+            if count <= self.capacity:
+                data = self._buffer[:count].copy()
+            else:
+                start = count % self.capacity
+                data = np.concatenate((self._buffer[start:], self._buffer[:start]))
+        if window is not None and len(data):
+            data = data[data[:, 0] >= data[-1, 0] - window]
+        return data
+
+    def latest(self):
+        """The most recent sample as a dict, or None before the first sample."""
+        with self._lock:
+            if not self._count:
+                return None
+            row = self._buffer[(self._count - 1) % self.capacity].copy()
+        return dict(zip(self.columns, row.tolist()))
+
+    def rates(self, data):
+        """Per-second rates of the counter columns between consecutive samples."""
+        elapsed = np.diff(data[:, 0])
+        elapsed[elapsed <= 0] = np.nan
+        columns = [self._index[name] for name in self.COUNTERS]
+        return np.diff(data[:, columns], axis=0) / elapsed[:, None]
+
+    def percentiles(self, window=None, percentiles=(50, 95, 99)):
+        """
+        Rolling percentiles of every metric over the last `window` seconds.
+        Counters are reported as per-second rates (e.g. net_bytes_sent_per_s).
+        """
+        data = self.snapshot(window)
+        result = {}
+        if not len(data):
+            return result
+        series = [(name, data[:, self._index[name]]) for name in self.columns[1:] if name not in self.COUNTERS]
+        if len(data) > 1:
+            rates = self.rates(data)
+            series += [(f"{name}_per_s", rates[:, i]) for i, name in enumerate(self.COUNTERS)]
+        for name, column in series:
+            if not np.isnan(column).all():  # unsupported metrics stay NaN
+                result[name] = dict(zip((f"p{p}" for p in percentiles),
+                                        np.nanpercentile(column, percentiles).tolist()))
+        return result
+
+    def to_csv(self, path, window=None):
+        data = self.snapshot(window)
+        np.savetxt(path, data, delimiter=",", header=",".join(self.columns), comments="", fmt="%.6f")
+        return len(data)
+
+    def to_prometheus(self, prefix="finetune_host", window=None, percentiles=(50, 95, 99)):
+        """Prometheus text exposition: latest gauges and counters plus rolling quantile summaries."""
+        latest = self.latest()
+        if latest is None:
+            return ""
+        lines = []
+        for name in self.GAUGES:
+            metric = f"{prefix}_{name}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {latest[name]:.15g}"]
+        lines.append(f"# TYPE {prefix}_core_cpu_percent gauge")
+        lines += [f'{prefix}_core_cpu_percent{{core="{i}"}} {latest[f"cpu{i}_percent"]:.6g}'
+                  for i in range(self.cores)]
+        for name in self.COUNTERS:
+            if not np.isnan(latest[name]):
+                metric = f"{prefix}_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {latest[name]:.0f}"]
+        for name, quantiles in self.percentiles(window, percentiles).items():
+            if name.startswith("cpu") and name[3].isdigit():
+                continue  # per-core quantiles would swamp the output
+            metric = f"{prefix}_{name}_window"
+            lines.append(f"# TYPE {metric} summary")
+            lines += [f'{metric}{{quantile="{p / 100:g}"}} {quantiles[f"p{p}"]:.15g}' for p in percentiles]
+        return "\n".join(lines) + "\n"
+
+
+# ---------------------------- Instrumentation ---------------------------- #
+class Histogram:
+    """
+    Log-bucketed histogram (about 4% relative error) with constant memory.
+    Buckets grow by 2**(1/16) from `lowest`; zero and negative values share bucket 0.
+    """
+    GROWTH = 2 ** (1 / 16)
+
+    def __init__(self, lowest=1e-3, buckets=768):
+        self.lowest = lowest
+        self.counts = np.zeros(buckets, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def _bucket(self, value):
+        if value <= self.lowest:
+            return 0
+        return min(len(self.counts) - 1, 1 + int(np.log(value / self.lowest) / np.log(self.GROWTH)))
+
+    def record(self, value):
+        self.counts[self._bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, pct):
+        if not self.count:
             return None
+        rank = max(1, int(np.ceil(pct / 100.0 * self.count)))
+        bucket = int(np.searchsorted(np.cumsum(self.counts), rank))
+        # Geometric midpoint of the bucket, clamped to the observed range.
+        value = self.lowest * self.GROWTH ** (bucket - 0.5) if bucket else self.lowest
+        return min(max(value, self.min), self.max)
 
-    def get_sensor_data(self):
-        cpu_usage = psutil.cpu_percent(interval=1)
-        memory_info = psutil.virtual_memory()
-        return {
-            "cpu_usage": cpu_usage,
-            "memory_total": memory_info.total,
-            "memory_used": memory_info.used,
-            "memory_free": memory_info.free
-        }
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean": self.total / self.count, "min": self.min, "max": self.max,
+                "p50": self.percentile(50), "p95": self.percentile(95), "p99": self.percentile(99)}
 
-    def monitor_resources(self):
-        print("Monitoring resources...")
-        try:
-            while True:
-                sensor_data = self.get_sensor_data()
-                print(f"CPU Usage: {sensor_data['cpu_usage']}%")
-                print(f"Memory Used: {sensor_data['memory_used'] / (1024 ** 2):.2f} MB")
-                print(f"Memory Free: {sensor_data['memory_free'] / (1024 ** 2):.2f} MB")
-                time.sleep(5)  # Update every 5 seconds
-        except KeyboardInterrupt:
-            print("Resource monitoring stopped.")
-
-    def list_available_models(self):
-        try:
-            response = openai.Model.list()
-            print("Available models:")
-            for model in response['data']:
-                print(f"Model ID: {model['id']}, Type: {model['object']}")
-        except Exception as e:
-            logging.error(f"Error listing available models: {str(e)}")
-            print(f"Error listing available models: {str(e)}")
 
-# Example usage
-if __name__ == "__main__":
-    manager = 'FineTuningManager'()
+class CallSpan:
+    """
+    Measurements for one API call, filled in inside MetricsStore.span().
+    Call first_token() when the first streamed token arrives and set_response()
+    (or set_usage()) once the reply is in.
+    """
+    __slots__ = ("method", "model", "started", "start", "wall_ms", "ttft_ms", "status", "retries",
+                 "prompt_tokens", "completion_tokens", "request_bytes", "response_bytes", "error", "cached")
 
-    # Example training file and model IDs
-    training_file_id = "file-abc123"  # Example training file ID
-    job_id = "ftjob-abc123"  # Provided job ID
-    model_id = "gpt-4.0-turbo"  # ChatGPT-4.0 Mini model ID
+    def __init__(self, method, model):
+        self.method = method
+        self.model = model
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.wall_ms = self.ttft_ms = None
+        self.status = None
+        self.retries = 0
+        self.prompt_tokens = self.completion_tokens = None
+        self.request_bytes = self.response_bytes = None
+        self.error = None
+        self.cached = False
 
-    # Generate fine-tuning data (mock data for example)
-    coding_prompts = [
-        {
-            "prompt": "How do I implement a simple RISC-V assembly loop?",
-            "completion": "Here is an example of a RISC-V assembly loop:\n\n```\n"
-                          "loop:\n"
-                          "    addi t0, t0, 1\n"
-                          "    bne t0, t1, loop\n"
-                          "```"
-        },
-        {
-            "prompt": "What is the purpose of the RISC-V `beq` instruction?",
-            "completion": "The `beq` instruction is used to branch to a specified address if two registers are equal."
-        }
-    ]
+    def first_token(self):
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self.start) * 1000.0
 
-    # Save fine-tuning data to JSON
-    manager.create_fine_tuning_job_json(coding_prompts)
+    def retry(self):
+        self.retries += 1
 
-    # Create a fine-tuning job
-    manager.create_fine_tuning_job(training_file_id)
+    def set_request(self, params):
+        self.request_bytes = len(json.dumps(params, default=str))
 
-    # List fine-tuning jobs
-    manager.list_fine_tuning_jobs()
+    def set_usage(self, usage):
+        if usage:
+            self.prompt_tokens = usage.get('prompt_tokens')
+            self.completion_tokens = usage.get('completion_tokens')
 
-    # Retrieve the state of the fine-tune job
-    manager.retrieve_fine_tune_state(job_id)
+    def set_response(self, response):
+        self.status = 200
+        self.set_usage(response.get('usage'))
+        self.response_bytes = len(json.dumps(response, default=str))
 
-    # Cancel the fine-tuning job (optional if needed)
-    # manager.cancel_fine_tuning_job(job_id)
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != "start"}
 
-    # List events from the fine-tuning job
-    manager.list_fine_tuning_job_events(job_id)
 
-    # Delete the fine-tuned model (if necessary)
-    # manager.delete_fine_tuned_model(model_id)
+class MetricsStore:
+    """
+    In-process store of per-call metrics, keyed by (method, model).
+    Keeps histograms of wall time, time to first token and token counts, plus
+    status and retry counters, and a bounded in-memory trace of recent calls
+    (optionally also appended to a JSONL file as calls finish).
+    """
+    HISTOGRAMS = ("wall_ms", "ttft_ms", "prompt_tokens", "completion_tokens", "request_bytes", "response_bytes")
 
-    # Create a completion using the fine-tuned GPT-4 Mini model with RISC-V information
-    manager.create_completion(model_id, [
-        {"role": "system", "content": "Sure, here is information about RISC-V."},
-        {"role": "user", "content": "What is the difference between RISC-V and ARM?"}
-    ], max_tokens=300, temperature=0.6)
+    def __init__(self, trace_capacity=10000, trace_path=None):
+        self.enabled = True
+        self._histograms = {}
+        self._counters = {}
+        self._trace = deque(maxlen=trace_capacity)
+        self._trace_file = open(trace_path, 'a', buffering=1024 * 1024) if trace_path else None
+        self._lock = threading.Lock()
 
-    # Monitor system resources
-    # Uncomment to start monitoring
-    # manager.monitor_resources()
+    def span(self, method, model=None):
+        """Context manager timing one call; exceptions are recorded and re-raised."""
+        return _SpanContext(self, method, model)
 
-    # List available models
-    manager.list_available_models()
+    def record(self, span):
+        if not self.enabled:
+            return
+        key = (span.method, span.model)
+        with self._lock:
+            histograms = self._histograms.get(key)
+            if histograms is None:
+                histograms = self._histograms[key] = {name: Histogram() for name in self.HISTOGRAMS}
+            if not span.cached:  # cache hits would drag the latency percentiles towards zero
+                for name in self.HISTOGRAMS:
+                    value = getattr(span, name)
+                    if value is not None:
+                        histograms[name].record(value)
+            counters = self._counters.setdefault(key, {"calls": 0, "errors": 0, "retries": 0,
+                                                       "cached": 0, "status": {}})
+            counters["calls"] += 1
+            counters["errors"] += span.error is not None
+            counters["retries"] += span.retries
+            counters["cached"] += span.cached
+            if span.status is not None:
+                counters["status"][span.status] = counters["status"].get(span.status, 0) + 1
+            entry = span.as_dict()
+            self._trace.append(entry)
+            if self._trace_file is not None:
+                self._trace_file.write(json.dumps(entry) + '\n')
+
+    def _grouped(self, group):
+        merged = {}
+        for (method, model), histograms in self._histograms.items():
+            key = group(method, model)
+            target = merged.get(key)
+            if target is None:
+                target = merged[key] = ({name: Histogram() for name in self.HISTOGRAMS},
+                                        {"calls": 0, "errors": 0, "retries": 0, "cached": 0, "status": {}})
+            for name, histogram in histograms.items():
+                target[0][name].merge(histogram)
+            counters = self._counters[(method, model)]
+            for name in ("calls", "errors", "retries", "cached"):
+                target[1][name] += counters[name]
+            for status, count in counters["status"].items():
+                target[1]["status"][status] = target[1]["status"].get(status, 0) + count
+        return {key: dict(counters, **{name: h.summary() for name, h in histograms.items()})
+                for key, (histograms, counters) in merged.items()}
+
+    def report(self):
+        """Summary with p50/p95/p99 per method, per model and per (method, model)."""
+        with self._lock:
+            return {
+                "by_method": self._grouped(lambda method, model: method),
+                "by_model": self._grouped(lambda method, model: model or "-"),
+                "by_method_and_model": {f"{method} {model}": summary for (method, model), summary in
+                                        self._grouped(lambda method, model: (method, model or "-")).items()},
+            }
+
+    def format_report(self):
+        lines = [f"{'method':<28} {'model':<20} {'calls':>6} {'err':>4} "
+                 f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ttft p50':>9} {'tokens':>9}"]
+        with self._lock:
+            grouped = self._grouped(lambda method, model: (method, model or "-"))
+        for (method, model), summary in sorted(grouped.items()):
+            wall, ttft = summary["wall_ms"], summary["ttft_ms"]
+            tokens = summary["prompt_tokens"].get("count") and \
+                summary["prompt_tokens"]["mean"] + summary["completion_tokens"].get("mean", 0)
+            lines.append(f"{method:<28} {model:<20} {summary['calls']:>6} {summary['errors']:>4} "
+                         f"{wall.get('p50', 0):>9.2f} {wall.get('p95', 0):>9.2f} {wall.get('p99', 0):>9.2f} "
+                         f"{ttft.get('p50') or 0:>9.2f} {tokens or 0:>9.1f}")
+        return "\n".join(lines)
+
+    def export_trace(self, path):
+        """Writes the in-memory trace (most recent calls) as JSONL; returns the number of spans."""
+        with self._lock:
+            entries = list(self._trace)
+        with open(path, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+        return len(entries)
+
+    def flush(self):
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+
+class _SpanContext:
+    def __init__(self, store, method, model):
+        self.store = store
+        self.span = CallSpan(method, model)
+
+    def __enter__(self):
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.wall_ms = (time.perf_counter() - span.start) * 1000.0
+        if exc is not None:
+            span.error = type(exc).__name__
+            span.status = getattr(exc, 'http_status', None)
+        self.store.record(span)
+        return False
+
+
+# ---------------------------- Listings ---------------------------- #
+def iter_pages(list_page, limit=None, after=None, page_size=20):
+    """
+    Lazily yields items from an OpenAI-style paginated list endpoint.
+    list_page(limit, after) returns {"data": [...], "has_more": bool}; the next
+    page is only requested once the caller has consumed the current one.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        page = list_page(size, after)
+        data = page["data"]
+        for item in data:
+            yield item
+        if remaining is not None:
+            remaining -= len(data)
+        if not data or not page.get("has_more"):
+            return
+        after = data[-1]["id"]
+
+
+class ListingCache:
+    """
+    Short-TTL local copy of a listing, indexed for cheap repeated queries.
+    Items are indexed by id, by each field in `indexes` and by creation time.
+    Once the TTL expires the next query refreshes incrementally: pages are read
+    newest first and reading stops as soon as every cached item that can still
+    change has been seen again and a final (is_final) item is reached, so a
+    dashboard refreshing every few seconds fetches about one page per refresh.
+    Without is_final every refresh reads the whole listing.
+    """
+
+    def __init__(self, list_page, indexes=(), ttl=5.0, is_final=None, page_size=100):
+        self.list_page = list_page
+        self.indexes = tuple(indexes)
+        self.ttl = ttl
+        self.is_final = is_final
+        self.page_size = page_size
+        self.refreshed_at = None
+        self.stats = {"refreshes": 0, "pages": 0, "queries": 0}
+        self._items = {}
+        self._index = {field: {} for field in self.indexes}
+        self._created = []  # sorted (created_at, id)
+        self._lock = threading.Lock()
+
+    def _counted_page(self, limit, after):
+        self.stats["pages"] += 1
+        return self.list_page(limit, after)
+
+    def _remove(self, item_id):
+        item = self._items.pop(item_id)
+        for field in self.indexes:
+            ids = self._index[field].get(item.get(field))
+            if ids is not None:
+                ids.discard(item_id)
+        created = (item.get("created_at") or item.get("created") or 0, item_id)
+        position = bisect.bisect_left(self._created, created)
+        if position < len(self._created) and self._created[position] == created:
+            del self._created[position]
+
+    def _add(self, item):
+        item_id = item["id"]
+        if item_id in self._items:
+            self._remove(item_id)
+        self._items[item_id] = item
+        for field in self.indexes:
+            self._index[field].setdefault(item.get(field), set()).add(item_id)
+        bisect.insort(self._created, (item.get("created_at") or item.get("created") or 0, item_id))
+
+    def refresh(self):
+        with self._lock:
+            if self.is_final is None or self.refreshed_at is None:
+                items = list(iter_pages(self._counted_page, page_size=self.page_size))
+                self._items, self._created = {}, []
+                self._index = {field: {} for field in self.indexes}
+                for item in items:
+                    self._add(item)
+            else:
+                pending = {item_id for item_id, item in self._items.items() if not self.is_final(item)}
+                for item in iter_pages(self._counted_page, page_size=self.page_size):
+                    known = self._items.get(item["id"])
+                    self._add(item)
+                    pending.discard(item["id"])
+                    if not pending and known is not None and self.is_final(known):
+                        break
+            self.refreshed_at = time.monotonic()
+            self.stats["refreshes"] += 1
+
+    def stale(self):
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at > self.ttl
+
+    def invalidate(self):
+        # Incremental caches keep their items and just expire; the rest start over.
+        with self._lock:
+            if self.is_final is None or self.refreshed_at is None:
+                self.refreshed_at = None
+            else:
+                self.refreshed_at -= self.ttl + 1
+
+    def query(self, limit=None, created_after=None, created_before=None, **filters):
+        """
+        Yields cached items newest first, refreshing first if the TTL expired.
+        filters match indexed fields exactly, e.g. query(status="running").
+        """
+        if self.stale():
+            self.refresh()
+        with self._lock:
+            self.stats["queries"] += 1
+            if filters:
+                candidates = None
+                for field, value in filters.items():
+                    ids = self._index[field].get(value, set())
+                    candidates = set(ids) if candidates is None else candidates & ids
+                keys = sorted((self._created_of(item_id), item_id) for item_id in candidates)
+                keys = [key for key in keys if (created_after is None or key[0] > created_after)
+                        and (created_before is None or key[0] < created_before)]
+            else:
+                low = 0 if created_after is None else \
+                    bisect.bisect_right(self._created, (created_after, '\uffff'))
+                high = len(self._created) if created_before is None else \
+                    bisect.bisect_left(self._created, (created_before, ''))
+                keys = self._created[low:high]
+            selected = [self._items[item_id] for _, item_id in keys[::-1][:limit]]
+        return iter(selected)
+
+    def _created_of(self, item_id):
+        item = self._items[item_id]
+        return item.get("created_at") or item.get("created") or 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+# ---------------------------- Job Watching ---------------------------- #
+TERMINAL_JOB_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class FineTuningJobWatcher:
+    """
+    Tracks many fine-tuning jobs with adaptive polling.
+    Each job is polled on its own schedule: a base interval per status that
+    grows by `backoff` every poll that brings nothing new (up to max_interval)
+    and resets on any change. Only events newer than the last one seen are
+    fetched, and the per-job cursors are saved to cursor_path (if given) so a
+    restarted watcher resumes where it stopped. Terminal jobs are dropped once
+    their final events have been delivered.
+
+    retrieve(job_id) and list_events(job_id, limit, after) default to the
+    OpenAI API and can be replaced (e.g. by FineTuningManager's instrumented
+    calls, or a fake in tests).
+    """
+    POLL_INTERVALS = {"validating_files": 10.0, "queued": 30.0, "running": 5.0}
+
+    def __init__(self, cursor_path=None, retrieve=None, list_events=None, poll_intervals=None,
+                 backoff=1.5, max_interval=120.0, page_size=50, max_workers=8):
+        self.cursor_path = cursor_path
+        self.retrieve = retrieve or (lambda job_id: openai.FineTuningJob.retrieve(id=job_id))
+        self.list_events = list_events or (lambda job_id, limit, after=None: openai.FineTuningJob.list_events(
+            id=job_id, limit=limit, **({"after": after} if after else {})))
+        self.poll_intervals = dict(self.POLL_INTERVALS, **(poll_intervals or {}))
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.jobs = {}  # job_id -> {"status", "last_event_id", "interval", "next_poll", "errors"}
+        self.finished = {}  # job_id -> final cursor, kept so re-watching a finished job is a no-op
+        self._transition_callbacks = []
+        self._event_callbacks = []
+        self._lock = threading.Lock()
+        if cursor_path and os.path.exists(cursor_path):
+            with open(cursor_path) as f:
+                for job_id, cursor in json.load(f).items():
+                    if cursor.get("status") in TERMINAL_JOB_STATUSES:
+                        self.finished[job_id] = cursor
+                    else:
+                        self._track(job_id, cursor.get("status"), cursor.get("last_event_id"))
+
+    def _track(self, job_id, status=None, last_event_id=None):
+        self.jobs[job_id] = {"status": status, "last_event_id": last_event_id,
+                             "interval": self.poll_intervals.get(status, 1.0), "next_poll": 0.0, "errors": 0}
+
+    def watch(self, job_id):
+        with self._lock:
+            if job_id not in self.jobs:
+                cursor = self.finished.pop(job_id, {})
+                self._track(job_id, cursor.get("status"), cursor.get("last_event_id"))
+
+    def unwatch(self, job_id):
+        with self._lock:
+            self.jobs.pop(job_id, None)
+        self._save()
+
+    def on_transition(self, callback):
+        """callback(job_id, old_status, new_status, job) on every status change."""
+        self._transition_callbacks.append(callback)
+        return callback
+
+    def on_event(self, callback):
+        """callback(job_id, event) for each new job event, oldest first."""
+        self._event_callbacks.append(callback)
+        return callback
+
+    def _new_events(self, job_id, last_event_id):
+        # The API lists events newest first, so page back only until the cursor.
+        new, after = [], None
+        while True:
+            page = self.list_events(job_id, self.page_size, after)
+            data = page["data"]
+            for event in data:
+                if event["id"] == last_event_id:
+                    return new[::-1]
+                new.append(event)
+            if not data or not page.get("has_more"):
+                return new[::-1]
+            after = data[-1]["id"]
+
+    def _fetch(self, job_id, last_event_id):
+        job = self.retrieve(job_id)
+        return job, self._new_events(job_id, last_event_id)
+
+    def _save(self):
+        if not self.cursor_path:
+            return
+        with self._lock:
+            cursors = dict(self.finished)
+            cursors.update((job_id, {"status": state["status"], "last_event_id": state["last_event_id"]})
+                           for job_id, state in self.jobs.items())
+        tmp = self.cursor_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(cursors, f)
+        os.replace(tmp, self.cursor_path)
+
+    def due(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [job_id for job_id, state in self.jobs.items() if state["next_poll"] <= now]
+
+    def seconds_until_due(self):
+        with self._lock:
+            if not self.jobs:
+                return None
+            return max(0.0, min(state["next_poll"] for state in self.jobs.values()) - time.monotonic())
+
+    def poll_once(self):
+        """
+        Polls every job that is due (concurrently) and returns the updates as
+        dicts: {"type": "transition", "job_id", "old_status", "status", "job"}
+        or {"type": "event", "job_id", "event"}. Callbacks fire before returning.
+        """
+        due = self.due()
+        if not due:
+            return []
+        with self._lock:
+            cursors = {job_id: self.jobs[job_id]["last_event_id"] for job_id in due}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(due))) as pool:
+            futures = {job_id: pool.submit(self._fetch, job_id, cursors[job_id]) for job_id in due}
+        updates = []
+        changed = False
+        for job_id, future in futures.items():
+            with self._lock:
+                state = self.jobs.get(job_id)
+            if state is None:
+                continue
+            try:
+                job, events = future.result()
+            except Exception as e:
+                state["errors"] += 1
+                state["interval"] = min(self.max_interval, state["interval"] * 2)
+                state["next_poll"] = time.monotonic() + state["interval"]
+                logging.warning(f"Polling fine-tuning job {job_id} failed: {str(e)}")
+                continue
+            status = job["status"]
+            old_status = state["status"]
+            for event in events:
+                updates.append({"type": "event", "job_id": job_id, "event": event})
+            if status != old_status:
+                updates.append({"type": "transition", "job_id": job_id, "old_status": old_status,
+                                "status": status, "job": job})
+            if events:
+                state["last_event_id"] = events[-1]["id"]
+            state["errors"] = 0
+            if events or status != old_status:
+                changed = True
+                state["status"] = status
+                state["interval"] = self.poll_intervals.get(status, state["interval"])
+            else:
+                state["interval"] = min(self.max_interval, state["interval"] * self.backoff)
+            state["next_poll"] = time.monotonic() + state["interval"]
+            if status in TERMINAL_JOB_STATUSES:
+                with self._lock:
+                    self.jobs.pop(job_id, None)
+                    self.finished[job_id] = {"status": status, "last_event_id": state["last_event_id"]}
+        for update in updates:
+            if update["type"] == "event":
+                for callback in self._event_callbacks:
+                    callback(update["job_id"], update["event"])
+            else:
+                for callback in self._transition_callbacks:
+                    callback(update["job_id"], update["old_status"], update["status"], update["job"])
+        if changed:
+            self._save()
+        return updates
+
+    def run(self, timeout=None):
+        """Polls until every watched job is finished (or timeout seconds pass)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.jobs:
+            self.poll_once()
+            wait_for = self.seconds_until_due()
+            if wait_for is None:
+                break
+            if deadline is not None:
+                if time.monotonic() + wait_for > deadline:
+                    return False
+            time.sleep(wait_for)
+        return True
+
+    async def updates(self):
+        """Async iterator over poll_once() updates until every watched job is finished."""
+        while self.jobs:
+            for update in await asyncio.to_thread(self.poll_once):
+                yield update
+            wait_for = self.seconds_until_due()
+            if wait_for:
+                await asyncio.sleep(wait_for)
+
+
+# Errors worth retrying. The first two mean the request was not processed, so
+# they are retried even for calls that create or delete something.
+REJECTED_ERRORS = (openai.error.RateLimitError, openai.error.ServiceUnavailableError)
+TRANSIENT_ERRORS = REJECTED_ERRORS + (openai.error.TryAgain, openai.error.Timeout, openai.error.APIConnectionError)
+
+
+def is_retryable(error, idempotent=True):
+    if isinstance(error, REJECTED_ERRORS):
+        return True
+    if not idempotent:
+        return False
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    return isinstance(error, openai.error.APIError) and (error.http_status or 0) >= 500
 
 
 class FineTuningManager:
-    def create_fine_tuning_job(self, training_file_id):
+    def __init__(self, completion_cache=None, metrics=None, listing_ttl=5.0, max_retries=2, retry_backoff=1.0):
+        # Exact-match cache used by default for temperature 0; see create_completion(use_cache=...).
+        self.completion_cache = completion_cache if completion_cache is not None else CompletionCache()
+        # Every API call is timed into this store; see metrics.format_report() / export_trace().
+        self.metrics = metrics if metrics is not None else MetricsStore()
+        # Local, briefly cached copies of the job and model listings; see find_fine_tuning_jobs().
+        self.jobs_cache = ListingCache(self._list_jobs_page, indexes=("status", "model"), ttl=listing_ttl,
+                                       is_final=lambda job: job["status"] in TERMINAL_JOB_STATUSES)
+        self.models_cache = ListingCache(self._list_models_page, indexes=("owned_by",), ttl=listing_ttl * 12)
+        self.sampler = None
+        # Transient API errors are retried with exponential backoff; each retry is counted on the span.
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    def _retrying(self, span, api_call, params, idempotent=True):
+        """Calls api_call(**params), retrying retryable errors up to max_retries times."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return api_call(**params)
+            except openai.error.OpenAIError as e:
+                if attempt == self.max_retries or not is_retryable(e, idempotent):
+                    raise
+                span.retry()
+                logging.warning(f"Retrying {span.method} after {type(e).__name__}: {e}")
+                time.sleep(self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.0))
+
+    def _call(self, method, api_call, params, model_id=None, idempotent=True):
+        """Runs one OpenAI API call (with retries) inside a metrics span."""
+        with self.metrics.span(method, model_id) as span:
+            span.set_request(params)
+            response = self._retrying(span, api_call, params, idempotent)
+            span.set_response(response)
+            return response
+
+    def _cache_enabled(self, use_cache, temperature):
+        return use_cache if use_cache is not None else temperature == 0
+
+    def create_fine_tuning_job(self, training_file_id, model="gpt-3.5-turbo"):
         try:
-            response = openai.FineTuning.create(training_file=training_file_id)
+            response = self._call("create_fine_tuning_job", openai.FineTuningJob.create,
+                                  {"training_file": training_file_id, "model": model}, idempotent=False)
+            self.jobs_cache.invalidate()
             logging.info(f"Created fine-tuning job: {response['id']}")
             print(f"Created fine-tuning job: {response['id']}")
+            return response
         except Exception as e:
             logging.error(f"Error creating fine-tuning job: {str(e)}")
             print(f"Error creating fine-tuning job: {str(e)}")
+            return None
 
-    def create_fine_tuning_job_json(self, coding_prompts, filename='training_data.json'):
+    def create_fine_tuning_job_json(self, coding_prompts, filename='training_data.jsonl',
+                                    max_shard_bytes=None, compress=False):
+        # coding_prompts may be any iterable (e.g. a generator) of prompt/completion or chat records.
         try:
-            with open(filename, 'w') as f:
-                json.dump(coding_prompts, f, indent=4)
-            logging.info(f"fine-tuning data saved to {filename}")
-            print(f"fine-tuning data saved to {filename}")
+            writer = TrainingDataWriter(filename, max_shard_bytes, compress)
+            with writer:
+                writer.write_all(coding_prompts)
+            manifest = writer.close()
+            with open(os.path.splitext(filename)[0] + '.manifest.json', 'w') as f:
+                json.dump(manifest, f, indent=4)
+            logging.info(f"fine-tuning data saved to {len(manifest['shards'])} shard(s) of {filename}: "
+                         f"{manifest['records']} records, {manifest['tokens']} tokens, "
+                         f"{manifest['skipped']} skipped")
+            print(f"fine-tuning data saved to {', '.join(s['path'] for s in manifest['shards'])}")
+            return manifest
         except Exception as e:
             logging.error(f"Error saving fine-tuning data: {str(e)}")
             print(f"Error saving fine-tuning data: {str(e)}")
+            return None
 
-    def list_fine_tuning_jobs(self):
+    def validate_training_data(self, files, max_tokens=DEFAULT_CONTEXT_TOKENS, workers=None):
+        # files: a path, a list of paths, or the manifest returned by create_fine_tuning_job_json.
+        if isinstance(files, dict):
+            files = [shard["path"] for shard in files["shards"]]
+        elif isinstance(files, str):
+            files = [files]
         try:
-            response = openai.FineTuning.list()
+            report = validate_training_files(files, max_tokens=max_tokens, workers=workers)
+            logging.info(f"Validated {report['records']} training records: {report['invalid']} invalid, "
+                         f"{report['over_length']} over length")
+            print(format_validation_report(report))
+            return report
+        except Exception as e:
+            logging.error(f"Error validating training data: {str(e)}")
+            print(f"Error validating training data: {str(e)}")
+            return None
+
+    def _list_jobs_page(self, limit, after=None):
+        params = {"limit": limit}
+        if after:
+            params["after"] = after
+        return self._call("list_fine_tuning_jobs", openai.FineTuningJob.list, params)
+
+    def _list_models_page(self, limit, after=None):
+        params = {"limit": limit}
+        if after:
+            params["after"] = after
+        return self._call("list_available_models", openai.Model.list, params)
+
+    def iter_fine_tuning_jobs(self, limit=None, after=None, page_size=20):
+        """Lazily pages through fine-tuning jobs (newest first) straight from the API."""
+        return iter_pages(self._list_jobs_page, limit, after, page_size)
+
+    def iter_available_models(self, limit=None, after=None, page_size=100):
+        return iter_pages(self._list_models_page, limit, after, page_size)
+
+    def find_fine_tuning_jobs(self, status=None, base_model=None, created_after=None, created_before=None,
+                              limit=None):
+        """Queries the cached job listing (refreshed at most every listing_ttl seconds), newest first."""
+        filters = {}
+        if status is not None:
+            filters["status"] = status
+        if base_model is not None:
+            filters["model"] = base_model
+        return self.jobs_cache.query(limit, created_after, created_before, **filters)
+
+    def find_models(self, owned_by=None, created_after=None, created_before=None, limit=None):
+        filters = {"owned_by": owned_by} if owned_by is not None else {}
+        return self.models_cache.query(limit, created_after, created_before, **filters)
+
+    def list_fine_tuning_jobs(self, status=None, limit=None):
+        try:
+            jobs = list(self.find_fine_tuning_jobs(status=status, limit=limit))
             logging.info("Listed fine-tuning jobs.")
             print("fine-tuning jobs:")
-            for job in response['data']:
+            for job in jobs:
                 print(f"ID: {job['id']}, Status: {job['status']}")
+            return jobs
         except Exception as e:
             logging.error(f"Error listing fine-tuning jobs: {str(e)}")
             print(f"Error listing fine-tuning jobs: {str(e)}")
+            return None
 
     def retrieve_fine_tune_state(self, job_id):
         try:
-            response = openai.fineTuning.retrieve(id=job_id)
+            response = self._call("retrieve_fine_tune_state", openai.FineTuningJob.retrieve, {"id": job_id})
             logging.info(f"Job {job_id} state: {response['status']}")
             print(f"Job {job_id} state: {response['status']}")
+            return response
         except Exception as e:
             logging.error(f"Error retrieving job state: {str(e)}")
             print(f"Error retrieving job state: {str(e)}")
+            return None
 
     def cancel_fine_tuning_job(self, job_id):
         try:
-            response = openai.FineTuning.cancel(id=job_id)
+            response = self._call("cancel_fine_tuning_job", openai.FineTuningJob.cancel, {"id": job_id})
+            self.jobs_cache.invalidate()
             logging.info(f"Cancelled fine-tuning job: {response['id']}")
             print(f"Cancelled fine-tuning job: {response['id']}")
+            return response
         except Exception as e:
             logging.error(f"Error cancelling fine-tuning job: {str(e)}")
             print(f"Error cancelling fine-tuning job: {str(e)}")
+            return None
 
-    def list_fine_tuning_job_events(self, job_id):
+    def list_fine_tuning_job_events(self, job_id, limit=20, after=None):
         try:
-            response = openai.fineTuning.list_events(id=job_id)
+            params = {"id": job_id, "limit": limit}
+            if after:
+                params["after"] = after
+            response = self._call("list_fine_tuning_job_events", openai.FineTuningJob.list_events, params)
             logging.info(f"Events for job {job_id}:")
             print(f"Events for job {job_id}:")
             for event in response['data']:
                 print(f"Event: {event['message']}")
+            return response
         except Exception as e:
             logging.error(f"Error listing job events: {str(e)}")
             print(f"Error listing job events: {str(e)}")
+            return None
+
+    def watch_jobs(self, job_ids, cursor_path=None, **options):
+        """
+        Returns a FineTuningJobWatcher for job_ids whose API calls are recorded in
+        self.metrics. Register callbacks, then call run() or iterate updates().
+        """
+        watcher = FineTuningJobWatcher(
+            cursor_path,
+            retrieve=lambda job_id: self._call("watch_retrieve", openai.FineTuningJob.retrieve, {"id": job_id}),
+            list_events=lambda job_id, limit, after=None: self._call(
+                "watch_list_events", openai.FineTuningJob.list_events,
+                dict({"id": job_id, "limit": limit}, **({"after": after} if after else {}))),
+            **options)
+        for job_id in job_ids:
+            watcher.watch(job_id)
+        return watcher
 
     def delete_fine_tuned_model(self, model_id):
         try:
-            response = openai.Model.delete(model=model_id)
+            response = self._call("delete_fine_tuned_model", openai.Model.delete, {"model": model_id},
+                                  model_id)
             logging.info(f"Deleted model: {response['id']}")
             print(f"Deleted model: {response['id']}")
         except Exception as e:
             logging.error(f"Error deleting model: {str(e)}")
             print(f"Error deleting model: {str(e)}")
 
-    def create_completion(self, model_id, messages, max_tokens=150, temperature=0.7):
+    def create_completion(self, model_id, messages, max_tokens=150, temperature=0.7, use_cache=None,
+                          stream=False):
+        # use_cache=None caches only deterministic (temperature 0) requests; True/False force it.
+        # stream=True reads the reply incrementally, which also records time to first token.
+        use_cache = self._cache_enabled(use_cache, temperature)
+        if use_cache:
+            cached = self.completion_cache.get(model_id, messages, max_tokens, temperature)
+            if cached is not None:
+                with self.metrics.span("create_completion", model_id) as span:
+                    span.cached = True
+                print(f"Completion (cached): {cached}")
+                return cached
         try:
-            response = openai.ChatCompletion.create(
-                model=model_id,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
-            logging.info(f"Completion: {response['choices'][0]['message']['content']}")
-            print(f"Completion: {response['choices'][0]['message']['content']}")
-            return response['choices'][0]['message']['content']
+            with self.metrics.span("create_completion", model_id) as span:
+                params = dict(model=model_id, messages=messages, max_tokens=max_tokens,
+                              temperature=temperature)
+                span.set_request(params)
+                if stream:
+                    parts = []
+                    for chunk in self._retrying(span, openai.ChatCompletion.create, dict(params, stream=True)):
+                        piece = chunk['choices'][0].get('delta', {}).get('content')
+                        if piece:
+                            span.first_token()
+                            parts.append(piece)
+                    content = "".join(parts)
+                    span.status = 200
+                    # Streamed replies carry no usage block; count locally.
+                    span.set_usage({"prompt_tokens": sum(count_tokens(m.get('content') or '') for m in messages),
+                                    "completion_tokens": count_tokens(content)})
+                    span.response_bytes = len(content.encode('utf-8'))
+                else:
+                    response = self._retrying(span, openai.ChatCompletion.create, params)
+                    span.set_response(response)
+                    content = response['choices'][0]['message']['content']
+            if use_cache:
+                self.completion_cache.put(model_id, messages, max_tokens, temperature, content,
+                                          span.wall_ms / 1000.0)
+            logging.debug(f"Completion of {len(content)} characters from {model_id}")
+            print(f"Completion: {content}")
+            return content
         except Exception as e:
             logging.error(f"Error creating completion: {str(e)}")
             print(f"Error creating completion: {str(e)}")
             return None
 
+    def _run_completion(self, index, model_id, messages, max_tokens, temperature, limiter, use_cache):
+        # Hot path for batches: no printing or per-call logging.
+        if use_cache:
+            cached = self.completion_cache.get(model_id, messages, max_tokens, temperature)
+            if cached is not None:
+                with self.metrics.span("create_completions", model_id) as span:
+                    span.cached = True
+                return {"index": index, "content": cached, "error": None, "usage": None,
+                        "latency": 0.0, "cached": True}
+        estimate = estimate_tokens(messages, max_tokens)
+        limiter.acquire(estimate)
+        start = time.perf_counter()
+        try:
+            response = self._call("create_completions", openai.ChatCompletion.create,
+                                  dict(model=model_id, messages=messages, max_tokens=max_tokens,
+                                       temperature=temperature), model_id)
+        except Exception as e:
+            return {"index": index, "content": None, "error": str(e), "usage": None,
+                    "latency": time.perf_counter() - start, "cached": False}
+        latency = time.perf_counter() - start
+        usage = dict(response.get('usage') or {})
+        if usage.get('total_tokens') is not None:
+            limiter.adjust(estimate - usage['total_tokens'])
+        content = response['choices'][0]['message']['content']
+        if use_cache:
+            self.completion_cache.put(model_id, messages, max_tokens, temperature, content, latency)
+        return {"index": index, "content": content, "error": None,
+                "usage": usage, "latency": latency, "cached": False}
+
+    def iter_completions(self, model_id, conversations, max_tokens=150, temperature=0.7,
+                         concurrency=8, requests_per_minute=None, tokens_per_minute=None, ordered=False,
+                         use_cache=None):
+        """
+        Runs many conversations concurrently on a thread pool, within optional
+        RPM/TPM budgets. Yields one result dict per conversation
+        ({"index", "content", "error", "usage", "latency", "cached"}) as they complete,
+        or in input order when ordered=True. Conversations are pulled lazily,
+        so at most a few times `concurrency` requests are queued at once.
+        """
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        use_cache = self._cache_enabled(use_cache, temperature)
+        window = concurrency * 4
+        started = time.perf_counter()
+        completed = errors = 0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="completion") as pool:
+            pending = deque() if ordered else set()
+            for index, messages in enumerate(conversations):
+                future = pool.submit(self._run_completion, index, model_id, messages,
+                                     max_tokens, temperature, limiter, use_cache)
+                if ordered:
+                    pending.append(future)
+                    while len(pending) >= window or (pending and pending[0].done()):
+                        result = pending.popleft().result()
+                        completed += 1
+                        errors += result["error"] is not None
+                        yield result
+                else:
+                    pending.add(future)
+                    if len(pending) >= window:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for finished in done:
+                            result = finished.result()
+                            completed += 1
+                            errors += result["error"] is not None
+                            yield result
+            while pending:
+                if ordered:
+                    finished = [pending.popleft()]
+                else:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    completed += 1
+                    errors += result["error"] is not None
+                    yield result
+        logging.info(f"Completed {completed} completions ({errors} errors) "
+                     f"in {time.perf_counter() - started:.2f}s with {model_id}")
+
+    def create_completions(self, model_id, conversations, max_tokens=150, temperature=0.7,
+                           concurrency=8, requests_per_minute=None, tokens_per_minute=None, use_cache=None):
+        """Batch variant of create_completion; returns result dicts in input order."""
+        return list(self.iter_completions(model_id, conversations, max_tokens, temperature, concurrency,
+                                          requests_per_minute, tokens_per_minute, ordered=True,
+                                          use_cache=use_cache))
+
     def get_sensor_data(self):
-        cpu_usage = psutil.cpu_percent(interval=1)
+        # Non-blocking: reuses the background sampler's latest reading when it is running.
+        if self.sampler is not None and self.sampler.running and len(self.sampler):
+            latest = self.sampler.latest()
+            cpu_usage = latest["cpu_percent"]
+        else:
+            cpu_usage = psutil.cpu_percent(interval=None)
         memory_info = psutil.virtual_memory()
         return {
             "cpu_usage": cpu_usage,
@@ -278,31 +1707,348 @@ class FineTuningManager:
             "memory_free": memory_info.free
         }
 
-    def monitor_resources(self):
-        print("Monitoring resources...")
-        try:
-            while True:
-                sensor_data = self.get_sensor_data()
-                print(f"CPU Usage: {sensor_data['cpu_usage']}%")
-                print(f"Memory Used: {sensor_data['memory_used'] / (1024 ** 2):.2f} MB")
-                print(f"Memory Free: {sensor_data['memory_free'] / (1024 ** 2):.2f} MB")
-                time.sleep(5)  # Update every 5 seconds
-        except KeyboardInterrupt:
-            print("Resource monitoring stopped.")
-
-    def list_available_models(self):
+    def monitor_resources(self, interval=1.0, capacity=3600):
+        """Starts (or returns) the background resource sampler; does not block."""
+        if self.sampler is None:
+            self.sampler = ResourceSampler(interval=interval, capacity=capacity)
+        self.sampler.start()
+        print(f"Monitoring resources every {self.sampler.interval}s in the background...")
+        return self.sampler
+
+    def stop_monitoring(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def print_resource_summary(self, window=None):
+        if self.sampler is None or not len(self.sampler):
+            print("No resource samples recorded.")
+            return
+        stats = self.sampler.percentiles(window)
+        print(f"CPU Usage: p50={stats['cpu_percent']['p50']:.1f}% p95={stats['cpu_percent']['p95']:.1f}%")
+        print(f"Process RSS: p50={stats['rss']['p50'] / (1024 ** 2):.2f} MB "
+              f"p95={stats['rss']['p95'] / (1024 ** 2):.2f} MB")
+        print(f"Memory Used: p50={stats['memory_used']['p50'] / (1024 ** 2):.2f} MB")
+        if "net_bytes_recv_per_s" in stats:
+            print(f"Network: recv p95={stats['net_bytes_recv_per_s']['p95'] / 1024:.1f} KB/s, "
+                  f"sent p95={stats['net_bytes_sent_per_s']['p95'] / 1024:.1f} KB/s")
+
+    def list_available_models(self, owned_by=None, limit=None):
         try:
-            response = openai.Model.list()
+            models = list(self.find_models(owned_by=owned_by, limit=limit))
             print("Available models:")
-            for model in response['data']:
+            for model in models:
                 print(f"Model ID: {model['id']}, Type: {model['object']}")
+            return models
         except Exception as e:
             logging.error(f"Error listing available models: {str(e)}")
             print(f"Error listing available models: {str(e)}")
+            return None
+
+    def close(self):
+        """Stops monitoring and persists the completion cache and metrics trace."""
+        self.stop_monitoring()
+        self.completion_cache.close()
+        self.metrics.close()
+
+# ---------------------------- Benchmark Suite ---------------------------- #
+def load_prompt_suite(path):
+    """
+    Loads a JSONL prompt suite. Each line holds "messages" (or "prompt"), a
+    "reference" answer and optionally "id" and "max_tokens".
+    """
+    suite = []
+    with open(path) as f:
+        for number, line in enumerate(f):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "messages" not in item:
+                item["messages"] = [{"role": "user", "content": item["prompt"]}]
+            item.setdefault("id", str(number))
+            suite.append(item)
+    return suite
+
+
+def replay_key(model_id, messages, max_tokens, temperature):
+    return stable_hash([model_id, messages, max_tokens, temperature])
+
+
+class LiveBackend:
+    """Calls the OpenAI chat completions API (through a FineTuningManager's metrics, if given)."""
+
+    def __init__(self, manager=None):
+        self.manager = manager
+
+    def __call__(self, model_id, messages, max_tokens, temperature):
+        params = dict(model=model_id, messages=messages, max_tokens=max_tokens, temperature=temperature)
+        if self.manager is not None:
+            response = self.manager._call("benchmark", openai.ChatCompletion.create, params, model_id)
+        else:
+            response = openai.ChatCompletion.create(**params)
+        return response['choices'][0]['message']['content'], dict(response.get('usage') or {})
+
+
+class RecordingBackend:
+    """Wraps another backend and appends every response to a JSONL file for later replay."""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, model_id, messages, max_tokens, temperature):
+        start = time.perf_counter()
+        content, usage = self.backend(model_id, messages, max_tokens, temperature)
+        record = {"key": replay_key(model_id, messages, max_tokens, temperature), "model": model_id,
+                  "content": content, "usage": usage, "latency": time.perf_counter() - start}
+        with self._lock, open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        return content, usage
+
+
+class ReplayBackend:
+    """
+    Answers from responses recorded by RecordingBackend, for offline runs.
+    simulate_latency=True sleeps for each response's recorded latency.
+    Unrecorded requests raise KeyError.
+    """
+
+    def __init__(self, path, simulate_latency=False):
+        self.simulate_latency = simulate_latency
+        self.records = {}
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.records[record["key"]] = record
+
+    def __call__(self, model_id, messages, max_tokens, temperature):
+        record = self.records.get(replay_key(model_id, messages, max_tokens, temperature))
+        if record is None:
+            raise KeyError(f"No recorded response for {model_id}")
+        if self.simulate_latency:
+            time.sleep(record.get("latency") or 0.0)
+        return record["content"], record.get("usage") or {}
+
+
+def _hashed_counts(texts, dimensions, grams):
+    """Bag-of-grams count matrix (one row per text) with grams hashed into `dimensions` columns."""
+    rows, columns = [], []
+    for row, text in enumerate(texts):
+        hashes = [zlib.crc32(gram.encode('utf-8')) % dimensions for gram in grams(text)]
+        columns.extend(hashes)
+        rows.extend([row] * len(hashes))
+    counts = np.zeros((len(texts), dimensions), dtype=np.float32)
+    np.add.at(counts, (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)), 1.0)
+    return counts
+
+
+def _words(text):
+    return text.lower().split()
+
+
+def _char_grams(text, n=4):
+    text = " ".join(text.lower().split()).ljust(n)
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def _row_cosine(a, b):
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    cosine = np.divide((a * b).sum(axis=1), norms, out=np.zeros(len(a), dtype=np.float64), where=norms > 0)
+    return np.clip(cosine, -1.0, 1.0)  # float32 rounding can land just outside the range
+
+
+def score_responses(outputs, references, embed=None, dimensions=4096, batch_size=512):
+    """
+    Scores each output against its reference, a batch of rows at a time:
+    - lexical_f1: word-overlap F1 (hashed unigram counts)
+    - char_cosine: cosine of hashed character 4-gram counts
+    - embedding_cosine: cosine of embed(texts) vectors, when an embed callable is given
+    Returns a dict of float arrays aligned with the inputs.
+    """
+    scores = {"lexical_f1": [], "char_cosine": []}
+    if embed is not None:
+        scores["embedding_cosine"] = []
+    for start in range(0, len(outputs), batch_size):
+        out = [o or "" for o in outputs[start:start + batch_size]]
+        ref = [r or "" for r in references[start:start + batch_size]]
+        o_words, r_words = _hashed_counts(out, dimensions, _words), _hashed_counts(ref, dimensions, _words)
+        overlap = np.minimum(o_words, r_words).sum(axis=1)
+        o_total, r_total = o_words.sum(axis=1), r_words.sum(axis=1)
+        precision = np.divide(overlap, o_total, out=np.zeros_like(overlap), where=o_total > 0)
+        recall = np.divide(overlap, r_total, out=np.zeros_like(overlap), where=r_total > 0)
+        both = precision + recall
+        scores["lexical_f1"].append(np.divide(2 * precision * recall, both, out=np.zeros_like(both),
+                                              where=both > 0))
+        scores["char_cosine"].append(_row_cosine(_hashed_counts(out, dimensions, _char_grams),
+                                                 _hashed_counts(ref, dimensions, _char_grams)))
+        if embed is not None:
+            vectors = np.asarray(embed(out + ref), dtype=np.float32)
+            scores["embedding_cosine"].append(_row_cosine(vectors[:len(out)], vectors[len(out):]))
+    return {name: np.concatenate(parts) if parts else np.zeros(0) for name, parts in scores.items()}
+
+
+def openai_embedder(model="text-embedding-ada-002", batch_size=256):
+    """embed callable for score_responses backed by the OpenAI embeddings API."""
+    def embed(texts):
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            response = openai.Embedding.create(model=model, input=[t or " " for t in texts[start:start + batch_size]])
+            vectors.extend(item["embedding"] for item in sorted(response["data"], key=lambda d: d["index"]))
+        return vectors
+    return embed
+
+
+def _distribution(values):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return None
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "min": float(values.min()), "max": float(values.max())}
+
+
+def run_benchmark(suite, model_ids, backend=None, concurrency=8, max_tokens=256, temperature=0.0,
+                  embed=None, low_similarity_threshold=0.5, output_path=None):
+    """
+    Runs every prompt in `suite` against every model concurrently, scores the
+    outputs against the references and returns (optionally writes) a results
+    artifact: per-model latency/throughput/score summaries plus per-prompt rows.
+    """
+    backend = backend or LiveBackend()
+
+    def run_one(model_id, item):
+        start = time.perf_counter()
+        try:
+            content, usage = backend(model_id, item["messages"], item.get("max_tokens", max_tokens), temperature)
+            error = None
+        except Exception as e:
+            content, usage, error = None, {}, f"{type(e).__name__}: {str(e)}"
+        end = time.perf_counter()
+        return {"model": model_id, "id": item["id"], "output": content, "error": error, "usage": usage,
+                "start": start, "latency": end - start}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="benchmark") as pool:
+        futures = [pool.submit(run_one, model_id, item) for model_id in model_ids for item in suite]
+        rows = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    references = {item["id"]: item.get("reference", "") for item in suite}
+    scores = score_responses([row["output"] for row in rows], [references[row["id"]] for row in rows], embed)
+    primary = "embedding_cosine" if "embedding_cosine" in scores else "char_cosine"
+    for i, row in enumerate(rows):
+        row["scores"] = {name: float(values[i]) for name, values in scores.items()} if row["error"] is None else None
+
+    models = {}
+    for model_id in model_ids:
+        model_rows = [row for row in rows if row["model"] == model_id]
+        ok = [row for row in model_rows if row["error"] is None]
+        span = (max(row["start"] + row["latency"] for row in model_rows) - min(row["start"] for row in model_rows)
+                if model_rows else 0.0)
+        completion_tokens = sum((row["usage"] or {}).get("completion_tokens") or 0 for row in ok)
+        models[model_id] = {
+            "requests": len(model_rows),
+            "errors": len(model_rows) - len(ok),
+            "latency_s": _distribution([row["latency"] for row in ok]),
+            "throughput_rps": len(ok) / span if span else 0.0,
+            "completion_tokens_per_s": completion_tokens / span if span else 0.0,
+            "scores": {name: _distribution([row["scores"][name] for row in ok]) for name in scores},
+            "low_similarity": sum(row["scores"][primary] < low_similarity_threshold for row in ok),
+        }
+    for row in rows:
+        del row["start"]
+    artifact = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "suite_hash": stable_hash([[item["id"], item["messages"], item.get("reference")] for item in suite]),
+        "config": {"models": list(model_ids), "prompts": len(suite), "concurrency": concurrency,
+                   "max_tokens": max_tokens, "temperature": temperature, "primary_score": primary,
+                   "low_similarity_threshold": low_similarity_threshold, "backend": type(backend).__name__},
+        "elapsed_s": elapsed,
+        "models": models,
+        "results": rows,
+    }
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(artifact, f, indent=2)
+    return artifact
+
+
+def format_benchmark(artifact):
+    primary = artifact["config"]["primary_score"]
+    lines = [f"{'model':<32} {'ok':>5} {'err':>4} {'p50 s':>8} {'p95 s':>8} {'req/s':>8} "
+             f"{'tok/s':>8} {primary + ' mean':>18} {'low sim':>8}"]
+    for model_id, summary in artifact["models"].items():
+        latency = summary["latency_s"] or {}
+        score = summary["scores"].get(primary) or {}
+        lines.append(f"{model_id:<32} {summary['requests'] - summary['errors']:>5} {summary['errors']:>4} "
+                     f"{latency.get('p50', 0):>8.3f} {latency.get('p95', 0):>8.3f} "
+                     f"{summary['throughput_rps']:>8.2f} {summary['completion_tokens_per_s']:>8.1f} "
+                     f"{score.get('mean', 0):>18.3f} {summary['low_similarity']:>8}")
+    return "\n".join(lines)
+
+
+def compare_benchmarks(baseline, candidate):
+    """Per-model differences (candidate - baseline) in mean scores and p50 latency for the same suite."""
+    if baseline["suite_hash"] != candidate["suite_hash"]:
+        raise ValueError("Benchmarks were run on different prompt suites")
+    deltas = {}
+    for model_id, summary in candidate["models"].items():
+        base = baseline["models"].get(model_id)
+        if base is None:
+            continue
+        deltas[model_id] = {
+            name: (summary["scores"][name] or {}).get("mean", 0) - (base["scores"].get(name) or {}).get("mean", 0)
+            for name in summary["scores"]
+        }
+        deltas[model_id]["latency_p50_s"] = (summary["latency_s"] or {}).get("p50", 0) - \
+            (base["latency_s"] or {}).get("p50", 0)
+    return deltas
+
+
+def benchmark_main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark chat models on a JSONL prompt suite.")
+    parser.add_argument("suite", help="JSONL with messages/prompt and reference per line")
+    parser.add_argument("--models", required=True, help="Comma-separated model ids (e.g. base,ft:...)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--record", help="Append live responses to this JSONL for later --replay")
+    parser.add_argument("--replay", help="Answer from recorded responses instead of the API")
+    parser.add_argument("--simulate-latency", action="store_true", help="Replay with recorded latencies")
+    parser.add_argument("--embedding-model", help="Also score with cosine similarity of these embeddings")
+    parser.add_argument("--low-similarity", type=float, default=0.5)
+    parser.add_argument("--compare", help="Earlier results artifact to compare against")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        backend = ReplayBackend(args.replay, args.simulate_latency)
+    else:
+        backend = LiveBackend(FineTuningManager())
+        if args.record:
+            backend = RecordingBackend(backend, args.record)
+    artifact = run_benchmark(load_prompt_suite(args.suite), args.models.split(","), backend,
+                             concurrency=args.concurrency, max_tokens=args.max_tokens,
+                             temperature=args.temperature,
+                             embed=openai_embedder(args.embedding_model) if args.embedding_model else None,
+                             low_similarity_threshold=args.low_similarity, output_path=args.output)
+    print(format_benchmark(artifact))
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            for model_id, delta in compare_benchmarks(json.load(f), artifact).items():
+                print(f"{model_id}: " + ", ".join(f"{name} {value:+.3f}" for name, value in delta.items()))
+    return 0
+
 
 # Example usage
 if __name__ == "__main__":
-    manager = 'FineTuningManager'()
+    # With arguments, run the benchmark suite instead (see benchmark_main --help).
+    if len(sys.argv) > 1:
+        sys.exit(benchmark_main(sys.argv[1:]))
+
+    manager = FineTuningManager()
 
     # Example training file and model IDs
     training_file_id = "file-abc123"  # Example training file ID
@@ -325,8 +2071,10 @@ if __name__ == "__main__":
         }
     ]
 
-    # Save fine-tuning data to JSON
-    manager.create_fine_tuning_job_json(coding_prompts)
+    # Save fine-tuning data to JSONL and check it before uploading
+    manifest = manager.create_fine_tuning_job_json(coding_prompts)
+    if manifest:
+        manager.validate_training_data(manifest)
 
     # Create a fine-tuning job
     manager.create_fine_tuning_job(training_file_id)
@@ -343,6 +2091,12 @@ if __name__ == "__main__":
     # List events from the fine-tuning job
     manager.list_fine_tuning_job_events(job_id)
 
+    # Follow jobs until they finish, printing only new events and status changes
+    # watcher = manager.watch_jobs([job_id], cursor_path='job_cursors.json')
+    # watcher.on_transition(lambda job, old, new, _: print(f"{job}: {old} -> {new}"))
+    # watcher.on_event(lambda job, event: print(f"{job}: {event['message']}"))
+    # watcher.run()
+
     # Delete the fine-tuned model (if necessary)
     # manager.delete_fine_tuned_model(model_id)
 
@@ -352,9 +2106,11 @@ if __name__ == "__main__":
         {"role": "user", "content": "What is the difference between RISC-V and ARM?"}
     ], max_tokens=300, temperature=0.6)
 
-    # Monitor system resources
-    # Uncomment to start monitoring
+    # Monitor system resources in the background
+    # Uncomment to start monitoring (call manager.print_resource_summary() later)
     # manager.monitor_resources()
 
     # List available models
-    manager.list_available_models()
\ No newline at end of file
+    manager.list_available_models()
+
+    manager.close()
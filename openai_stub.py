@@ -0,0 +1,363 @@
+import json
+import time
+import random
+import argparse
+import threading
+import itertools
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class OpenAIStubConfig:
+    """
+    Behaviour knobs for the local OpenAI stand-in.
+    Random decisions are seeded with (seed, request number) so runs are reproducible.
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 token_latency: float = 0.0,
+                 error_rate: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 job_phase_seconds: float = 1.0,
+                 job_steps: int = 10,
+                 job_failure_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency = latency              # seconds before the first token
+        self.jitter = jitter                # extra uniform [0, jitter) seconds
+        self.token_latency = token_latency  # seconds per generated token
+        self.error_rate = error_rate        # fraction of requests answered with 500
+        self.throttle_rate = throttle_rate  # fraction of requests answered with 429
+        self.job_phase_seconds = job_phase_seconds  # duration of each fine-tuning job phase
+        self.job_steps = job_steps                  # training step events while a job runs
+        self.job_failure_rate = job_failure_rate    # fraction of jobs that end "failed"
+        self.seed = seed
+        self._counter = itertools.count()
+
+    def next_rng(self) -> random.Random:
+        return random.Random(f"{self.seed}:{next(self._counter)}")
+
+
+def stub_reply(messages: List[Dict[str, Any]], max_tokens: int) -> str:
+    """Deterministic reply: echoes the last user message, truncated to max_tokens."""
+    last_user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    return f"Stub answer to: {last_user}"[:max_tokens * 4]
+
+
+class OpenAIStubHandler(BaseHTTPRequestHandler):
+    """
+    Minimal OpenAI-compatible endpoint for tests and load runs.
+    Point the client at it with openai.api_base = "<base_url>/v1".
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    config = OpenAIStubConfig()
+    _ids = itertools.count()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _simulate(self) -> bool:
+        config = self.config
+        rng = config.next_rng()
+        delay = config.latency + (rng.random() * config.jitter if config.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        roll = rng.random()
+        if roll < config.throttle_rate:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                            headers={"Retry-After": "0"})
+            return False
+        if roll < config.throttle_rate + config.error_rate:
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return False
+        return True
+
+    def do_POST(self) -> None:
+        path = self.path.split("?", 1)[0]
+        payload = self._read_json()
+        if path == "/v1/chat/completions":
+            if self._simulate():
+                self._chat_completion(payload)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}})
+
+    def _chat_completion(self, payload: Dict[str, Any]) -> None:
+        messages = payload.get("messages", [])
+        content = stub_reply(messages, payload.get("max_tokens") or 256)
+        prompt_tokens = sum(count_tokens(m.get("content") or "") + 4 for m in messages)
+        completion_tokens = count_tokens(content)
+        completion_id = f"chatcmpl-stub{next(self._ids)}"
+        created = int(time.time())
+        model = payload.get("model", "stub-model")
+        if self.config.token_latency:
+            time.sleep(self.config.token_latency * completion_tokens)
+        if not payload.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+            return
+        # Server-sent events, one small delta per event.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+        deltas = [{"role": "assistant"}] + [{"content": piece} for piece in pieces] + [{}]
+        try:
+            for i, delta in enumerate(deltas):
+                event = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                         "model": model, "choices": [{"index": 0, "delta": delta,
+                                                      "finish_reason": "stop" if i == len(deltas) - 1 else None}]}
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early (e.g. it already had what it needed).
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+
+class FakeFineTuningJobs:
+    """
+    In-memory fine-tuning jobs that advance with wall-clock time:
+    validating_files -> queued -> running (with step events) -> succeeded/failed,
+    one config.job_phase_seconds per phase. Events are listed newest first and
+    paginated with limit/after, like the real API.
+    """
+    TERMINAL = ("succeeded", "failed", "cancelled")
+
+    def __init__(self, config: OpenAIStubConfig):
+        self.config = config
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count()
+
+    def create(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            number = next(self._ids)
+            job_id = f"ftjob-stub{number}"
+            failed = random.Random(f"{self.config.seed}:job:{number}").random() < self.config.job_failure_rate
+            self.jobs[job_id] = {
+                "id": job_id, "object": "fine_tuning.job", "model": payload.get("model", "gpt-3.5-turbo"),
+                "training_file": payload.get("training_file"), "created_at": time.time(),
+                "fine_tuned_model": None, "finished_at": None, "cancelled_at": None, "will_fail": failed,
+            }
+        return self.view(job_id)
+
+    def _timeline(self, job: Dict[str, Any]) -> Tuple[List[Tuple[float, str, str]], List[Tuple[float, str]]]:
+        """Returns (status changes, events) as offsets from created_at."""
+        phase = self.config.job_phase_seconds
+        steps = self.config.job_steps
+        statuses = [(0.0, "validating_files"), (phase, "queued"), (2 * phase, "running"),
+                    (3 * phase, "failed" if job["will_fail"] else "succeeded")]
+        events = [(0.0, "Validating training file"),
+                  (phase, "Files validated, moving job to queued state"),
+                  (2 * phase, "Fine-tuning job started")]
+        events += [(2 * phase + phase * (i + 1) / (steps + 1), f"Step {i + 1}/{steps}: training loss={1.0 / (i + 1):.4f}")
+                   for i in range(steps)]
+        events.append((3 * phase, "Job failed" if job["will_fail"] else "The job has successfully completed"))
+        return statuses, events
+
+    def _elapsed(self, job: Dict[str, Any]) -> float:
+        end = job["cancelled_at"] or time.time()
+        return end - job["created_at"]
+
+    def view(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        statuses, _ = self._timeline(job)
+        elapsed = self._elapsed(job)
+        status = [name for offset, name in statuses if offset <= elapsed][-1]
+        if job["cancelled_at"]:
+            status = "cancelled"
+        result = {key: value for key, value in job.items() if key != "will_fail"}
+        result["status"] = status
+        if status in self.TERMINAL:
+            result["finished_at"] = int(job["created_at"] + min(elapsed, statuses[-1][0]))
+            if status == "succeeded":
+                result["fine_tuned_model"] = f"ft:{job['model']}:stub:{job_id}"
+        result["created_at"] = int(job["created_at"])
+        if job["cancelled_at"]:
+            result["cancelled_at"] = int(job["cancelled_at"])
+        return result
+
+    def events(self, job_id: str) -> List[Dict[str, Any]]:
+        """Visible events, newest first."""
+        job = self.jobs[job_id]
+        _, timeline = self._timeline(job)
+        elapsed = self._elapsed(job)
+        visible = [{"id": f"ftevent-{job_id}-{i}", "object": "fine_tuning.job.event",
+                    "created_at": int(job["created_at"] + offset), "level": "info", "message": message}
+                   for i, (offset, message) in enumerate(timeline) if offset <= elapsed]
+        if job["cancelled_at"]:
+            visible.append({"id": f"ftevent-{job_id}-{len(timeline)}", "object": "fine_tuning.job.event",
+                            "created_at": int(job["cancelled_at"]), "level": "info", "message": "Job cancelled"})
+        return visible[::-1]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            view = self.view(job_id)
+            if view is not None and view["status"] not in self.TERMINAL:
+                self.jobs[job_id]["cancelled_at"] = time.time()
+        return self.view(job_id)
+
+
+def paginate(items: List[Dict[str, Any]], query: Dict[str, List[str]]) -> Dict[str, Any]:
+    """OpenAI-style list page: items after the `after` id, at most `limit` of them."""
+    limit = int(query.get("limit", ["20"])[0])
+    after = query.get("after", [None])[0]
+    if after is not None:
+        ids = [item["id"] for item in items]
+        items = items[ids.index(after) + 1:] if after in ids else []
+    return {"object": "list", "data": items[:limit], "has_more": len(items) > limit}
+
+
+_server_state_lock = threading.Lock()
+
+BASE_MODELS = [
+    {"id": "gpt-3.5-turbo", "object": "model", "created": 1677610602, "owned_by": "openai"},
+    {"id": "gpt-4", "object": "model", "created": 1687882411, "owned_by": "openai"},
+    {"id": "gpt-4o-mini", "object": "model", "created": 1721172741, "owned_by": "system"},
+]
+
+
+class FineTuningStubHandler(OpenAIStubHandler):
+    """
+    Adds a fake fine-tuning jobs API (create, list, retrieve, cancel, events)
+    and a model listing on top of chat completions. Use with start_openai_stub(handler_class=...).
+    """
+    def _jobs(self) -> FakeFineTuningJobs:
+        server = self.server
+        with _server_state_lock:
+            if not hasattr(server, "fine_tuning_jobs"):
+                server.fine_tuning_jobs = FakeFineTuningJobs(self.config)
+        return server.fine_tuning_jobs
+
+    def do_GET(self) -> None:
+        path, _, query_string = self.path.partition("?")
+        query = parse_qs(query_string)
+        parts = path.strip("/").split("/")
+        if not self._simulate():
+            return
+        jobs = self._jobs()
+        if parts == ["v1", "fine_tuning", "jobs"]:
+            with jobs.lock:
+                items = [jobs.view(job_id) for job_id in reversed(list(jobs.jobs))]
+            self._send_json(200, paginate(items, query))
+        elif parts == ["v1", "models"]:
+            with jobs.lock:
+                views = [jobs.view(job_id) for job_id in jobs.jobs]
+            models = BASE_MODELS + [{"id": view["fine_tuned_model"], "object": "model",
+                                     "created": view["finished_at"], "owned_by": "user-stub"}
+                                    for view in views if view["fine_tuned_model"]]
+            self._send_json(200, paginate(models, query))
+        elif parts[:3] == ["v1", "fine_tuning", "jobs"] and len(parts) in (4, 5):
+            with jobs.lock:
+                job = jobs.view(parts[3])
+                events = jobs.events(parts[3]) if job is not None and len(parts) == 5 else None
+            if job is None:
+                self._send_json(404, {"error": {"message": f"No such job: {parts[3]}",
+                                                "type": "invalid_request_error"}})
+            elif len(parts) == 4:
+                self._send_json(200, job)
+            elif parts[4] == "events":
+                self._send_json(200, paginate(events, query))
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}})
+
+    def do_POST(self) -> None:
+        path = self.path.split("?", 1)[0]
+        parts = path.strip("/").split("/")
+        if parts[:3] != ["v1", "fine_tuning", "jobs"]:
+            super().do_POST()
+            return
+        payload = self._read_json()
+        if not self._simulate():
+            return
+        jobs = self._jobs()
+        if len(parts) == 3:
+            self._send_json(200, jobs.create(payload))
+        elif len(parts) == 5 and parts[4] == "cancel":
+            job = jobs.cancel(parts[3])
+            if job is None:
+                self._send_json(404, {"error": {"message": f"No such job: {parts[3]}",
+                                                "type": "invalid_request_error"}})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}})
+
+
+def start_openai_stub(host: str = "127.0.0.1", port: int = 0,
+                      config: Optional[OpenAIStubConfig] = None,
+                      handler_class: type = OpenAIStubHandler) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starts the stub on a background thread.
+    Returns the server and its base URL; use f"{base_url}/v1" as openai.api_base.
+    """
+    handler = type("ConfiguredOpenAIStubHandler", (handler_class,), {"config": config or OpenAIStubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stand-in server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10250)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per generated token")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--job-phase-seconds", type=float, default=1.0,
+                        help="Seconds each fine-tuning job spends per phase")
+    parser.add_argument("--job-steps", type=int, default=10)
+    parser.add_argument("--job-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server, base_url = start_openai_stub(args.host, args.port, OpenAIStubConfig(
+        latency=args.latency, jitter=args.jitter, token_latency=args.token_latency,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        job_phase_seconds=args.job_phase_seconds, job_steps=args.job_steps,
+        job_failure_rate=args.job_failure_rate, seed=args.seed,
+    ), FineTuningStubHandler)
+    print(f"OpenAI stub listening on {base_url} (set openai.api_base = '{base_url}/v1')")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,13 +1,17 @@
 import openai
 import os
+import atexit
 import dronekit
 import cv2
 import numpy as np
 from time import sleep
-from datetime import datetime
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from twilio.rest import Client  # For SMS notifications
-import smtplib  # For email notifications
+from drone_vision import MotionDetector, ObjectDetector, VisionPipeline, format_stats, load_backend
+from alert_dispatcher import (AlertDispatcher, EmailChannel, SMTPConnectionPool, TwilioSMSChannel,
+                              WebhookSMSChannel)
+from telemetry_log import TelemetryLogger
+from agent_pipeline import AgentPipeline
 
 # Connect to the drone
 drone = dronekit.connect('/dev/ttyUSB0', wait_ready=True)
@@ -24,58 +28,82 @@ sms_client = Client(TWILIO_SID, TWILIO_AUTH_TOKEN)
 EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 
+# Alerts go out on background threads over a pooled SMTP connection; repeats are
+# coalesced and rate limited. Point ALERT_SMTP_HOST/ALERT_SMS_WEBHOOK at the
+# alert_stub.py stand-ins for testing.
+ALERT_SMTP_HOST = os.getenv('ALERT_SMTP_HOST', 'smtp.gmail.com')
+ALERT_SMTP_PORT = int(os.getenv('ALERT_SMTP_PORT', '587'))
+ALERT_SMTP_STARTTLS = os.getenv('ALERT_SMTP_STARTTLS', '1') == '1'
+ALERT_SMS_WEBHOOK = os.getenv('ALERT_SMS_WEBHOOK')
+ALERT_DEDUP_WINDOW = float(os.getenv('ALERT_DEDUP_WINDOW', '60'))
+alert_dispatcher = AlertDispatcher(
+    {
+        "sms": (WebhookSMSChannel(ALERT_SMS_WEBHOOK, TWILIO_PHONE_NUMBER, os.getenv('USER_PHONE_NUMBER'))
+                if ALERT_SMS_WEBHOOK else
+                TwilioSMSChannel(sms_client, TWILIO_PHONE_NUMBER, os.getenv('USER_PHONE_NUMBER'))),
+        "email": EmailChannel(SMTPConnectionPool(ALERT_SMTP_HOST, ALERT_SMTP_PORT, EMAIL_ADDRESS, EMAIL_PASSWORD,
+                                                 starttls=ALERT_SMTP_STARTTLS),
+                              EMAIL_ADDRESS, [os.getenv('USER_EMAIL')]),
+    },
+    dedup_window=ALERT_DEDUP_WINDOW,
+)
+
 # Initialize video capture for monitoring
 cap = cv2.VideoCapture(0)  # Change to your camera index
 
 # Initialize Flask app for communication
 app = Flask(__name__)
 
-def log_data(data):
-    """Logs monitoring data to a file."""
-    with open("monitoring_log.txt", "a") as log_file:
-        log_file.write(f"{datetime.now()}: {data}\n")
+# Structured JSONL telemetry, written and rotated on a background thread.
+# Read it back with: python telemetry_log.py monitoring_log.jsonl --event intruder
+telemetry = TelemetryLogger(os.getenv('TELEMETRY_LOG', 'monitoring_log.jsonl'),
+                            max_bytes=int(os.getenv('TELEMETRY_MAX_BYTES', str(64 * 1024 * 1024))),
+                            compress=True)
+atexit.register(telemetry.close)
+
+def log_data(data, event="message", **fields):
+    """Queues a monitoring record for the telemetry log; never blocks."""
+    telemetry.log(event, message=data, **fields)
+
+# Detection mode: "full" (every pixel, every frame), "fast" or "fastest" (downscaled,
+# frame-difference gated); see MotionDetector.MODES.
+DETECTION_MODE = os.getenv('DETECTION_MODE', 'fast')
+# Optional regions of interest as "x,y,w,h;x,y,w,h" in camera pixels; motion elsewhere is ignored.
+DETECTION_ROIS = [tuple(int(v) for v in roi.split(",")) for roi in os.getenv('DETECTION_ROIS', '').split(";") if roi]
+
+# Shared background model; safe to call from the pipeline's detection workers.
+motion_detector = MotionDetector.from_mode(DETECTION_MODE, min_area=500,  # Minimum area to consider as an intruder
+                                           rois=DETECTION_ROIS or None)
 
 def detect_intruder(frame):
     """Uses simple motion detection to find intruders."""
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-
-    if not hasattr(detect_intruder, "bg_subtractor"):
-        detect_intruder.bg_subtractor = cv2.createBackgroundSubtractorMOG2()
-
-    mask = detect_intruder.bg_subtractor.apply(blurred)
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    for contour in contours:
-        if cv2.contourArea(contour) > 500:  # Minimum area to consider as an intruder
-            return True  # Intruder detected
-    return False  # No intruder detected
-
-def monitor_property():
-    """Monitors the property using the drone's camera."""
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Check for intruders
-        if detect_intruder(frame):
-            alert_message = "Intruder detected! Initiating return to base."
-            log_data(alert_message)
-            print(alert_message)
-            return_to_base()
-            send_alert(alert_message)  # Send alert to the web interface
-            break
-
-        # Display the video feed (optional)
-        cv2.imshow("Drone Camera Feed", frame)
-
-        # Exit on 'q' key
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    return motion_detector(frame)
+
+def on_intruder(frame, result):
+    """Runs once, on a detection worker, for the first frame with an intruder."""
+    alert_message = "Intruder detected! Initiating return to base."
+    return_to_base()  # First, so the drone reacts before any slow I/O
+    print(alert_message)
+    log_data(alert_message, event="intruder", frame=frame.index,
+             detections=result if isinstance(result, list) else [])
+    send_alert(alert_message)  # Send alert to the web interface
+
+def monitor_property(display=True, workers=2, source=None):
+    """
+    Monitors the property using the drone's camera.
+    Capture, detection and display run as separate stages, so a slow detection
+    never stalls the camera; display=False runs headless.
+    """
+    source = source if source is not None else cap
+    detect = advanced_detection_algorithm if object_detector is not None else detect_intruder
+    pipeline = VisionPipeline(source, detect, on_detection=on_intruder,
+                              workers=workers, display=display)
+    summary = pipeline.run()
+    print(format_stats(summary))
+    telemetry.log("monitoring_summary", **summary)
+
+    source.release()
+    return summary
 
 def return_to_base():
     """Commands the drone to return to the launch point."""
@@ -83,25 +111,9 @@ def return_to_base():
     print("Returning to base...")
 
 def send_alert(message):
-    """Send alert message to the web interface and via notifications."""
-    # Send SMS notification
-    sms_client.messages.create(
-        body=message,
-        from_=TWILIO_PHONE_NUMBER,
-        to=os.getenv('USER_PHONE_NUMBER')  # Ensure user's phone number is set in environment
-    )
-
-    # Send Email notification
-    with smtplib.SMTP('smtp.gmail.com', 587) as server:
-        server.starttls()
-        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        server.sendmail(
-            EMAIL_ADDRESS,
-            os.getenv('USER_EMAIL'),  # Ensure user's email is set in environment
-            message
-        )
-
-    print("Alert sent to web interface, SMS, and email:", message)
+    """Queues an alert for SMS and email delivery; returns immediately."""
+    if alert_dispatcher.send(message):  # USER_PHONE_NUMBER and USER_EMAIL must be set
+        print("Alert queued for SMS and email:", message)
 
 def agent_1_user_requirement_processing(user_input: str) -> list:
     """Processes user input to identify necessary components for the drone system."""
@@ -145,20 +157,35 @@ def agent_3_code_generation(schematic: str) -> str:
     code = response.choices[0].message.content.strip()
     return code
 
+# The three agents as a cached, streaming pipeline. Set OPENAI_API_BASE to a local
+# stand-in (openai_stub.py) for load testing; AGENT_CACHE_PATH persists the caches.
+agent_pipeline = AgentPipeline(
+    [
+        ("components", agent_1_user_requirement_processing),
+        ("schematic", agent_2_schematic_generation),
+        ("code", agent_3_code_generation),
+    ],
+    max_workers=int(os.getenv('AGENT_WORKERS', '8')),
+    cache_path=os.getenv('AGENT_CACHE_PATH'),
+)
+
 # Flask route for receiving user requirements
 @app.route('/user-requirements', methods=['POST'])
 def receive_user_requirements():
-    """Receive user requirements and process them."""
+    """
+    Receive user requirements and process them.
+    With "Accept: text/event-stream" (or ?stream=1) each stage is streamed as a
+    server-sent event as soon as it is ready: components, schematic, code, done.
+    """
     user_input = request.json.get('requirements', '')
-    components = agent_1_user_requirement_processing(user_input)
-    schematic = agent_2_schematic_generation(components)
-    code = agent_3_code_generation(schematic)
-
-    response = {
-        "components": components,
-        "schematic": schematic,
-        "code": code
-    }
+    if 'text/event-stream' in request.headers.get('Accept', '') or request.args.get('stream'):
+        return Response(stream_with_context(agent_pipeline.sse(user_input, timeout=120)),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    try:
+        response = agent_pipeline.run(user_input, timeout=120)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 502
     return jsonify(response)
 
 # Flask route for the home page
@@ -173,10 +200,24 @@ def build_user_interface():
     print("User interface built with HTML/CSS/JavaScript to send user requirements and display results.")
 
 # Expand Detection Algorithms
+# Optional object detector: a YOLO-style model (ONNX, TFLite, ...) run on the CPU.
+# Frames are batched across the pipeline's detection workers.
+DETECTION_MODEL = os.getenv('DETECTION_MODEL')
+DETECTION_BACKEND = os.getenv('DETECTION_BACKEND', 'auto')  # auto, onnxruntime or opencv
+DETECTION_LABELS = os.getenv('DETECTION_LABELS', 'person').split(',')
+INTRUDER_LABELS = {'person'}
+object_detector = (ObjectDetector(load_backend(DETECTION_MODEL, DETECTION_BACKEND), labels=DETECTION_LABELS,
+                                  max_batch=2)
+                   if DETECTION_MODEL else None)
+
 def advanced_detection_algorithm(frame):
-    """Implement advanced detection methods using TensorFlow or other libraries."""
-    # Placeholder: Use a pre-trained model for facial recognition or object detection
-    print("Advanced detection algorithm implemented.")
+    """
+    Runs the object detector, but only on frames the motion gate flags.
+    Returns the intruder detections (empty list if none).
+    """
+    if object_detector is None or not detect_intruder(frame):
+        return []
+    return [detection for detection in object_detector(frame) if detection.label in INTRUDER_LABELS]
 
 # Add More Sensors
 def integrate_additional_sensors():
@@ -223,16 +264,6 @@ if __name__ == "__main__":
 
     # Enhance Communication
     enhance_communication()
-# Placeholder for advanced detection implementation
-def advanced_detection_algorithm(frame):
-    """Integrate advanced detection algorithms using a pre-trained model."""
-    # Load your trained model here
-    # e.g., model = load_model('path_to_your_model')
-
-    # Process the frame with the model
-    # result = model.predict(preprocess(frame))
-    print("Advanced detection algorithm executed.")
-
 # Placeholder for adding additional sensors
 def integrate_additional_sensors():
     """Integrate sensors like temperature and humidity."""
@@ -256,22 +287,8 @@ def enhance_communication():
 
     # Example function to send notification based on preferences
     def send_notification(notification_type, message):
-        if notification_type == 'sms':
-            sms_client.messages.create(
-                body=message,
-                from_=TWILIO_PHONE_NUMBER,
-                to=user_preferences['sms']
-            )
-        elif notification_type == 'email':
-            with smtplib.SMTP('smtp.gmail.com', 587) as server:
-                server.starttls()
-                server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-                server.sendmail(
-                    EMAIL_ADDRESS,
-                    user_preferences['email'],
-                    message
-                )
-        print(f"{notification_type.capitalize()} sent to user: {message}")
+        if alert_dispatcher.send(message, channels=[notification_type]):
+            print(f"{notification_type.capitalize()} queued for user: {message}")
 
 # Main execution (continued from previous example)
 if __name__ == "__main__":
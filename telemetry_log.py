@@ -0,0 +1,254 @@
+import os
+import glob
+import gzip
+import json
+import time
+import shutil
+import argparse
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+WRITE_CHUNK_BYTES = 256 * 1024
+
+
+def _default(value: Any) -> Any:
+    """JSON fallback for numpy scalars/arrays, objects with as_dict(), and anything else via str()."""
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+# ---------------------------- Writer ---------------------------- #
+class TelemetryLogger:
+    """
+    Buffered JSONL telemetry writer.
+
+    log() only appends the record to an in-memory buffer and returns; a
+    background thread serialises and writes the buffer every flush_interval
+    seconds, or sooner once flush_records records are waiting. If the buffer
+    holds max_pending records (the disk has stalled), new records are dropped
+    and counted rather than blocking the caller.
+
+    Each line is {"ts": epoch seconds, "event": ..., **fields}. Field values
+    are serialised on the writer thread, so pass values that won't be mutated
+    afterwards.
+
+    The file is rotated once it reaches max_bytes or has been open for
+    rotate_interval seconds, to `<path>.<YYYYmmdd-HHMMSS>` (gzip-compressed
+    when compress=True); only the newest `backups` rotated files are kept.
+    """
+    def __init__(self, path: str, flush_interval: float = 1.0, flush_records: int = 1000,
+                 max_pending: int = 100000, max_bytes: Optional[int] = 64 * 1024 * 1024,
+                 rotate_interval: Optional[float] = None, backups: int = 10, compress: bool = True):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_records = flush_records
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backups = backups
+        self.compress = compress
+        self.stats = {"logged": 0, "written": 0, "dropped": 0, "flushes": 0, "rotations": 0, "errors": 0}
+        self._pending: deque = deque()
+        self._wake = threading.Event()
+        self._flushed = threading.Condition()
+        self._closed = False
+        self._file = None
+        self._opened_at = 0.0
+        self._size = 0
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, event: str, **fields: Any) -> bool:
+        """Queues one record. Never blocks; returns False if the record was dropped."""
+        if self._closed or len(self._pending) >= self.max_pending:
+            self.stats["dropped"] += 1
+            return False
+        self._pending.append((time.time(), event, fields))
+        self.stats["logged"] += 1
+        if len(self._pending) >= self.flush_records:
+            self._wake.set()
+        return True
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._opened_at = time.time()
+
+    def _should_rotate(self) -> bool:
+        if self._size == 0:
+            return False
+        if self.max_bytes is not None and self._size >= self.max_bytes:
+            return True
+        return self.rotate_interval is not None and time.time() - self._opened_at >= self.rotate_interval
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        stamp = f"{datetime.now():%Y%m%d-%H%M%S}"
+        # Several rotations in one second get increasing suffixes, so names keep sorting oldest first.
+        same_second = [order[1] for order in (_rotation_order(self.path, name) for name in rotated_files(self.path))
+                       if order[0] == stamp]
+        target = f"{self.path}.{stamp}" + (f".{max(same_second) + 1}" if same_second else "")
+        os.replace(self.path, target)
+        if self.compress:
+            with open(target, "rb") as source, gzip.open(target + ".gz", "wb", compresslevel=6) as sink:
+                shutil.copyfileobj(source, sink, 1024 * 1024)
+            os.remove(target)
+        for old in rotated_files(self.path)[:-self.backups or None]:
+            os.remove(old)
+        self.stats["rotations"] += 1
+
+    def _write(self) -> None:
+        """Writes everything pending in chunks, rotating as soon as a chunk fills the file."""
+        count = len(self._pending)
+        popleft = self._pending.popleft
+        while count:
+            if self._file is None:
+                self._open()
+            room = self.max_bytes - self._size if self.max_bytes is not None else WRITE_CHUNK_BYTES
+            limit = min(WRITE_CHUNK_BYTES, max(room, 1))
+            lines, size, written = [], 0, 0
+            while count and size < limit:
+                ts, event, fields = popleft()
+                record = {"ts": ts, "event": event}
+                record.update(fields)
+                line = json.dumps(record, separators=(",", ":"), default=_default).encode("utf-8") + b"\n"
+                lines.append(line)
+                size += len(line)
+                written += 1
+                count -= 1
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            self._size += size
+            self.stats["written"] += written
+            self.stats["flushes"] += 1
+            if self._should_rotate():
+                self._rotate()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            closing = self._closed
+            try:
+                self._write()
+                if self._file is not None and self._should_rotate():
+                    self._rotate()  # time-based rotation with nothing new to write
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Telemetry write failed: {e}")
+            with self._flushed:
+                self._flushed.notify_all()
+            if closing and not self._pending:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Asks the writer to flush now and waits until the buffer is on disk."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._flushed:
+            while self._pending and self._thread.is_alive():
+                self._wake.set()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._flushed.wait(remaining if remaining is not None else 0.1)
+        return not self._pending
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+
+# ---------------------------- Reader ---------------------------- #
+def _rotation_order(path: str, name: str) -> Optional[tuple]:
+    """Sort key for `<path>.<YYYYmmdd-HHMMSS>[.n][.gz]`, or None for unrelated files."""
+    parts = name[len(path) + 1:].split(".")
+    if parts[-1] == "gz":
+        parts.pop()
+    stamp = parts[0]
+    if len(stamp) != 15 or not stamp.replace("-", "").isdigit() or len(parts) > 2:
+        return None
+    if len(parts) == 2 and not parts[1].isdigit():
+        return None
+    return stamp, int(parts[1]) if len(parts) == 2 else 0
+
+
+def rotated_files(path: str) -> List[str]:
+    """Rotated files for `path`, oldest first."""
+    names = [name for name in glob.glob(glob.escape(path) + ".*") if _rotation_order(path, name) is not None]
+    return sorted(names, key=lambda name: _rotation_order(path, name))
+
+
+def read_records(path: str, event: Optional[str] = None, since: Optional[float] = None,
+                 until: Optional[float] = None, where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 include_rotated: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Streams records from `path` (and its rotated, possibly gzipped, files,
+    oldest first) one line at a time, so logs of any size can be filtered
+    without loading them. An `event` filter is checked on the raw line before
+    JSON decoding; since/until compare against the record's "ts".
+    """
+    needle = ('"event":' + json.dumps(event)).encode("utf-8") if event is not None else None
+    files = (rotated_files(path) if include_rotated else []) + ([path] if os.path.exists(path) else [])
+    for name in files:
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(name, "rb") as f:
+            for line in f:
+                if needle is not None and needle not in line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a torn final line from a crash
+                if event is not None and record.get("event") != event:
+                    continue
+                ts = record.get("ts", 0.0)
+                if since is not None and ts < since:
+                    continue
+                if until is not None and ts >= until:
+                    continue
+                if where is not None and not where(record):
+                    continue
+                yield record
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream and filter a JSONL telemetry log and its rotated files.")
+    parser.add_argument("path")
+    parser.add_argument("--event", help="Only records with this event type")
+    parser.add_argument("--since", help="Epoch seconds or ISO time (inclusive)")
+    parser.add_argument("--until", help="Epoch seconds or ISO time (exclusive)")
+    parser.add_argument("--field", action="append", default=[], help="key=value equality filter (repeatable)")
+    parser.add_argument("--count", action="store_true", help="Print the number of matching records only")
+    parser.add_argument("--no-rotated", action="store_true", help="Skip rotated files")
+    args = parser.parse_args()
+
+    equals = [item.split("=", 1) for item in args.field]
+    matches = read_records(args.path, event=args.event, since=_parse_time(args.since), until=_parse_time(args.until),
+                           where=(lambda record: all(str(record.get(k)) == v for k, v in equals)) if equals else None,
+                           include_rotated=not args.no_rotated)
+    if args.count:
+        print(sum(1 for _ in matches))
+    else:
+        for record in matches:
+            print(json.dumps(record))